@@ -1,9 +1,8 @@
 """Sample test scripts for saucelab-python integration."""
 
-import pytest
 from selenium.webdriver.common.keys import Keys
-from selenium import webdriver
 from prodigyqa import BrowserActions
+from prodigyqa.drivers import RemoteDriverFactory
 
 
 class Page:
@@ -26,48 +25,31 @@ class Page:
     }
 
 
-@pytest.fixture(scope="class")
-def setup_teardown_fixture(request):
-    """Fixture for class level setup and teardown methods.
+class TestClass(BrowserActions):
+    """Sample suite running on Sauce Labs through a remote driver factory.
 
-    :param request: request for a particular functionality.
-    :return: NA
-    :rtype: NA
+    Sessions share a keep-alive connection to the grid and are reused by
+    every test of the process through the driver pool, being reset in
+    place between tests.
     """
-    class setup_teardown(BrowserActions):
-        def __init__(self):
-            """Configuring remote web driver.
 
-            :param: NA
-            :return: NA
-            :rtype: NA
-            """
-            self.driver = webdriver.Remote(
-                command_executor='https://{}:{}@ondemand.saucelabs.'
-                                 'com/wd/hub'.format(Page.username,
-                                                     Page.access_key),
-                desired_capabilities=Page.desired_cap)
-
-    request.cls.st = setup_teardown()
-    yield
-    request.cls.st.driver.quit()
-
-
-@pytest.mark.usefixtures("setup_teardown_fixture")
-class TestClass():
+    driver_factory = RemoteDriverFactory(
+        command_executor='https://{}:{}@ondemand.saucelabs.'
+                         'com/wd/hub'.format(Page.username, Page.access_key),
+        desired_capabilities=Page.desired_cap)
 
     def test_python_search(self):
-        self.st.open(Page.base_url)
-        self.st.set_window_size(1200, 800)
-        self.st.maximize()
-        self.st.assertIn("Python", self.st.get_title())
-        self.st.click(Page.search_box)
-        self.st.send_keys(Page.search_box)
-        self.st.open(Page.two_url)
-        self.st.click(Page.button)
+        self.open(Page.base_url)
+        self.set_window_size(1200, 800)
+        self.maximize()
+        self.assertIn("Python", self.get_title())
+        self.click(Page.search_box)
+        self.send_keys(Page.search_box)
+        self.open(Page.two_url)
+        self.click(Page.button)
 
     def test_facebook_search(self):
-        self.st.open(Page.fb_base_url)
-        self.st.set_window_size(1200, 800)
-        self.st.maximize()
-        self.st.assertIn("Facebook", self.st.get_title())
+        self.open(Page.fb_base_url)
+        self.set_window_size(1200, 800)
+        self.maximize()
+        self.assertIn("Facebook", self.get_title())
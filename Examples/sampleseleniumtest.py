@@ -3,7 +3,7 @@
 from prodigyqa import BrowserActions
 import os
 from selenium.webdriver.chrome.options import Options
-from time import sleep
+from prodigyqa.waits import enabled
 
 chrome_options = Options()
 
@@ -151,17 +151,14 @@ class TestClass(BrowserActions):
         self.reload_page()
         self.click(PageObjects.buttons_all.get('js_alert'))
         self.switch_to_alert()
-        sleep(5)
         self.wait_and_accept_alert()
         self.go_back()
         self.go_forward()
         self.click(PageObjects.buttons_all.get('js_confirm_alert'))
         self.switch_to_alert()
-        sleep(5)
         self.wait_and_reject_alert()
         self.click(PageObjects.buttons_all.get('js_prompt_alert'))
         self.switch_to_alert()
-        sleep(5)
         self.wait_and_reject_alert()
         self.go_back()
         self.click(PageObjects.links_all.get('frames'))
@@ -173,11 +170,9 @@ class TestClass(BrowserActions):
         self.go_back()
         self.go_back()
         self.page_readiness_wait()
-        sleep(5)
         self.click(PageObjects.links_all.get('dynamic_controls'))
         self.click(PageObjects.buttons_all.get('enable_btn'))
-        sleep(5)
+        self.wait_until(enabled(PageObjects.text_boxes.get('text_box')))
         self.send_keys(PageObjects.text_boxes.get('text_box'))
-        sleep(5)
         self.switch_to_default_content()
         self.capture_screenshot(os.getcwd() + "\\example_Screenshot1.png")
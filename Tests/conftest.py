@@ -0,0 +1,58 @@
+"""Shared fixtures of the unit tests."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    """Threaded local HTTP server."""
+
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer requests with the route registered for their path."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.requests.append((self.command, self.path,
+                                     dict(self.headers), body))
+        route = self.server.routes.get(self.path.split('?')[0])
+        status, headers, payload = route(self) if route else (404, {}, {})
+        data = payload if isinstance(payload, bytes) else \
+            json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Local server: register routes as server.routes[path] = callable.
+
+    A route takes the request handler and returns (status, headers,
+    json payload or bytes); server.requests lists what was received.
+    """
+    server = _Server(('127.0.0.1', 0), _Handler)
+    server.routes = {}
+    server.requests = []
+    server.url = 'http://127.0.0.1:{}'.format(server.server_port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,92 @@
+"""Tests of the concurrent requests of ApiTester."""
+import asyncio
+
+import threading
+
+import time
+
+import pytest
+
+from prodigyqa import apitester
+
+
+class _InFlight(object):
+    """Route answering slowly while counting requests in flight."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.current = 0
+        self.highest = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, handler):
+        with self._lock:
+            self.current += 1
+            self.highest = max(self.highest, self.current)
+        time.sleep(self.delay)
+        with self._lock:
+            self.current -= 1
+        return 200, {}, {'path': handler.path}
+
+
+def _tester(max_concurrency=None):
+    tester = apitester.ApiTester()
+    tester.max_concurrency = max_concurrency
+    return tester
+
+
+def test_gather_returns_responses_in_call_order(http_server):
+    http_server.routes['/item'] = _InFlight(0)
+    calls = [{'method': 'GET', 'url': http_server.url + '/item',
+              'params': {'n': n}} for n in range(20)]
+    responses = _tester().gather_requests(calls, limit=5)
+    assert [response.json()['path'] for response in responses] == [
+        '/item?n={}'.format(n) for n in range(20)]
+
+
+def test_gather_caps_requests_in_flight(http_server):
+    route = http_server.routes['/slow'] = _InFlight()
+    calls = [{'method': 'GET', 'url': http_server.url + '/slow'}] * 12
+    _tester().gather_requests(calls, limit=3)
+    assert 1 <= route.highest <= 3
+
+
+def test_gather_errors(http_server):
+    http_server.routes['/item'] = _InFlight(0)
+    calls = [{'method': 'GET', 'url': http_server.url + '/item'},
+             {'method': 'GET', 'url': http_server.url + '/item',
+              'colour': 'red'}]
+    with pytest.raises(KeyError):
+        _tester().gather_requests(calls)
+    ok, error = _tester().gather_requests(calls, return_exceptions=True)
+    assert ok.status_code == 200
+    assert isinstance(error, KeyError)
+
+
+def test_aapirequest_capped_by_max_concurrency(http_server):
+    route = http_server.routes['/slow'] = _InFlight()
+    tester = _tester(max_concurrency=2)
+    url = http_server.url + '/slow'
+
+    async def send_all():
+        return await asyncio.gather(*[tester.aapirequest('GET', url=url)
+                                      for _ in range(8)])
+    loop = asyncio.new_event_loop()
+    try:
+        responses = loop.run_until_complete(send_all())
+    finally:
+        loop.close()
+    assert [response.status_code for response in responses] == [200] * 8
+    assert 1 <= route.highest <= 2
+
+
+def test_one_executor_for_every_limit(http_server):
+    http_server.routes['/item'] = _InFlight(0)
+    calls = [{'method': 'GET', 'url': http_server.url + '/item'}] * 4
+    tester = _tester()
+    tester.gather_requests(calls, limit=2)
+    executor = apitester.ASYNC_EXECUTOR.get()
+    tester.gather_requests(calls, limit=3)
+    assert apitester.ASYNC_EXECUTOR.get() is executor
+    apitester.ASYNC_EXECUTOR.close()
+    assert apitester.ASYNC_EXECUTOR.get() is not executor
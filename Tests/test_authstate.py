@@ -0,0 +1,52 @@
+"""Tests of restoring browser state snapshots."""
+import json
+
+from prodigyqa.authstate import restore_state
+
+
+class CdpDriver(object):
+    """Driver double recording the CDP commands sent to it."""
+
+    current_url = 'about:blank'
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        if command.startswith('DOMStorage.'):
+            raise AssertionError('Frame not found for the given security '
+                                 'origin')
+        if command == 'Page.addScriptToEvaluateOnNewDocument':
+            return {'identifier': '1'}
+        return {}
+
+
+def _state(local, session):
+    return {'origin': 'https://app.example.com',
+            'url': 'https://app.example.com/home', 'created': 0,
+            'cookies': [{'name': 'sid', 'value': 'abc',
+                         'domain': 'app.example.com', 'path': '/',
+                         'expires': -1, 'session': True}],
+            'local_storage': local, 'session_storage': session}
+
+
+def test_local_storage_restored_from_blank_page():
+    driver = CdpDriver()
+    local = {'token': 'a"b', 'theme': 'dark'}
+    identifier = restore_state(driver, _state(local, {}))
+    assert identifier == '1'
+    names = [command for command, _ in driver.commands]
+    assert not [name for name in names if name.startswith('DOMStorage.')]
+    source = driver.commands[-1][1]['source']
+    assert json.dumps(local) in source
+    assert json.dumps('https://app.example.com') in source
+
+
+def test_cookies_only_adds_no_script():
+    driver = CdpDriver()
+    assert restore_state(driver, _state({}, {})) is None
+    assert [command for command, _ in driver.commands] == [
+        'Network.enable', 'Network.setCookies']
+    cookie = driver.commands[1][1]['cookies'][0]
+    assert 'expires' not in cookie
@@ -0,0 +1,100 @@
+"""Tests of recording responses to a cassette and replaying them."""
+import gzip
+
+import json
+
+import pytest
+
+from prodigyqa.cassette import Cassette, CassettePool, request_key
+from prodigyqa.paths import compile_path
+from prodigyqa.sessions import SessionPool
+from prodigyqa.streaming import StreamCheck, iter_matches, response_events
+
+RECORDS = {'data': [{'id': i, 'status': 'active'} for i in range(2000)]}
+
+
+def _routes(server):
+    hits = []
+
+    def counter(handler):
+        hits.append(handler.path)
+        return 200, {'X-Hit': str(len(hits))}, {'hit': len(hits)}
+
+    def zipped(handler):
+        return 200, {'Content-Encoding': 'gzip'}, gzip.compress(
+            json.dumps(RECORDS).encode('utf-8'))
+
+    server.routes['/counter'] = counter
+    server.routes['/records'] = zipped
+    return hits
+
+
+def _session(path, mode, url):
+    pool = CassettePool(Cassette(path, mode), SessionPool())
+    return pool, pool.session(url)
+
+
+def test_record_then_replay_in_order(http_server, tmp_path):
+    hits = _routes(http_server)
+    path = str(tmp_path / 'api.db')
+    url = http_server.url + '/counter'
+    pool, session = _session(path, 'record', http_server.url)
+    assert [session.get(url).json()['hit'] for _ in range(2)] == [1, 2]
+    assert session.post(url, json={'a': 1}).json()['hit'] == 3
+    pool.close()
+    pool.cassette.close()
+
+    pool, session = _session(path, 'replay', http_server.url)
+    replayed = [session.get(url) for _ in range(3)]
+    assert [response.json()['hit'] for response in replayed] == [1, 2, 2]
+    assert replayed[0].headers['X-Hit'] == '1'
+    assert session.post(url, json={'a': 1}).json()['hit'] == 3
+    with pytest.raises(AssertionError):
+        session.post(url, json={'a': 2})
+    assert len(hits) == 3
+    pool.cassette.close()
+
+
+def test_streamed_response_is_parsed_and_recorded(http_server, tmp_path):
+    _routes(http_server)
+    path = str(tmp_path / 'api.db')
+    url = http_server.url + '/records'
+    pool, session = _session(path, 'record', http_server.url)
+    response = session.get(url, stream=True)
+    # Not buffered by the recording.
+    assert response._content is False
+    check = StreamCheck('all_equal', 'active',
+                        compile_path('resp.data.*.status'))
+    for _, value in iter_matches(response_events(response, 1024),
+                                 [check.path]):
+        check.feed(value)
+    assert check.finish() is None
+    assert check.matches == 2000
+    response.close()
+
+    stored = pool.cassette.play(request_key('GET', url, None))
+    assert json.loads(stored['body'].decode('utf-8')) == RECORDS
+    assert 'Content-Encoding' not in stored['headers']
+    pool.cassette.close()
+
+
+def test_closing_early_records_the_whole_body(http_server, tmp_path):
+    _routes(http_server)
+    path = str(tmp_path / 'api.db')
+    url = http_server.url + '/records'
+    pool, session = _session(path, 'record', http_server.url)
+    response = session.get(url, stream=True)
+    # Read as ijson does.
+    response.raw.decode_content = True
+    assert response.raw.read(100).startswith(b'{"data": [')
+    response.close()
+    pool.cassette.close()
+
+    pool, session = _session(path, 'replay', http_server.url)
+    assert session.get(url).json() == RECORDS
+    pool.cassette.close()
+
+
+def test_unknown_mode_rejected(tmp_path):
+    with pytest.raises(AssertionError):
+        Cassette(str(tmp_path / 'api.db'), 'rewind')
@@ -0,0 +1,163 @@
+"""Tests of the driver pool reset between tests."""
+from selenium.common.exceptions import WebDriverException
+
+from prodigyqa import browseractions
+from prodigyqa.driverpool import DriverPool
+from prodigyqa.drivers import ChromeDriverFactory
+from prodigyqa.performance import LONG_TASK_OBSERVER
+
+
+class _Switch(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class CdpDriver(object):
+    """Driver double with two tabs on different origins."""
+
+    def __init__(self):
+        self.window_handles = ['tab1', 'tab2']
+        self.current = 'tab1'
+        self.switch_to = _Switch(self)
+        self.history = {
+            'tab1': ['https://app.example.com/login',
+                     'https://sso.example.org/auth'],
+            'tab2': ['about:blank', 'http://localhost:8000/'],
+        }
+        self.commands = []
+        self.quit_called = False
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        if command == 'Page.getNavigationHistory':
+            return {'entries': [{'url': url}
+                                for url in self.history[self.current]]}
+        if command == 'Page.getFrameTree':
+            return {'frameTree': {
+                'frame': {'url': self.history[self.current][-1]},
+                'childFrames': [{'frame': {
+                    'url': 'https://ads.example.net/frame'}}]}}
+        if command == 'Target.createTarget':
+            self.window_handles = self.window_handles + ['blank']
+        return {}
+
+    def close(self):
+        self.window_handles = [handle for handle in self.window_handles
+                               if handle != self.current]
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_reset_clears_every_visited_origin_and_tab():
+    driver = CdpDriver()
+    assert DriverPool(CdpDriver).reset(driver)
+    cleared = {params['origin'] for command, params in driver.commands
+               if command == 'Storage.clearDataForOrigin'}
+    assert cleared == {'https://app.example.com', 'https://sso.example.org',
+                       'http://localhost:8000', 'https://ads.example.net'}
+    assert driver.window_handles == ['blank']
+    assert driver.current == 'blank'
+    assert ('Network.clearBrowserCookies', {}) in driver.commands
+
+
+class TabDriver(CdpDriver):
+    """CDP driver double keeping blocked urls and scripts per tab."""
+
+    def __init__(self):
+        super(TabDriver, self).__init__()
+        self.tabs = {}
+        self.created = 0
+
+    def execute_cdp_cmd(self, command, params):
+        tab = self.tabs.setdefault(self.current, {'blocked': [],
+                                                  'scripts': []})
+        if command == 'Network.setBlockedURLs':
+            tab['blocked'] = params['urls']
+        elif command == 'Page.addScriptToEvaluateOnNewDocument':
+            tab['scripts'].append(params['source'])
+            return {'identifier': str(len(tab['scripts']))}
+        elif command == 'Target.createTarget':
+            self.created += 1
+            handle = 'blank{}'.format(self.created)
+            self.history[handle] = ['about:blank']
+            self.window_handles = self.window_handles + [handle]
+            return {}
+        return super(TabDriver, self).execute_cdp_cmd(command, params)
+
+
+class TabDriverFactory(ChromeDriverFactory):
+    def __call__(self):
+        return TabDriver()
+
+
+def test_reused_driver_gets_blocking_and_observer_again():
+    class Actions(browseractions.BrowserActions):
+        driver_factory = TabDriverFactory(performance_log=True)
+        blocked_resources = ('images',)
+        pool_size = 1
+
+    drivers = []
+    for _ in range(2):
+        actions = Actions()
+        drivers.append(actions.acquire_driver())
+        driver = drivers[-1]
+        tab = driver.tabs[driver.current]
+        assert '*.png' in tab['blocked']
+        assert tab['scripts'] == [LONG_TASK_OBSERVER]
+        actions.release_driver()
+    assert drivers[0] is drivers[1]
+    assert drivers[1].current == 'blank2'
+
+
+class RemoteDriver(object):
+    """Driver double without CDP, as selenium's Remote driver."""
+
+    def __init__(self, fail=False):
+        self.window_handles = ['main', 'popup']
+        self.current = 'main'
+        self.switch_to = _Switch(self)
+        self.calls = []
+        self.fail = fail
+        self.quit_called = False
+
+    def execute_script(self, script, *args):
+        if self.fail:
+            raise WebDriverException('session deleted')
+        self.calls.append(('script', self.current))
+
+    def close(self):
+        self.calls.append(('close', self.current))
+        self.window_handles = [handle for handle in self.window_handles
+                               if handle != self.current]
+
+    def delete_all_cookies(self):
+        self.calls.append(('cookies', self.current))
+
+    def get(self, url):
+        self.calls.append(('get', url))
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_drivers_without_cdp_are_reset_and_kept():
+    driver = RemoteDriver()
+    pool = DriverPool(RemoteDriver)
+    pool.checkin(driver)
+    assert not driver.quit_called
+    assert driver.calls == [('script', 'popup'), ('close', 'popup'),
+                            ('script', 'main'), ('cookies', 'main'),
+                            ('get', 'about:blank')]
+    assert pool.checkout() is driver
+
+
+def test_drivers_failing_to_reset_are_quit():
+    driver = RemoteDriver(fail=True)
+    pool = DriverPool(RemoteDriver)
+    pool.checkin(driver)
+    assert driver.quit_called
+    assert not pool._idle
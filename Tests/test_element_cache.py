@@ -0,0 +1,85 @@
+"""Tests of the element handles cached by BrowserActions."""
+from selenium.common import exceptions as selenium_exceptions
+
+from prodigyqa import browseractions
+
+LINK = {'by': 'id', 'locatorvalue': 'next'}
+
+
+class Element(object):
+    """Element double going stale once its page is left."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.page = driver.page
+
+    def _check(self):
+        if self.page != self.driver.page:
+            raise selenium_exceptions.StaleElementReferenceException('stale')
+
+    def is_enabled(self):
+        self._check()
+        return True
+
+    def click(self):
+        self._check()
+        self.driver.page += 1
+        self.driver.ids = set()
+
+
+class Driver(object):
+    """Driver double whose page only holds the elements of ids."""
+
+    def __init__(self):
+        self.page = 0
+        self.ids = {'next'}
+        self.finds = 0
+
+    def execute_async_script(self, script, *args):
+        return ['complete', 0]
+
+    def execute_script(self, script, *args):
+        for arg in args:
+            arg._check()
+
+    def find_element(self, by, value):
+        self.finds += 1
+        if value not in self.ids:
+            raise selenium_exceptions.NoSuchElementException(value)
+        return Element(self)
+
+
+def _actions():
+    class Actions(browseractions.BrowserActions):
+        cache_elements = True
+        timeout = 0.2
+
+    actions = Actions()
+    actions.driver = Driver()
+    return actions
+
+
+def test_wait_for_element_after_navigating_click():
+    actions = _actions()
+    assert actions.wait_for_element(LINK)
+    actions.click(LINK)
+    assert not actions.wait_for_element(LINK)
+
+
+def test_cached_element_reused_on_same_page():
+    actions = _actions()
+    actions.wait_for_element(LINK)
+    actions.javascript_click(LINK)
+    actions.scroll_to_element(LINK)
+    assert actions.driver.finds == 1
+
+
+def test_scroll_fallback_gets_fresh_element_after_navigation():
+    actions = _actions()
+    actions.wait_for_element(LINK)
+    actions.driver.page += 1
+    actions._mark_navigation(keep_elements=True)
+    # The driver double can't perform ActionChains, so the script
+    # fallback scrolls.
+    actions.scroll_to_element(LINK)
+    assert actions.driver.finds == 2
@@ -0,0 +1,97 @@
+"""Tests of the load test runner and its results."""
+import itertools
+
+import threading
+
+import pytest
+
+from prodigyqa import apitester
+from prodigyqa.loadtest import LoadResult, LoadRunner, outcome_of
+
+
+def _result(milliseconds):
+    result = LoadResult()
+    for value in milliseconds:
+        result.record(value / 1000.0, 200, False)
+    result.started, result.ended = 1000.0, 1010.0
+    return result
+
+
+def test_percentiles_of_known_latencies():
+    result = _result(range(1, 101))
+    assert result.percentile(50) == pytest.approx(50)
+    assert result.percentile(95) == pytest.approx(95)
+    assert result.percentile(99) == pytest.approx(99)
+    assert result.percentile(100) == pytest.approx(100)
+    assert result.percentile(0) == pytest.approx(1)
+    assert _result([7]).percentile(99) == pytest.approx(7)
+    assert LoadResult().percentile(95) == 0.0
+    summary = result.summary()
+    assert summary['mean'] == pytest.approx(50.5)
+    assert summary['max'] == pytest.approx(100)
+    assert summary['throughput'] == pytest.approx(10)
+
+
+def test_histogram_buckets():
+    result = _result([1, 5, 6, 30, 20000])
+    counts = dict(result.histogram((5, 10, 50)))
+    assert counts == {5: 2, 10: 1, 50: 1, None: 1}
+
+
+def test_slo_check():
+    result = _result(range(1, 101))
+    assert result.check_slo(p95=100, p99=100, error_rate=0,
+                            throughput=5) == []
+    missed = result.check_slo(p95=90, p50=60, throughput=20)
+    assert missed == ['p95 95.00 > 90', 'throughput 10.00 < 20']
+    with pytest.raises(AssertionError):
+        result.check_slo(p90=100)
+
+
+def test_outcome_of_scenario_results():
+    class Response(object):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    assert outcome_of(None) == ('ok', False)
+    assert outcome_of(Response(204)) == (204, False)
+    assert outcome_of([Response(200), Response(503),
+                       Response(200)]) == (503, True)
+
+
+def test_runner_counts_errors_and_exceptions():
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def scenario():
+        with lock:
+            n = next(counter)
+        if n % 4 == 0:
+            raise ValueError('boom')
+    result = LoadRunner(scenario, concurrency=4, iterations=40).run()
+    assert result.requests == 40
+    assert result.errors == 10
+    assert result.outcomes == {'ok': 30, 'ValueError': 10}
+    assert result.summary()['error_rate'] == pytest.approx(0.25)
+
+
+def test_load_test_against_server(http_server):
+    statuses = itertools.cycle([200, 200, 200, 500])
+    lock = threading.Lock()
+
+    def route(handler):
+        with lock:
+            return next(statuses), {}, {}
+    http_server.routes['/api'] = route
+    tester = apitester.ApiTester()
+    scenario = [{'method': 'GET', 'url': http_server.url + '/api'}]
+    result = tester.load_test(scenario, concurrency=4, iterations=40,
+                              error_rate=0.5)
+    assert result.requests == 40
+    assert result.outcomes[500] == 10
+    assert result.summary()['error_rate'] == pytest.approx(0.25)
+    with pytest.raises(AssertionError) as error:
+        tester.load_test(scenario, concurrency=4, iterations=40,
+                         error_rate=0.1, p99=60000)
+    assert 'error_rate' in str(error.value)
+    assert 'p99' not in str(error.value)
@@ -0,0 +1,51 @@
+"""Tests of locators and their By strategy resolution."""
+import pickle
+
+import pytest
+
+from selenium.webdriver.common.by import By
+
+from prodigyqa.locator import Locator, is_locator, resolve_by
+
+
+@pytest.mark.parametrize('by, strategy', [
+    ('By.ID', By.ID),
+    ('id', By.ID),
+    ('By.NAME', By.NAME),
+    ('By.CLASS_NAME', By.CLASS_NAME),
+    ('class name', By.CLASS_NAME),
+    ('css selector', By.CSS_SELECTOR),
+    ('By.PARTIAL_LINK_TEXT', By.PARTIAL_LINK_TEXT),
+    ('link text', By.LINK_TEXT),
+    ('xpath', By.XPATH),
+    ('tag name', By.TAG_NAME),
+])
+def test_resolve_by(by, strategy):
+    assert resolve_by(by) == strategy
+
+
+def test_resolve_by_rejects_unknown_types():
+    with pytest.raises(AssertionError):
+        resolve_by('By.COLOR')
+
+
+def test_locator_from_dictionary():
+    locator = Locator.of({'by': 'By.ID', 'locatorvalue': 'search',
+                          'value': 'text'})
+    assert locator.selector == (By.ID, 'search')
+    assert locator['value'] == 'text'
+    assert locator.get('missing') is None
+    assert Locator.of(locator) is locator
+    assert locator == Locator('id', 'search', 'text')
+    assert hash(locator) == hash(Locator('id', 'search', 'text'))
+    assert is_locator(locator) and is_locator({})
+    assert not is_locator('search')
+
+
+def test_locator_is_immutable_and_picklable():
+    locator = Locator('xpath', '//a')
+    with pytest.raises(AttributeError):
+        locator.locatorvalue = '//b'
+    with pytest.raises(KeyError):
+        locator['_hash']
+    assert pickle.loads(pickle.dumps(locator)) == locator
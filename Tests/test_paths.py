@@ -0,0 +1,67 @@
+"""Tests of dotted response paths."""
+import pytest
+
+from prodigyqa.paths import compile_path, compile_trie
+
+DATA = {'count': 2, 'data': [{'name': 'ann', 'tags': ['a']},
+                             {'name': 'bob', 'tags': []}],
+        'by_id': {'7': {'name': 'cy'}}}
+
+
+@pytest.mark.parametrize('path, value', [
+    ('resp.count', 2),
+    ('resp.data.0.name', 'ann'),
+    ('resp.data.-1.name', 'bob'),
+    ('resp.by_id.7.name', 'cy'),
+    ('resp', DATA),
+])
+def test_get(path, value):
+    assert compile_path(path).get(DATA) == value
+
+
+@pytest.mark.parametrize('path, error', [
+    ('resp.missing', KeyError),
+    ('resp.data.5', IndexError),
+    ('resp.count.name', TypeError),
+])
+def test_missing_values_raise(path, error):
+    with pytest.raises(error):
+        compile_path(path).get(DATA)
+
+
+def test_wildcards_give_every_match():
+    assert compile_path('resp.data.*.name').get(DATA) == ['ann', 'bob']
+    assert compile_path('resp.by_id.*.name').get(DATA) == ['cy']
+    assert compile_path('resp.data.*.tags.*').get(DATA) == ['a']
+    assert compile_path('resp.data.*.missing').get(DATA) == []
+
+
+def test_compiled_once():
+    assert compile_path('resp.data.0') is compile_path('resp.data.0')
+    assert compile_path('resp.data.*').wildcard
+    assert not compile_path('resp.data.0').wildcard
+
+
+def test_matches_streamed_locations():
+    path = compile_path('resp.data.*.name')
+    assert path.matches(('data', 3, 'name'))
+    assert not path.matches(('data', 3))
+    assert compile_path('resp.by_id.7').matches(('by_id', '7'))
+    assert not compile_path('resp.data.-1').matches(('data', 1))
+
+
+def test_trie_resolves_every_path_in_one_walk():
+    paths = ('resp.count', 'resp.data.*.name', 'resp.data.0.name',
+             'resp.data.*.tags.*', 'resp.by_id.7.name', 'resp.missing')
+    found = compile_trie(paths).resolve(DATA)
+    assert {path.path: values for path, values in found.items()} == {
+        'resp.count': [2], 'resp.data.*.name': ['ann', 'bob'],
+        'resp.data.0.name': ['ann'], 'resp.data.*.tags.*': ['a'],
+        'resp.by_id.7.name': ['cy'], 'resp.missing': []}
+    assert compile_trie(paths) is compile_trie(paths)
+
+
+def test_trie_agrees_with_paths():
+    paths = ('resp.data.-1.name', 'resp.data.5', 'resp.count.name')
+    for path, values in compile_trie(paths).resolve(DATA).items():
+        assert values == path.find_all(DATA)
@@ -0,0 +1,26 @@
+"""Tests of the parallel test class runner."""
+import unittest
+
+import pytest
+
+from prodigyqa.runner import ParallelRunner
+
+
+class _Passing(unittest.TestCase):
+    def test_pass(self):
+        pass
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_class_error_is_reported_not_raised(tmp_path, workers):
+    durations = str(tmp_path / 'durations.json')
+    runner = ParallelRunner(workers, durations)
+    summary = runner.run([_Passing, 'Tests.missing_module.Missing'])
+    assert summary['passed'] == 1
+    assert summary['error'] == 1
+    error = [record for record in summary['records']
+             if record['outcome'] == 'error'][0]
+    assert error['test'] == 'Tests.missing_module.Missing'
+    assert 'missing_module' in error['details']
+    assert set(ParallelRunner(1, durations).durations) == {
+        '{}._Passing'.format(__name__), 'Tests.missing_module.Missing'}
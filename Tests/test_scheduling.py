@@ -0,0 +1,157 @@
+"""Tests of the client side rate limit and retries."""
+import time
+
+from email.utils import formatdate
+
+import pytest
+
+import requests
+
+from prodigyqa.scheduling import (RequestScheduler, TokenBucket,
+                                  is_idempotent, retry_after)
+
+
+class Clock(object):
+    """Clock double, sleeping moves it forward at once."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response(object):
+    """Response double."""
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _sender(clock, *outcomes):
+    """Return a request callable giving outcomes in turn."""
+    outcomes = list(outcomes)
+    calls = []
+
+    def request():
+        calls.append(clock())
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    request.calls = calls
+    return request
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('3', 3.0), ('0.5', 0.5), ('-2', 0.0), (None, None), ('soon', None)])
+def test_retry_after_seconds(value, seconds):
+    headers = {} if value is None else {'Retry-After': value}
+    assert retry_after(Response(headers=headers)) == seconds
+
+
+def test_retry_after_http_date():
+    date = formatdate(time.time() + 30, usegmt=True)
+    assert 28 < retry_after(Response(headers={'Retry-After': date})) <= 30
+    past = formatdate(time.time() - 30, usegmt=True)
+    assert retry_after(Response(headers={'Retry-After': past})) == 0.0
+
+
+def test_is_idempotent():
+    assert is_idempotent('get')
+    assert not is_idempotent('POST', {'Content-Type': 'text/plain'})
+    assert is_idempotent('POST', {'idempotency-key': 'abc'})
+
+
+def test_bucket_lets_burst_through_then_paces():
+    clock = Clock()
+    bucket = TokenBucket(rate=50, burst=3, clock=clock, sleep=clock.sleep)
+    assert [bucket.acquire() for _ in range(3)] == [0.0] * 3
+    assert [bucket.acquire() for _ in range(5)] == pytest.approx([0.02] * 5)
+    assert clock.now == pytest.approx(1000.1)
+
+
+def test_bucket_refills_while_idle():
+    clock = Clock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 1
+    assert [bucket.acquire() for _ in range(2)] == [0.0] * 2
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket()
+    assert sum(bucket.acquire() for _ in range(100)) == 0
+
+
+def test_pause_holds_callers():
+    clock = Clock()
+    bucket = TokenBucket(clock=clock, sleep=clock.sleep)
+    bucket.pause(0.1)
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert bucket.acquire() == 0.0
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+
+def test_retries_status_after_retry_after():
+    clock = Clock()
+    scheduler = RequestScheduler(retries=2, backoff=0.01, clock=clock,
+                                 sleep=clock.sleep)
+    limited = Response(429, {'Retry-After': '0.1'})
+    request = _sender(clock, limited, Response(200))
+    response = scheduler.send('GET', 'http://api.test/a', {}, request)
+    assert response.status_code == 200
+    assert limited.closed
+    assert 0.1 <= request.calls[1] - request.calls[0] <= 0.11
+
+
+def test_retries_connection_errors_then_raises():
+    clock = Clock()
+    scheduler = RequestScheduler(retries=1, backoff=0.01, clock=clock,
+                                 sleep=clock.sleep)
+    request = _sender(clock, requests.exceptions.ConnectionError(),
+                      requests.exceptions.ConnectionError())
+    with pytest.raises(requests.exceptions.ConnectionError):
+        scheduler.send('GET', 'http://api.test/a', {}, request)
+    assert len(request.calls) == 2
+    assert len(clock.sleeps) == 1
+
+
+def test_non_idempotent_requests_not_retried():
+    clock = Clock()
+    scheduler = RequestScheduler(retries=2, backoff=0.01, clock=clock,
+                                 sleep=clock.sleep)
+    request = _sender(clock, Response(503), Response(200))
+    assert scheduler.send('POST', 'http://api.test/a', {},
+                          request).status_code == 503
+    assert len(request.calls) == 1
+
+
+def test_long_retry_after_returned_not_waited():
+    clock = Clock()
+    scheduler = RequestScheduler(retries=2, max_backoff=1, clock=clock,
+                                 sleep=clock.sleep)
+    request = _sender(clock, Response(503, {'Retry-After': '120'}))
+    assert scheduler.send('GET', 'http://api.test/a', {},
+                          request).status_code == 503
+    assert clock.sleeps == []
+
+
+def test_one_bucket_per_host():
+    scheduler = RequestScheduler(rate=10)
+    assert scheduler.bucket('http://a.test/x') is scheduler.bucket(
+        'http://a.test/y')
+    assert scheduler.bucket('http://a.test/x') is not scheduler.bucket(
+        'http://b.test/x')
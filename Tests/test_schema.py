@@ -0,0 +1,90 @@
+"""Tests of the compiled JSON Schema validators."""
+import pytest
+
+from prodigyqa.schema import compile_schema
+
+RECORD = {
+    'type': 'object',
+    'required': ['id', 'status'],
+    'additionalProperties': False,
+    'properties': {
+        'id': {'type': 'integer', 'minimum': 1},
+        'name': {'type': 'string', 'minLength': 1, 'pattern': '^[a-z]'},
+        'status': {'enum': ['active', 'inactive']},
+        'tags': {'type': 'array', 'items': {'type': 'string'},
+                 'maxItems': 2, 'uniqueItems': True},
+    },
+}
+
+
+def test_valid_record_has_no_errors():
+    validate = compile_schema(RECORD)
+    assert validate({'id': 1, 'name': 'a', 'status': 'active',
+                     'tags': ['x', 'y']}) == []
+
+
+def test_every_failure_is_reported_with_its_path():
+    errors = compile_schema(RECORD)({'id': 0, 'name': 'A', 'tags': [1, 1, 2],
+                                     'extra': True})
+    assert ('resp', "missing 'status'") in errors
+    assert ('resp', "unexpected 'extra'") in errors
+    assert ('resp.id', 'below 1: 0') in errors
+    assert ('resp.tags.0', 'expected string, got int') in errors
+    assert len([path for path, _ in errors if path == 'resp.tags']) == 2
+
+
+def test_integers_exclude_booleans():
+    validate = compile_schema({'type': 'integer'})
+    assert validate(3) == [] and validate(3.0) == []
+    assert validate(True) == [('resp', 'expected integer, got bool')]
+
+
+def test_many_validates_each_record():
+    records = [{'id': 1, 'status': 'active'}, {'id': 2, 'status': 'gone'}]
+    errors = compile_schema(RECORD, many=True)(records, 'resp.data')
+    assert errors == [('resp.data.1.status',
+                       "'gone' not in ['active', 'inactive']")]
+
+
+def test_validators_are_cached_by_schema_content():
+    assert compile_schema(RECORD) is compile_schema(RECORD)
+    assert compile_schema(dict(RECORD)) is compile_schema(RECORD)
+    assert compile_schema(RECORD, many=True) is not compile_schema(RECORD)
+    assert compile_schema({'const': 1}) is not compile_schema(
+        {'const': True})
+
+
+def test_unique_items_follow_json_equality():
+    validate = compile_schema({'uniqueItems': True})
+    assert validate([1, True, 0, False, None, '1']) == []
+    assert validate([{'a': 1, 'b': [1]}, {'b': [1.0], 'a': 1}]) == [
+        ('resp', "duplicate item {'a': 1, 'b': [1.0]}")]
+    assert validate(list(range(50000))) == []
+
+
+def test_recursive_refs_and_combinators():
+    schema = {
+        '$defs': {'node': {'type': 'object', 'properties': {
+            'children': {'items': {'$ref': '#/$defs/node'}},
+            'value': {'oneOf': [{'type': 'integer'}, {'type': 'string'}]}}}},
+        '$ref': '#/$defs/node',
+    }
+    errors = compile_schema(schema)({'children': [{'children': [
+        {'value': 1.5}]}]})
+    assert errors == [('resp.children.0.children.0.value',
+                       '1.5 matches 0 of oneOf')]
+
+
+@pytest.mark.parametrize('schema', [
+    {'minItems': "0 or print('INJECTED') or 0"},
+    {'maxLength': 1.5},
+    {'minimum': '1'},
+    {'multipleOf': 0},
+    {'required': [1]},
+    {'type': 'integr'},
+    {'typo': 1},
+])
+def test_invalid_schemas_raise(schema, capsys):
+    with pytest.raises(AssertionError):
+        compile_schema(schema)
+    assert 'INJECTED' not in capsys.readouterr().out
@@ -0,0 +1,52 @@
+"""Tests of the background screenshot writer."""
+import threading
+
+from prodigyqa.screenshots import ScreenshotWriter
+
+
+class _SlowWriter(ScreenshotWriter):
+    """Writer whose writes wait for release to be set."""
+
+    def __init__(self, **kwargs):
+        super(_SlowWriter, self).__init__(**kwargs)
+        self.release = threading.Event()
+
+    def _write(self, png, path):
+        self.release.wait(5)
+        return super(_SlowWriter, self)._write(png, path)
+
+
+def test_frames_written_and_not_kept(tmp_path):
+    writer = ScreenshotWriter()
+    paths = [str(tmp_path / 'shots' / '{}.png'.format(i)) for i in range(5)]
+    futures = [writer.submit('frame{}'.format(i).encode(), path)
+               for i, path in enumerate(paths)]
+    writer.close()
+    assert [future.result() for future in futures] == paths
+    assert open(paths[3], 'rb').read() == b'frame3'
+    assert not writer._pending
+
+
+def test_submit_blocks_when_buffer_is_full(tmp_path):
+    writer = _SlowWriter(workers=1, max_pending=2)
+    for i in range(2):
+        writer.submit(b'png', str(tmp_path / '{}.png'.format(i)))
+    third = threading.Thread(target=writer.submit,
+                             args=(b'png', str(tmp_path / '2.png')))
+    third.start()
+    third.join(0.2)
+    assert third.is_alive()
+    assert len(writer._pending) == 2
+    writer.release.set()
+    third.join(5)
+    writer.close()
+    assert (tmp_path / '2.png').exists()
+
+
+def test_dedupe_writes_identical_frames_once(tmp_path):
+    writer = ScreenshotWriter(dedupe=True, max_pending=1)
+    first = writer.submit(b'same', str(tmp_path / 'a.png'))
+    second = writer.submit(b'same', str(tmp_path / 'b.png'))
+    writer.close()
+    assert second is first
+    assert not (tmp_path / 'b.png').exists()
@@ -0,0 +1,23 @@
+"""Tests of the pooled keep-alive sessions."""
+from prodigyqa.sessions import SessionPool
+
+
+def test_cookies_are_not_shared_between_requests(http_server):
+    http_server.routes['/login'] = lambda handler: (
+        200, {'Set-Cookie': 'sid=secret; Path=/'}, {})
+    http_server.routes['/other'] = lambda handler: (200, {}, {})
+    pool = SessionPool()
+    pool.session(http_server.url).get(http_server.url + '/login')
+    pool.session(http_server.url).get(http_server.url + '/other')
+    headers = http_server.requests[-1][2]
+    assert 'sid=secret' not in headers.get('Cookie', '')
+    pool.close()
+
+
+def test_connections_are_reused_across_sessions(http_server):
+    http_server.routes['/'] = lambda handler: (200, {}, {})
+    pool = SessionPool()
+    for _ in range(5):
+        pool.session(http_server.url).get(http_server.url + '/')
+    assert len(pool._adapters) == 1
+    pool.close()
@@ -0,0 +1,112 @@
+"""Tests of the incremental JSON parsing of streamed responses."""
+import json
+
+import pytest
+
+from prodigyqa.paths import compile_path
+from prodigyqa.streaming import StreamCheck, _basic_events, iter_matches
+
+DOCUMENT = {'count': 3, 'next': None, 'ok': True, 'ratio': -1.5e-3,
+            'data': [{'id': 1, 'name': 'zoë "z"', 'tags': []},
+                     {'id': 2, 'name': 'bob', 'tags': ['a', 'b']},
+                     {'id': 3, 'name': 'cy', 'tags': [{}]}]}
+
+
+def _chunks(document, size):
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _rebuild(events):
+    path = compile_path('resp')
+    return [value for _, value in iter_matches(events, [path])]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1024])
+def test_chunk_boundaries(size):
+    events = _basic_events(_chunks(DOCUMENT, size))
+    assert _rebuild(events) == [DOCUMENT]
+
+
+@pytest.mark.parametrize('text', ['{"a": tru}', '{"a": 1} x', '[1, @]'])
+def test_invalid_json_raises(text):
+    with pytest.raises(ValueError):
+        list(_basic_events([text.encode('utf-8')]))
+
+
+def test_iter_matches_yields_values_in_document_order():
+    events = _basic_events(_chunks(DOCUMENT, 5))
+    paths = [compile_path('resp.data.*.name'), compile_path('resp.count'),
+             compile_path('resp.data.1.tags')]
+    assert [(path.path, value) for path, value in
+            iter_matches(events, paths)] == [
+        ('resp.count', 3), ('resp.data.*.name', 'zoë "z"'),
+        ('resp.data.*.name', 'bob'), ('resp.data.1.tags', ['a', 'b']),
+        ('resp.data.*.name', 'cy')]
+
+
+def _check(assertion, member, path):
+    check = StreamCheck(assertion, member, compile_path(path))
+    for _, value in iter_matches(_basic_events(_chunks(DOCUMENT, 8)),
+                                 [check.path]):
+        check.feed(value)
+    return check.finish()
+
+
+@pytest.mark.parametrize('assertion, member, path, passes', [
+    ('equal', 3, 'resp.count', True),
+    ('equal', 4, 'resp.count', False),
+    ('not_equal', 4, 'resp.count', True),
+    ('in', 'a', 'resp.data.1.tags', True),
+    ('not_in', 'c', 'resp.data.1.tags', True),
+    ('in', 'bob', 'resp.data.*.name', True),
+    ('in', 'dan', 'resp.data.*.name', False),
+    ('not_in', 'bob', 'resp.data.*.name', False),
+    ('all_equal', 'bob', 'resp.data.*.name', False),
+    ('all_equal', None, 'resp.next', True),
+    ('equal', [1, 2, 3], 'resp.data.*.id', True),
+    ('not_equal', [1, 2], 'resp.data.*.id', True),
+    ('equal', 1, 'resp.missing', False),
+    ('not_in', 'x', 'resp.missing', False),
+    ('not_equal', 1, 'resp.missing', False),
+    ('not_in', 'x', 'resp.data.*.missing', True),
+    ('equal', [1, 2], 'resp.data.*.id', False),
+    ('equal', [1, 2, 3, 4], 'resp.data.*.id', False),
+    ('not_equal', [1, 2, 3, 4], 'resp.data.*.id', True),
+    ('not_equal', [1, 2, 4], 'resp.data.*.id', True),
+    ('equal', 3, 'resp.data.*.id', False),
+])
+def test_stream_checks(assertion, member, path, passes):
+    assert (_check(assertion, member, path) is None) == passes
+
+
+def test_check_decided_before_the_end():
+    check = StreamCheck('all_equal', 1, compile_path('resp.data.*.id'))
+    check.feed(1)
+    check.feed(2)
+    assert check.decided
+    check.feed(1)
+    assert '(match 2)' in check.finish()
+
+
+@pytest.mark.parametrize('member, message', [
+    ([1, 5, 3], '5 != 2 (match 2)'),
+    ([1], 'unexpected 2 (match 2, 1 expected)'),
+    ([1, 2, 3, 4], 'missing 4 (match 4, 3 found)'),
+])
+def test_wildcard_equal_reports_first_difference(member, message):
+    assert _check('equal', member, 'resp.data.*.id') == message
+
+
+def test_wildcard_equal_keeps_no_values():
+    check = StreamCheck('equal', [0] * 3, compile_path('resp.data.*'))
+    for _ in range(3):
+        check.feed(0)
+    assert check.finish() is None
+    assert not [name for name, value in vars(check).items()
+                if isinstance(value, list) and value is not check.member]
+
+
+def test_unknown_assertion_rejected():
+    with pytest.raises(AssertionError):
+        StreamCheck('almost_equal', 1, compile_path('resp.count'))
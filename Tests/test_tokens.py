@@ -0,0 +1,143 @@
+"""Tests of the cached auth tokens."""
+import base64
+
+import json
+
+import threading
+
+import time
+
+import pytest
+
+from prodigyqa.tokens import TokenProvider, jwt_expiry
+
+URL = 'https://auth.example.com/login'
+
+
+class Response(object):
+    """Login response double."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class Clock(object):
+    """Clock double, moved forward by the tests."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Login(object):
+    """Login double handing out numbered tokens.
+
+    Blocked logins wait for release to be set, so tests can act while
+    a login is in flight.
+    """
+
+    def __init__(self, expires_in=3600, blocked=False):
+        self.expires_in = expires_in
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+
+    def __call__(self, url, credentials):
+        self.calls += 1
+        self.entered.set()
+        assert self.release.wait(5)
+        return Response({'token': 't{}'.format(self.calls),
+                         'expires_in': self.expires_in})
+
+
+def _jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode(
+        'utf-8')).decode('ascii').rstrip('=')
+    return 'header.{}.signature'.format(payload)
+
+
+def test_concurrent_callers_share_one_login():
+    provider = TokenProvider()
+    login = Login(blocked=True)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(provider.get(
+        URL, {'user': 'a'}, login))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    assert login.entered.wait(5)
+    login.release.set()
+    for thread in threads:
+        thread.join()
+    assert tokens == ['t1'] * 10
+    assert login.calls == provider.logins == 1
+
+
+def test_tokens_cached_per_credentials():
+    provider = TokenProvider()
+    login = Login()
+    assert provider.get(URL, {'user': 'a'}, login) == 't1'
+    assert provider.get(URL, {'user': 'b'}, login) == 't2'
+    assert provider.get(URL, {'user': 'a'}, login) == 't1'
+    provider.invalidate(URL, {'user': 'a'})
+    assert provider.get(URL, {'user': 'a'}, login) == 't3'
+
+
+def test_token_refreshed_within_margin():
+    clock = Clock()
+    provider = TokenProvider(refresh_margin=60, clock=clock)
+    login = Login(expires_in=90)
+    assert provider.get(URL, {}, login) == 't1'
+    clock.now += 29
+    assert provider.get(URL, {}, login) == 't1'
+    clock.now += 2
+    assert provider.get(URL, {}, login) == 't2'
+    clock.now += 200
+    assert provider.get(URL, {}, login) == 't3'
+
+
+def test_valid_token_served_while_another_thread_refreshes():
+    clock = Clock()
+    provider = TokenProvider(refresh_margin=60, clock=clock)
+    login = Login(expires_in=90)
+    provider.get(URL, {}, login)
+    clock.now += 60
+    login.entered.clear()
+    login.release.clear()
+    refresher = threading.Thread(target=provider.get, args=(URL, {}, login))
+    refresher.start()
+    assert login.entered.wait(5)
+    assert provider.get(URL, {}, login) == 't1'
+    assert login.calls == 2
+    login.release.set()
+    refresher.join()
+    assert provider.get(URL, {}, login) == 't2'
+    assert provider.logins == 2
+
+
+def test_failed_login_raises():
+    provider = TokenProvider()
+    with pytest.raises(AssertionError):
+        provider.get(URL, {}, lambda url, credentials: Response({}, 401))
+    with pytest.raises(AssertionError):
+        provider.get(URL, {}, lambda url, credentials: Response({}))
+
+
+def test_jwt_expiry():
+    assert jwt_expiry(_jwt({'exp': 1700000000})) == 1700000000
+    assert jwt_expiry(_jwt({'sub': 'a'})) is None
+    assert jwt_expiry('opaque-token') is None
+    provider = TokenProvider(expiry_path='resp.missing')
+    token = _jwt({'exp': time.time() + 3600})
+    login = Login()
+    provider.get(URL, {}, lambda url, credentials: Response(
+        {'token': token}))
+    assert provider.get(URL, {}, login) == token
+    assert login.calls == 0
@@ -0,0 +1,46 @@
+"""Tests of the content addressed baseline store."""
+import multiprocessing
+
+import os
+
+from prodigyqa.visual import BaselineStore
+
+
+def _store(root):
+    return BaselineStore(str(root), compress_level=None)
+
+
+def _put_many(root, worker):
+    store = _store(root)
+    for i in range(20):
+        store.put('page/{}/{}'.format(worker, i), b'png')
+
+
+def test_identical_baselines_stored_once(tmp_path):
+    store = _store(tmp_path)
+    first = store.put('home/header', b'header')
+    assert store.put('about/header', b'header') == first
+    store.put('..', b'other')
+    assert store.get('about/header') == b'header'
+    assert store.get('..') == b'other'
+    assert store.get('missing') is None
+    assert len(os.listdir(str(tmp_path / 'objects'))) == 2
+
+
+def test_prune_keeps_used_images(tmp_path):
+    store = _store(tmp_path)
+    store.put('page', b'old')
+    store.put('page', b'new')
+    assert store.prune() == 1
+    assert store.get('page') == b'new'
+
+
+def test_concurrent_processes_keep_every_name(tmp_path):
+    workers = [multiprocessing.Process(target=_put_many,
+                                       args=(tmp_path, worker))
+               for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(_store(tmp_path).names()) == 80
@@ -0,0 +1,88 @@
+"""Tests of the explicit wait engine and its conditions."""
+import pytest
+
+from selenium.common import exceptions as selenium_exceptions
+
+from prodigyqa.waits import (Budget, WaitEngine, clickable, present,
+                             text_contains, visible)
+
+BUTTON = {'by': 'id', 'locatorvalue': 'save'}
+
+
+class Element(object):
+    """Element double whose state changes after some lookups."""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def is_displayed(self):
+        return self.driver.finds >= self.driver.visible_after
+
+    def is_enabled(self):
+        return True
+
+    @property
+    def text(self):
+        return 'Saved' if self.driver.finds >= 2 else 'Saving'
+
+
+class Driver(object):
+    """Driver double where the element appears after a few polls."""
+
+    def __init__(self, appears_after=0, visible_after=0):
+        self.appears_after = appears_after
+        self.visible_after = visible_after
+        self.finds = 0
+
+    def find_element(self, by, value):
+        self.finds += 1
+        if self.finds <= self.appears_after:
+            raise selenium_exceptions.NoSuchElementException(value)
+        return Element(self)
+
+
+def _engine(timeout=1):
+    return WaitEngine(timeout, poll=0.001, max_poll=0.01)
+
+
+def test_until_returns_element_once_present():
+    driver = Driver(appears_after=3)
+    engine = _engine()
+    assert isinstance(engine.until(driver, present(BUTTON)), Element)
+    assert driver.finds == 4
+    assert engine.waited > 0
+
+
+def test_combined_conditions_find_element_once_per_poll():
+    driver = Driver(visible_after=3)
+    assert _engine().until(driver, clickable(BUTTON))
+    assert driver.finds == 3
+
+
+def test_or_condition():
+    driver = Driver(visible_after=10)
+    condition = visible(BUTTON) | text_contains(BUTTON, 'Saved')
+    assert _engine().until(driver, condition)
+    assert driver.finds == 2
+
+
+def test_timeout_raises_last_ignored_exception():
+    driver = Driver(appears_after=1000)
+    with pytest.raises(selenium_exceptions.NoSuchElementException):
+        _engine(0.05).until(driver, present(BUTTON))
+
+
+def test_timeout_on_false_condition():
+    driver = Driver(visible_after=1000)
+    with pytest.raises(selenium_exceptions.TimeoutException) as error:
+        _engine(0.05).until(driver, visible(BUTTON))
+    assert 'visible' in str(error.value)
+
+
+def test_budget_shared_between_waits():
+    engine = _engine()
+    budget = Budget(0.05)
+    engine.until(Driver(appears_after=1000), lambda driver: True, budget)
+    with pytest.raises(selenium_exceptions.NoSuchElementException):
+        engine.until(Driver(appears_after=1000), present(BUTTON), budget)
+    assert budget.expired
@@ -1,50 +1,181 @@
 # -*- coding: utf-8 -*-
 """Rest API Module."""
 import unittest
-import requests
-import logging
+import asyncio
+import atexit
+import functools
+import itertools
+import os
+import reprlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from requests.exceptions import InvalidURL
 from loguru import logger
+from prodigyqa.cassette import CASSETTE, CASSETTE_MODE, cassette_pool
+from prodigyqa.loadtest import LoadRunner
+from prodigyqa.paths import compile_path, compile_trie
+from prodigyqa.scheduling import RequestScheduler
+from prodigyqa.schema import compile_schema
+from prodigyqa.sessions import SESSION_POOL
+from prodigyqa.streaming import (CHUNK_SIZE, StreamCheck, iter_matches,
+                                 response_events)
+from prodigyqa.tokens import TOKEN_PROVIDER
+
+# Threads sending the requests of the coroutines, for the whole process.
+ASYNC_WORKERS = int(os.environ.get('PRODIGYQA_ASYNC_WORKERS', 32))
+
+
+class _AsyncExecutor(object):
+    """Thread pool shared by all async requests, started on first use."""
+
+    def __init__(self, workers):
+        """Executor declarations.
+
+        :param workers: threads sending requests.
+        """
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the running thread pool."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers)
+            return self._pool
+
+    def close(self):
+        """Stop the threads; a new pool is started by the next request."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+ASYNC_EXECUTOR = _AsyncExecutor(ASYNC_WORKERS)
+
+atexit.register(ASYNC_EXECUTOR.close)
 
 
 class ApiTester(unittest.TestCase):
-    """REST Api basic methods."""
+    """REST Api basic methods.
+
+    Requests go through session_pool, which keeps connections to each
+    host open across requests and tests. Assign a
+    prodigyqa.sessions.SessionPool to change pool size, retries or
+    keep-alive for a test class.
+
+    scheduler rate limits the requests to each host and retries 429 and
+    503 responses and connection errors of idempotent requests; assign a
+    prodigyqa.scheduling.RequestScheduler to change it.
+
+    With cassette set to a file, responses are recorded to it or
+    replayed from it without network, as cassette_mode tells (see
+    prodigyqa.cassette.Cassette).
+    """
+
+    session_pool = SESSION_POOL
+
+    cassette = CASSETTE
+
+    cassette_mode = CASSETTE_MODE
+
+    token_provider = TOKEN_PROVIDER
+
+    token = None
+
+    _auth_login = None
+
+    scheduler = RequestScheduler()
+
+    max_concurrency = None
 
     def __init__(self, *args, **kwargs):
         """Init Method for webdriver declarations."""
         super(ApiTester, self).__init__(*args, **kwargs)
 
     def _get_session_token(self, auth_type=None, **kwargs):
-        """Input kwargs will change as per application authentication type.
+        """Set the token sent by apirequest and return it.
 
+        Dynamic tokens come from token_provider, cached per credentials
+        across tests and refreshed before they expire, so the login url
+        is only requested again once the token runs out.
         : param auth_type: (Optional) authorization type for applications api's
-            default value is None.
-        : param **kwargs: Optional that application request methods takes
-            to generate session token.
+            default value is None, 'static' or 'dynamic'.
+        : param **kwargs: token for static auth, url and credentials (the
+            login request json) for dynamic auth.
         """
         if not auth_type:
-            pass
-        elif auth_type.lower() == "static" and not kwargs["token"]:
+            return None
+        elif auth_type.lower() == "static" and kwargs.get("token"):
+            self._auth_login = None
             self.token = kwargs["token"]
-            return kwargs["token"]
+            return self.token
         elif (auth_type.lower() == "dynamic" and
-              not kwargs["credentials"] and
-              not kwargs["url"]):
-            try:
-                if self._validate_kwargs(**kwargs) and kwargs['url']:
-                    resp = self._post_method(**kwargs)
-                    return resp['token']
-            except InvalidURL:
-                logging.warn("The URL provided is invalid, please recheck")
+              kwargs.get("credentials") and
+              kwargs.get("url")):
+            self._auth_login = (kwargs['url'], kwargs['credentials'])
+            return self._current_token()
+        else:
+            logger.warning("{} auth needs {}".format(auth_type, (
+                'a token' if auth_type.lower() == 'static' else
+                'url and credentials')))
+
+    def _current_token(self):
+        """Return the token to send, refreshed if it is about to expire."""
+        if self._auth_login:
+            url, credentials = self._auth_login
+            self.token = self.token_provider.get(url, credentials,
+                                                 self._login)
+        return self.token
+
+    def _login(self, url, credentials):
+        """Send the login request of dynamic auth."""
+        return self._post_method(url=url, json=credentials)
+
+    def _with_token(self, kwargs):
+        """Return kwargs with the auth header added, unless already set."""
+        token = self._current_token()
+        header = self.token_provider.header
+        headers = dict(kwargs.get('headers') or {})
+        if not token or any(name.lower() == header.lower()
+                            for name in headers):
+            return kwargs
+        headers[header] = self.token_provider.header_value(token)
+        return dict(kwargs, headers=headers)
 
     def apirequest(self, method='GET', **kwargs):
         """Send request to class:'request' method object.
 
+        The token set by _get_session_token is sent in the auth header;
+        a 401 response to a dynamic token logs in again and resends once.
         :param method: method for the new :class:'request' method object.
             this method might be either of 'GET', 'POST', 'PUT', 'PATCH'
             and 'DELETE'.
         :param **kwargs: Optional arguments that 'request' method method takes.
         """
+        response = self._send(method, **self._with_token(kwargs))
+        if (self._auth_login and response is not None and
+                response.status_code == 401):
+            self.token_provider.invalidate(*self._auth_login)
+            response = self._send(method, **self._with_token(kwargs))
+        return response
+
+    def _send(self, method, **kwargs):
+        """Send a request through the scheduler's rate limit and retries."""
+        if not kwargs.get('url'):
+            return self._dispatch(method, **kwargs)
+        replaying = self.cassette and self.cassette_mode == 'replay'
+        try:
+            return self.scheduler.send(
+                method, kwargs['url'], kwargs.get('headers'),
+                functools.partial(self._dispatch, method, **kwargs),
+                limit=not replaying)
+        except InvalidURL:
+            logger.warning("The URL provided is invalid, please recheck")
+
+    def _dispatch(self, method, **kwargs):
+        """Send a request with the method's _*_method."""
         if method.upper() == "GET":
             return self._get_method(**kwargs)
 
@@ -60,6 +191,110 @@ class ApiTester(unittest.TestCase):
         elif method.upper() == "DELETE":
             return self._delete_method(**kwargs)
 
+    async def aapirequest(self, method='GET', **kwargs):
+        """Coroutine sending a request without blocking the event loop.
+
+        Takes the same arguments as apirequest and returns the same
+        requests.Response, so the assert_*_resp methods apply as usual.
+        At most max_concurrency (or the session pool size) of this
+        tester's requests are in flight at once.
+        """
+        async with self._async_slots():
+            return await asyncio.get_event_loop().run_in_executor(
+                ASYNC_EXECUTOR.get(),
+                functools.partial(self.apirequest, method, **kwargs))
+
+    async def agather_requests(self, calls, limit=None,
+                               return_exceptions=False):
+        """Coroutine sending many requests concurrently.
+
+        :param calls: apirequest keyword arguments per request, e.g.
+            [{'method': 'GET', 'url': url}, ...].
+        :param limit: (optional) requests in flight at once,
+            max_concurrency or the session pool size by default, at
+            most ASYNC_WORKERS.
+        :param return_exceptions: return exceptions in place of their
+            response instead of raising the first one.
+        :return: responses in the order of calls.
+        :rtype: list
+        """
+        limit = limit or self._concurrency()
+        semaphore = asyncio.Semaphore(limit)
+        loop = asyncio.get_event_loop()
+
+        async def send(call):
+            async with semaphore:
+                return await loop.run_in_executor(
+                    ASYNC_EXECUTOR.get(), functools.partial(
+                        self.apirequest, **call))
+        return await asyncio.gather(*[send(dict(call)) for call in calls],
+                                    return_exceptions=return_exceptions)
+
+    def gather_requests(self, calls, limit=None, return_exceptions=False):
+        """Send many requests concurrently from synchronous test code.
+
+        See agather_requests for the arguments.
+        :return: responses in the order of calls.
+        :rtype: list
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.agather_requests(
+                calls, limit, return_exceptions))
+        finally:
+            loop.close()
+
+    def load_test(self, scenario, concurrency=10, rate=None, duration=None,
+                  iterations=None, **slo):
+        """Replay a request scenario as a load test and check its SLOs.
+
+        :param scenario: apirequest kwargs of the requests to replay in
+            turn, e.g. [{'method': 'GET', 'url': url}], or a callable
+            running one iteration, e.g. a functional test method; it
+            fails by raising (assert_*_resp) or returning a response
+            with an error status.
+        :param concurrency: worker threads.
+        :param rate: (optional) iterations started per second.
+        :param duration: (optional) seconds to run.
+        :param iterations: (optional) iterations to run.
+        :param slo: limits on the result summary, e.g. p95=200 (ms),
+            p99=500, error_rate=0.01, throughput=50 (req/s, a minimum).
+        :return: prodigyqa.loadtest.LoadResult
+        """
+        if not callable(scenario):
+            calls = itertools.cycle([dict(call) for call in scenario])
+            lock = threading.Lock()
+
+            def replay():
+                with lock:
+                    call = dict(next(calls))
+                response = self.apirequest(**call)
+                if response is None:
+                    raise AssertionError("Request {} was rejected".format(
+                        call))
+                return response
+            scenario = replay
+        result = LoadRunner(scenario, concurrency, rate, duration,
+                            iterations).run()
+        logger.info("Load test results:\n" + result.report())
+        missed = result.check_slo(**slo)
+        if missed:
+            raise AssertionError("SLO missed: {}".format(', '.join(missed)))
+        return result
+
+    def _concurrency(self):
+        """Return the number of requests sent at once."""
+        return self.max_concurrency or self.session_pool.pool_maxsize
+
+    def _async_slots(self):
+        """Return the semaphore capping aapirequest on the running loop."""
+        loop = asyncio.get_event_loop()
+        slots = getattr(self, '_slots', None)
+        if slots is None or slots[0] is not loop:
+            slots = self._slots = (loop, asyncio.Semaphore(
+                self._concurrency()))
+        return slots[1]
+
     def _get_method(self, **kwargs):
         """Send a GET request.
 
@@ -72,9 +307,9 @@ class ApiTester(unittest.TestCase):
         """
         try:
             if self._validate_kwargs(**kwargs) and kwargs['url']:
-                return requests.get(**kwargs)
+                return self._session(kwargs['url']).get(**kwargs)
         except InvalidURL:
-            logger.warn("The URL provided is invalid, please recheck")
+            logger.warning("The URL provided is invalid, please recheck")
 
     def _post_method(self, **kwargs):
         """Send a POST request.
@@ -93,9 +328,9 @@ class ApiTester(unittest.TestCase):
                 if kwargs['url']:
                     if (('json' in kwargs and kwargs['json']) or
                             ('data' in kwargs and kwargs['data'])):
-                        return requests.post(**kwargs)
+                        return self._session(kwargs['url']).post(**kwargs)
         except InvalidURL:
-            logger.warn("The URL provided is invalid, please recheck")
+            logger.warning("The URL provided is invalid, please recheck")
 
     def _put_method(self, **kwargs):
         """Send a PUT request.
@@ -113,9 +348,9 @@ class ApiTester(unittest.TestCase):
             if kwargs['url']:
                 if (('json' in kwargs and kwargs['json']) or
                         ('data' in kwargs and kwargs['data'])):
-                    return requests.put(**kwargs)
+                    return self._session(kwargs['url']).put(**kwargs)
         except InvalidURL:
-            logger.warn("The URL provided is invalid, please recheck")
+            logger.warning("The URL provided is invalid, please recheck")
 
     def _patch_method(self, **kwargs):
         """Send a PATCH request.
@@ -133,9 +368,9 @@ class ApiTester(unittest.TestCase):
             if kwargs['url']:
                 if (('json' in kwargs and kwargs['json']) or
                         ('data' in kwargs and kwargs['data'])):
-                    return requests.patch(**kwargs)
+                    return self._session(kwargs['url']).patch(**kwargs)
         except InvalidURL:
-            logger.warn("The URL provided is invalid, please recheck")
+            logger.warning("The URL provided is invalid, please recheck")
 
     def _delete_method(self, **kwargs):
         """Send a DELETE request.
@@ -147,9 +382,16 @@ class ApiTester(unittest.TestCase):
         """
         try:
             if self._validate_kwargs(**kwargs) and kwargs['url']:
-                return requests.delete(**kwargs)
+                return self._session(kwargs['url']).delete(**kwargs)
         except InvalidURL:
-            logger.warn("The URL provided is invalid,please recheck")
+            logger.warning("The URL provided is invalid,please recheck")
+
+    def _session(self, url):
+        """Return the pooled session for the host of url."""
+        if self.cassette:
+            return cassette_pool(self.cassette, self.cassette_mode,
+                                 self.session_pool).session(url)
+        return self.session_pool.session(url)
 
     def _validate_kwargs(self, **kwargs):
         """
@@ -199,15 +441,12 @@ class ApiTester(unittest.TestCase):
         stand_kw = ["method", "url", "params", "data", "json",
                     "headers", "cookies", "files", "auth", "timeout",
                     "allow_redirects", "proxies", "verify", "stream", "cert"]
-        try:
-            non_stand_kw = [
-                key for key in kwargs.keys() if key not in stand_kw]
-            if not len(non_stand_kw):
-                return True
-            else:
-                raise KeyError("%s keywords are invalid" % non_stand_kw)
-        except KeyError as e:
-            logger.warning(e)
+        non_stand_kw = [
+            key for key in kwargs.keys() if key not in stand_kw]
+        if not len(non_stand_kw):
+            return True
+        else:
+            raise KeyError("%s keywords are invalid" % non_stand_kw)
 
     def assert_in_resp(self, resp, member, container):
         """Check whether response data member contain input member.
@@ -253,21 +492,156 @@ class ApiTester(unittest.TestCase):
         actual_val = self._get_val_from_resp_by_path(resp, container)
         return self.assertNotEqual(member, actual_val)
 
+    def assert_all_equal_resp(self, resp, member, container):
+        """Check whether every value matching a wildcard path is member.
+
+        :parm resp: response to validate.
+        :parm member: value expected at every match.
+        :parm container: response key path in dot format
+            which should starts with 'resp.'. example: resp.data.*.name
+        """
+        actual_vals = self.find_all_in_resp(resp, container)
+        if not actual_vals:
+            raise AssertionError("Nothing found at '{}'".format(container))
+        mismatches = [val for val in actual_vals if val != member]
+        if mismatches:
+            raise AssertionError(
+                "{} of {} values at '{}' are not {!r}: {!r}".format(
+                    len(mismatches), len(actual_vals), container, member,
+                    mismatches[:10]))
+
+    def assert_resp_many(self, resp, expectations):
+        """Check many key paths in one pass, reporting every failure.
+
+        Paths are grouped by shared prefix, so the response is walked
+        once instead of once per assertion.
+        :parm resp: response to validate.
+        :parm expectations: {container: expectation}, the expectation
+            being the expected value or an (assertion, member) tuple,
+            assertion being 'equal', 'not_equal', 'in', 'not_in' or
+            'all_equal' as in the assert_*_resp methods.
+            example: {'resp.count': 3, 'resp.data.*.status':
+            ('all_equal', 'active')}
+        """
+        trie = compile_trie(tuple(expectations))
+        found = trie.resolve(resp)
+        failures = []
+        for path, expected in zip(trie.paths, expectations.values()):
+            values = found[path]
+            if not values and not path.wildcard:
+                failures.append('{}: missing'.format(path.path))
+                continue
+            if (isinstance(expected, tuple) and len(expected) == 2 and
+                    expected[0] in StreamCheck.ASSERTIONS):
+                assertion, member = expected
+            elif not path.wildcard:
+                # Plain equality, the common case, without a StreamCheck.
+                if values[0] != expected:
+                    failures.append('equal {}: {} != {}'.format(
+                        path.path, reprlib.repr(expected),
+                        reprlib.repr(values[0])))
+                continue
+            else:
+                assertion, member = 'equal', expected
+            check = StreamCheck(assertion, member, path)
+            for value in values:
+                check.feed(value)
+            error = check.finish()
+            if error is not None:
+                failures.append('{} {}: {}'.format(assertion, path.path,
+                                                   error))
+        if failures:
+            raise AssertionError('{} of {} assertions failed:\n{}'.format(
+                len(failures), len(expectations), '\n'.join(failures)))
+
+    def find_all_in_resp(self, resp, path):
+        """Return all values matching a path, e.g. resp.data.*.name.
+
+        :parm resp: response
+        :parm path: key path in dot format which should starts with 'resp.'.
+        :rtype: list
+        """
+        return compile_path(path).find_all(resp)
+
+    def assert_matches_schema(self, resp, schema, container=None,
+                              each=False, max_errors=20):
+        """Check a response against a JSON Schema, reporting all failures.
+
+        The schema is compiled once into a validator function and reused
+        by every later call with the same schema object.
+        :parm resp: response to validate.
+        :parm schema: JSON Schema dict, see prodigyqa.schema for the
+            supported keywords.
+        :parm container: (optional) response key path in dot format of
+            the part to validate. example: resp.data
+        :parm each: validate every record of the list at container
+            against schema, instead of the list itself.
+        :parm max_errors: failures listed in the message.
+        """
+        data = resp
+        if container:
+            data = self._get_val_from_resp_by_path(resp, container)
+        errors = compile_schema(schema, each)(data, container or 'resp')
+        if errors:
+            lines = ['{}: {}'.format(path, message)
+                     for path, message in errors[:max_errors]]
+            if len(errors) > max_errors:
+                lines.append('... {} more'.format(len(errors) - max_errors))
+            raise AssertionError('{} schema errors:\n{}'.format(
+                len(errors), '\n'.join(lines)))
+
+    def iter_stream_resp(self, resp, container, chunk_size=CHUNK_SIZE):
+        """Yield the values at a path while a response streams in.
+
+        Only the matched values are kept in memory, not the document.
+        :parm resp: response requested with stream=True.
+        :parm container: response key path in dot format
+            which should starts with 'resp.'. example: resp.data.*.name
+        :parm chunk_size: bytes read at once.
+        """
+        for _, value in iter_matches(response_events(resp, chunk_size),
+                                     [compile_path(container)]):
+            yield value
+
+    def assert_stream_resp(self, resp, checks, chunk_size=CHUNK_SIZE):
+        """Check path assertions on a response while it streams in.
+
+        The body is parsed incrementally and only values at the checked
+        paths are built, so very large responses don't have to fit in
+        memory. Reading stops as soon as every check is settled.
+        :parm resp: response requested with stream=True.
+        :parm checks: (assertion, member, container) tuples, assertion
+            being 'in', 'not_in', 'equal', 'not_equal' or 'all_equal',
+            e.g. [('all_equal', 'active', 'resp.data.*.status')].
+        :parm chunk_size: bytes read at once.
+        """
+        checks = [StreamCheck(assertion, member, compile_path(container))
+                  for assertion, member, container in checks]
+        by_path = {}
+        for check in checks:
+            by_path.setdefault(check.path, []).append(check)
+        try:
+            for path, value in iter_matches(
+                    response_events(resp, chunk_size), list(by_path)):
+                for check in by_path[path]:
+                    check.feed(value)
+                if all(check.decided for check in checks):
+                    break
+        finally:
+            resp.close()
+        failures = ['{} {}: {}'.format(check.assertion, check.path.path,
+                                       check.finish())
+                    for check in checks if check.finish() is not None]
+        if failures:
+            raise AssertionError('\n'.join(failures))
+
     def _get_val_from_resp_by_path(self, resp, path):
         """Get value from response by dot format key path of response .
 
+        Paths are compiled once and cached; a '*' segment matches every
+        item and makes the value the list of all matches.
         :parm resp: response
         :parm path: key path in dot format which should starts with 'resp.'.
         example: resp.data.0.name
         """
-        val = ''
-        items = path.split('.')
-        for index in range(len(items)):
-            if index == 0:
-                val = items[index]
-            else:
-                try:
-                    val += '[%s]' % int(items[index])
-                except ValueError:
-                    val += "['%s']" % str(items[index])
-        return eval(val)
+        return compile_path(path).get(resp)
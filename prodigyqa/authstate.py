@@ -0,0 +1,161 @@
+"""Snapshots of logged in browser state: cookies and web storage."""
+import json
+
+import os
+
+import time
+
+from urllib.parse import urlparse
+
+STORAGE_SCRIPT = '''
+function dump(storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) {
+        items[storage.key(i)] = storage.getItem(storage.key(i));
+    }
+    return items;
+}
+return [location.origin, dump(window.localStorage),
+        dump(window.sessionStorage)];
+'''
+
+RESTORE_STORAGE_SCRIPT = '''
+var local = arguments[0], session = arguments[1], key;
+for (key in local) { window.localStorage.setItem(key, local[key]); }
+for (key in session) { window.sessionStorage.setItem(key, session[key]); }
+'''
+
+# Run on every new document of the tab; fills the web storage of the
+# snapshot's origin once, the marker in sessionStorage being per tab and
+# origin. Storage can't be written before the tab opens the origin.
+INIT_STORAGE_SCRIPT = '''
+(function (origin, local, session) {
+    if (location.origin !== origin ||
+            sessionStorage.getItem('__prodigyqaRestored')) {
+        return;
+    }
+    var key;
+    for (key in local) { localStorage.setItem(key, local[key]); }
+    for (key in session) { sessionStorage.setItem(key, session[key]); }
+    sessionStorage.setItem('__prodigyqaRestored', '1');
+})({origin}, {local}, {session});
+'''
+
+# Fields of CDP cookies accepted back by Network.setCookies.
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly',
+                 'sameSite', 'expires')
+
+_loaded = {}
+
+
+def capture_state(driver):
+    """Return cookies and web storage of the current page's origin.
+
+    Cookies of all domains (httpOnly ones included) are read through
+    CDP when the driver supports it.
+    :rtype: dict
+    """
+    origin, local, session = driver.execute_script(STORAGE_SCRIPT)
+    if hasattr(driver, 'execute_cdp_cmd'):
+        cookies = driver.execute_cdp_cmd('Network.getAllCookies',
+                                         {})['cookies']
+    else:
+        cookies = driver.get_cookies()
+    return {'origin': origin, 'url': driver.current_url,
+            'created': time.time(), 'cookies': cookies,
+            'local_storage': local, 'session_storage': session}
+
+
+def save_state(state, path):
+    """Write a state returned by capture_state to a json file."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'w') as f:
+        json.dump(state, f)
+    os.replace(temporary, path)
+    _loaded[path] = (os.path.getmtime(path), state)
+
+
+def load_state(path, max_age=None):
+    """Return the state saved in path, None when missing or stale.
+
+    The parsed file is kept in memory until it changes on disk.
+    :param max_age: (optional) seconds after which a snapshot is stale.
+        Snapshots holding an expired cookie are stale too.
+    """
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = mtime, json.load(f)
+        _loaded[path] = cached
+    state = cached[1]
+    now = time.time()
+    if max_age is not None and now - state['created'] > max_age:
+        return None
+    for cookie in state['cookies']:
+        expires = cookie.get('expires', cookie.get('expiry', -1))
+        if not cookie.get('session') and 0 < expires < now:
+            return None
+    return state
+
+
+def restore_state(driver, state):
+    """Put the cookies and storage of a snapshot into driver.
+
+    With CDP nothing is loaded: cookies go through Network.setCookies
+    and web storage is filled when the tab first opens the origin, which
+    also works from about:blank.
+    :return: identifier of the script filling web storage, to remove
+        with Page.removeScriptToEvaluateOnNewDocument; None if none.
+    """
+    if not hasattr(driver, 'execute_cdp_cmd'):
+        _restore_by_page(driver, state)
+        return None
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setCookies', {'cookies': [
+        _cdp_cookie(cookie) for cookie in state['cookies']]})
+    if not state['local_storage'] and not state['session_storage']:
+        return None
+    source = INIT_STORAGE_SCRIPT.replace(
+        '{origin}', json.dumps(state['origin'])).replace(
+            '{local}', json.dumps(state['local_storage'])).replace(
+                '{session}', json.dumps(state['session_storage']))
+    return driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                                  {'source': source})['identifier']
+
+
+def _cdp_cookie(cookie):
+    """Return a cookie in the form taken by Network.setCookies."""
+    restored = {field: cookie[field] for field in COOKIE_FIELDS
+                if field in cookie}
+    if 'expiry' in cookie:
+        # Cookie read by get_cookies instead of CDP.
+        restored['expires'] = cookie['expiry']
+    if cookie.get('session') or restored.get('expires', 0) < 0:
+        restored.pop('expires', None)
+    return restored
+
+
+def _restore_by_page(driver, state):
+    """Restore a snapshot by loading its page, for drivers without CDP."""
+    driver.get(state['url'])
+    for cookie in state['cookies']:
+        cookie = {key: value for key, value in cookie.items()
+                  if key in COOKIE_FIELDS or key == 'expiry'}
+        domain = cookie.get('domain', '').lstrip('.')
+        host = urlparse(state['url']).hostname or ''
+        if host == domain or host.endswith('.' + domain):
+            cookie.pop('sameSite', None)
+            if 'expires' in cookie:
+                expires = cookie.pop('expires')
+                if expires > 0:
+                    cookie['expiry'] = int(expires)
+            driver.add_cookie(cookie)
+    driver.execute_script(RESTORE_STORAGE_SCRIPT, state['local_storage'],
+                          state['session_storage'])
+    driver.refresh()
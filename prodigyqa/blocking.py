@@ -0,0 +1,86 @@
+"""Block requests of chosen resource types and domains through CDP."""
+from loguru import logger
+
+import weakref
+
+RESOURCE_PATTERNS = {
+    'images': ('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp',
+               'avif'),
+    'fonts': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': ('mp4', 'webm', 'ogg', 'mp3', 'wav', 'm4a'),
+    'stylesheets': ('css',),
+    'analytics': ('google-analytics.com', 'googletagmanager.com',
+                  'doubleclick.net', 'connect.facebook.net', 'hotjar.com',
+                  'segment.io', 'cdn.segment.com', 'mixpanel.com',
+                  'newrelic.com', 'nr-data.net', 'optimizely.com'),
+}
+
+# Categories listing domains instead of file extensions.
+DOMAIN_CATEGORIES = ('analytics',)
+
+_applied = weakref.WeakKeyDictionary()
+
+
+def domain_patterns(domain):
+    """Return the url patterns matching a domain and its subdomains."""
+    return ['*://{}/*'.format(domain), '*://*.{}/*'.format(domain)]
+
+
+def extension_patterns(extension):
+    """Return the url patterns matching files with an extension."""
+    return ['*.{}'.format(extension), '*.{}?*'.format(extension)]
+
+
+def blocked_url_patterns(resources=(), domains=(), urls=()):
+    """Return the Network.setBlockedURLs patterns for what is blocked.
+
+    :param resources: categories of RESOURCE_PATTERNS, e.g. ('images',
+        'fonts', 'analytics').
+    :param domains: domains blocked along with their subdomains.
+    :param urls: extra url patterns, '*' matching any characters.
+    :rtype: list
+    """
+    patterns = []
+    for resource in resources:
+        if resource not in RESOURCE_PATTERNS:
+            raise AssertionError("Unknown resource type '{}', use one of "
+                                 "{}".format(resource,
+                                             sorted(RESOURCE_PATTERNS)))
+        expand = (domain_patterns if resource in DOMAIN_CATEGORIES
+                  else extension_patterns)
+        for value in RESOURCE_PATTERNS[resource]:
+            patterns.extend(expand(value))
+    for domain in domains:
+        patterns.extend(domain_patterns(domain))
+    patterns.extend(urls)
+    return patterns
+
+
+def apply_blocking(driver, patterns):
+    """Block requests matching patterns on driver, [] to block none.
+
+    Nothing is sent when the driver already blocks the same patterns.
+    :return: False when the driver can't block requests.
+    :rtype: bool
+    """
+    patterns = list(patterns)
+    if _applied.get(driver, []) == patterns:
+        return True
+    if not hasattr(driver, 'execute_cdp_cmd'):
+        if patterns:
+            logger.warning("Requests can't be blocked on {} drivers".format(
+                type(driver).__name__))
+        return False
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    _applied[driver] = patterns
+    return True
+
+
+def forget_blocking(driver):
+    """Forget the patterns applied to driver, once its tab was replaced.
+
+    Blocked urls belong to one tab, the next apply_blocking sends them
+    again.
+    """
+    _applied.pop(driver, None)
@@ -1,23 +1,21 @@
 """UI utility functions of all selenium self.driver based actions."""
 from loguru import logger
 
+import functools
+
 import os
 
 import platform
 
-import unittest
-
-from datetime import datetime
-
-from time import sleep
+import time
 
-from selenium import webdriver
+import unittest
 
 from selenium.common import exceptions as selenium_exceptions
 
 from selenium.webdriver.common.action_chains import ActionChains
 
-from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 
 from selenium.webdriver.support import expected_conditions as ec
 
@@ -25,18 +23,189 @@ from selenium.webdriver.support.select import Select
 
 from selenium.webdriver.remote.webelement import WebElement
 
-from selenium.webdriver.support.ui import WebDriverWait as Wait
+from prodigyqa.authstate import (capture_state, load_state, restore_state,
+                                 save_state)
 
-if platform.system() == 'Darwin':
-    from PIL import ImageGrab
+from prodigyqa.blocking import apply_blocking, blocked_url_patterns
+
+from prodigyqa.driverpool import get_pool
 
-WAIT_SLEEP_TIME = 0.1  # Seconds
+from prodigyqa.drivers import ChromeDriverFactory
 
-TIME_OUT = 10  # Seconds
+from prodigyqa.locator import Locator, is_locator
 
-chrome_options = webdriver.ChromeOptions()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--no-sandbox')
+from prodigyqa.performance import (NetworkMonitor, check_budget, page_metrics,
+                                   resource_activity)
+
+from prodigyqa.screenshots import SCREENSHOT_WRITER, completed
+
+from prodigyqa.visual import BaselineStore, VISUAL_THRESHOLD, decode_png
+
+from prodigyqa.timing import SUITE_RECORDER, count_round_trips, stop_counting
+
+from prodigyqa.waits import (Condition, TIME_OUT, WAIT_SLEEP_TIME, WaitEngine,
+                             present)
+
+if platform.system() == 'Darwin':
+    from PIL import ImageGrab
+
+# Resolves once the document is complete, no XHR/fetch is in flight and
+# the next animation frame was rendered, or with the state at timeout.
+PAGE_READY_SCRIPT = '''
+var timeout = arguments[0], done = arguments[arguments.length - 1];
+var win = window, finished = false;
+if (win.__prodigyqaPending === undefined) {
+    win.__prodigyqaPending = 0;
+    var release = function () { win.__prodigyqaPending -= 1; };
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        win.__prodigyqaPending += 1;
+        this.addEventListener('loadend', release);
+        return send.apply(this, arguments);
+    };
+    if (win.fetch) {
+        var fetch = win.fetch;
+        win.fetch = function () {
+            win.__prodigyqaPending += 1;
+            var request = fetch.apply(this, arguments);
+            request.then(release, release);
+            return request;
+        };
+    }
+}
+function finish() {
+    if (!finished) {
+        finished = true;
+        done([document.readyState, win.__prodigyqaPending]);
+    }
+}
+function check() {
+    if (finished) {
+        return;
+    }
+    if (document.readyState !== 'complete') {
+        document.addEventListener('readystatechange', check);
+    } else if (win.__prodigyqaPending > 0) {
+        setTimeout(check, 25);
+    } else {
+        win.requestAnimationFrame(finish);
+        // Hidden windows never render a frame.
+        setTimeout(finish, 100);
+    }
+}
+setTimeout(finish, timeout);
+check();
+'''
+
+# Resolves every [by, value] query in the current frame and returns the
+# text, state and requested attributes of the first or of all matches.
+BATCH_QUERY_SCRIPT = '''
+var queries = arguments[0], names = arguments[1], all = arguments[2];
+function list(nodes) {
+    return Array.prototype.slice.call(nodes);
+}
+function links(value, partial) {
+    return list(document.getElementsByTagName('a')).filter(function (a) {
+        var text = a.innerText.trim();
+        return partial ? text.indexOf(value) !== -1 : text === value;
+    });
+}
+function find(by, value) {
+    switch (by) {
+    case 'id':
+        return list(document.querySelectorAll('#' + CSS.escape(value)));
+    case 'name':
+        return list(document.getElementsByName(value));
+    case 'class name':
+        return list(document.getElementsByClassName(value));
+    case 'tag name':
+        return list(document.getElementsByTagName(value));
+    case 'css selector':
+        return list(document.querySelectorAll(value));
+    case 'link text':
+        return links(value, false);
+    case 'partial link text':
+        return links(value, true);
+    case 'xpath':
+        var found = document.evaluate(value, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null), nodes = [];
+        for (var i = 0; i < found.snapshotLength; i++) {
+            nodes.push(found.snapshotItem(i));
+        }
+        return nodes;
+    }
+    return [];
+}
+function attribute(element, name) {
+    var value = element[name];
+    if (value === undefined || value === null ||
+            typeof value === 'object' || typeof value === 'function') {
+        value = element.getAttribute(name);
+    }
+    return value;
+}
+function describe(element) {
+    var style = window.getComputedStyle(element), attributes = {};
+    names.forEach(function (name) {
+        attributes[name] = attribute(element, name);
+    });
+    return {
+        text: element.innerText === undefined ?
+            element.textContent : element.innerText,
+        displayed: style.visibility !== 'hidden' &&
+            style.display !== 'none' && element.getClientRects().length > 0,
+        enabled: !element.disabled,
+        selected: !!(element.selected || element.checked),
+        attributes: attributes
+    };
+}
+return queries.map(function (query) {
+    var elements = find(query[0], query[1]);
+    if (all) {
+        return elements.map(describe);
+    }
+    return elements.length ? describe(elements[0]) : null;
+});
+'''
+
+
+def _action(method):
+    """Run a BrowserActions method within one shared wait budget.
+
+    Actions called from another action (e.g. hover_on_click calling
+    click) use the budget of the outer one. With profile_actions set,
+    the wall time, round trips and wait time of the call are recorded.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        outer = self._budget is None
+        if outer:
+            self._budget = self.waits.budget()
+        if not self.profile_actions:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if outer:
+                    self._budget = None
+        started = time.time()
+        round_trips, waited = self.round_trips, self.waits.waited
+        self._action_depth += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._action_depth -= 1
+            if outer:
+                self._budget = None
+            locator = args[0] if args else kwargs.get('locator')
+            if is_locator(locator):
+                locator = '{}={}'.format(*Locator.of(locator).selector)
+            else:
+                locator = None
+            self.action_recorder.record(
+                self.id(), method.__name__, locator, time.time() - started,
+                self.round_trips - round_trips, self.waits.waited - waited,
+                self._action_depth)
+    return wrapper
 
 
 class BrowserActions(unittest.TestCase):
@@ -45,66 +214,196 @@ class BrowserActions(unittest.TestCase):
     It inherits Python's unittest.TestCase class, and runs with Pytest.
     """
 
+    driver_factory = ChromeDriverFactory()
+
+    cache_elements = False
+
+    timeout = TIME_OUT
+
+    poll_frequency = WAIT_SLEEP_TIME
+
+    pool_size = None
+
+    profile_actions = bool(os.environ.get('PRODIGYQA_PROFILE'))
+
+    action_recorder = SUITE_RECORDER
+
+    screenshot_writer = SCREENSHOT_WRITER
+
+    baseline_store = BaselineStore()
+
+    visual_threshold = VISUAL_THRESHOLD
+
+    update_baselines = bool(os.environ.get('PRODIGYQA_UPDATE_BASELINES'))
+
+    measure_page_loads = False
+
+    page_budget = None
+
+    blocked_resources = ()
+
+    blocked_domains = ()
+
+    blocked_urls = ()
+
+    auth_state_file = None
+
+    auth_state_max_age = None
+
     def __init__(self, *args, **kwargs):
-        """Init Method for webdriver declarations."""
+        """Init Method for webdriver declarations.
+
+        No browser is started here; see the driver property.
+        """
         super(BrowserActions, self).__init__(*args, **kwargs)
         self.by_value = None
-        if platform.system() == 'Linux':
-            self.driver = webdriver.Chrome(chrome_options=chrome_options)
-        else:
-            self.driver = webdriver.Chrome()
+        self._driver = None
+        self._pooled_driver = None
+        self._page_stale = True
+        self._element_cache = {}
+        self._checked_elements = set()
+        self.waits = WaitEngine(self.timeout, self.poll_frequency)
+        self._budget = None
+        self.round_trips = 0
+        self._action_depth = 0
+        self._network_monitor = None
+        self.last_page_metrics = None
+        self._auth_script = None
+        self._auth_restored = None
+
+    @property
+    def driver(self):
+        """Return the webdriver, checking one out of the pool on first use.
+
+        Tests which never touch the browser don't start one at all.
+        """
+        if getattr(self, '_driver', None) is None:
+            self.acquire_driver()
+        return self._driver
+
+    @driver.setter
+    def driver(self, driver):
+        """Use the passed driver instead of a pooled one."""
+        self._driver = driver
+        self._network_monitor = None
+        if driver is not None:
+            self.__block_requests(driver)
+        if self.profile_actions and driver is not None:
+            count_round_trips(driver, self)
+        self._mark_navigation()
+
+    @property
+    def driver_pool(self):
+        """Pool of drivers built by this class's driver_factory."""
+        return get_pool(self.driver_factory, self.pool_size)
+
+    def run(self, result=None):
+        """Run the test and hand its driver back to the pool afterwards."""
+        try:
+            return super(BrowserActions, self).run(result)
+        finally:
+            self.release_driver()
+            if self.profile_actions:
+                logger.info('\n' + self.action_recorder.report(self.id()))
+
+    def acquire_driver(self):
+        """Check out a warmed driver from the pool for this instance."""
+        if getattr(self, '_pooled_driver', None) is None:
+            self._pooled_driver = self.driver_pool.checkout()
+            self._driver = self._pooled_driver
+            self._network_monitor = None
+            self._mark_navigation()
+            self.__block_requests(self._driver)
+            self._auth_restored = None
+            if self.auth_state_file:
+                self.restore_auth_state()
+            if self.profile_actions:
+                count_round_trips(self._driver, self)
+        return self._driver
+
+    def release_driver(self):
+        """Return the pooled driver so the next test can reuse it."""
+        driver = getattr(self, '_pooled_driver', None)
+        self._pooled_driver = None
+        if driver is not None:
+            if self._driver is driver:
+                self._driver = None
+            stop_counting(driver)
+            self.__remove_auth_script(driver)
+            self.driver_pool.checkin(driver)
 
     def __del__(self):
-        """Destructor method to kill the driver instance.
-        This helps to kill the driver instance at the end of the execution.
-        """
-        self.driver.quit()
-
-    def page_readiness_wait(self):
-        """Web Page Expected to be in ready state."""
-        start = datetime.now()
-        while (datetime.now() - start).total_seconds() < TIME_OUT:
-            pagestate = self.__execute_script('''return document.readyState''')
-            pagestate = pagestate.lower()
-            if pagestate == 'complete':
-                current_state = "Current page is in expected state {}"
-                logger.info(current_state.format(pagestate))
-                break
-            sleep(0.2)
-            loop_time_now = (datetime.now() - start).seconds
-            if loop_time_now > TIME_OUT and pagestate != 'complete':
-                raise AssertionError(
-                    "Opened browser is in state of %s" % pagestate)
+        """Destructor method to hand back a driver that was never released.
+
+        Drivers are quit by the pool when the process exits.
+        """
+        if getattr(self, '_pooled_driver', None) is not None:
+            self.release_driver()
+
+    @_action
+    def page_readiness_wait(self, force=False):
+        """Web Page Expected to be in ready state.
+
+        The page is only checked again after something that may have
+        navigated (open, reload, history, clicks, window/frame switches),
+        in a single asynchronous script which waits for the document,
+        pending XHR/fetch requests and the next animation frame.
+        :param force: check the page even if no navigation was tracked.
+        :type force: bool
+        """
+        if not force and not getattr(self, '_page_stale', True):
+            return
+        started = time.time()
+        pagestate, pending = self.driver.execute_async_script(
+            PAGE_READY_SCRIPT, int(self._budget.remaining() * 1000))
+        self.waits.waited += time.time() - started
+        if pagestate != 'complete':
+            raise AssertionError(
+                "Opened browser is in state of %s" % pagestate)
+        if pending:
+            logger.warning(
+                "{} requests still pending on the page".format(pending))
+        self._page_stale = False
+        logger.info("Current page is in expected state {}".format(pagestate))
+
+    def _mark_navigation(self, keep_elements=False):
+        """Flag the page as changed so the next action waits for it.
+
+        :param keep_elements: keep cached elements, for actions which
+            may or may not navigate; each is checked for staleness before
+            its next use.
+        """
+        self._page_stale = True
+        self._checked_elements = set()
+        if not keep_elements:
+            self.clear_element_cache()
+
+    def clear_element_cache(self):
+        """Forget element handles cached for the current page."""
+        self._element_cache = {}
+        self._checked_elements = set()
 
     def locator_check(self, locator_dict):
         """Local Method to classify locator type.
 
-        :type locator_dict: dict
-        """
-        text_retrived = locator_dict['by'].upper()
-        if 'ID' in text_retrived:
-            by = By.ID
-        if 'CLASS_NAME' in text_retrived:
-            by = By.CLASS_NAME
-        if 'CSS_SELECTOR' in text_retrived:
-            by = By.CSS_SELECTOR
-        if 'NAME' in text_retrived:
-            by = By.NAME
-        if 'LINK_TEXT' in text_retrived:
-            by = By.LINK_TEXT
-        if 'PARTIAL_LINK_TEXT' in text_retrived:
-            by = By.PARTIAL_LINK_TEXT
-        if 'XPATH' in text_retrived:
-            by = By.XPATH
-        if 'TAG_NAME' in text_retrived:
-            by = By.TAG_NAME
-        self.by_value = by
+        Kept for existing callers, actions resolve the locator type
+        through Locator objects without touching self.by_value.
+        :type locator_dict: dict or Locator
+        """
+        self.by_value = Locator.of(locator_dict).by
+        return self.by_value
 
+    @_action
     def open(self, url):
-        """Open the passed 'url'."""
+        """Open the passed 'url'.
+
+        With measure_page_loads or page_budget set, the load metrics are
+        kept in last_page_metrics and checked against page_budget.
+        """
         if url is not None:
             try:
                 self.driver.get(url)
+                self._mark_navigation()
                 logger.info("Browser opened with url '{0}'".format(url))
             except Exception:
                 logger.info("Browser with session id %s failed"
@@ -115,9 +414,19 @@ class BrowserActions(unittest.TestCase):
                         self.driver.session_id))
         else:
             raise AssertionError("Invalid/ URL cannot be null")
-
+        if self.measure_page_loads or self.page_budget:
+            self.last_page_metrics = self.get_page_metrics()
+            logger.info("Loaded '{url}' in {load:.0f}ms, {requests} requests,"
+                        " {transfer_size} bytes".format(
+                            **self.last_page_metrics))
+            if self.page_budget:
+                self.assert_page_budget(self.last_page_metrics,
+                                        **self.page_budget)
+
+    @_action
     def reload_page(self):
         """Method to refresh the page by selenium or java script."""
+        self._mark_navigation()
         try:
             self.driver.refresh()
         except BaseException:
@@ -131,11 +440,13 @@ class BrowserActions(unittest.TestCase):
             else:
                 logger.error("Page Refresh Error")
 
+    @_action
     def get_page_source(self):
         """Return the entire HTML source of the current page or frame."""
         self.page_readiness_wait()
         return self.driver.page_source
 
+    @_action
     def get_title(self):
         """Return the title of current page."""
         self.page_readiness_wait()
@@ -144,6 +455,7 @@ class BrowserActions(unittest.TestCase):
         except BaseException:
             return self.__execute_script("return document.title")
 
+    @_action
     def get_location(self):
         """Return the current browser URL using Selenium/Java Script."""
         self.page_readiness_wait()
@@ -154,6 +466,7 @@ class BrowserActions(unittest.TestCase):
         finally:
             return url if 'http' in url else None
 
+    @_action
     def get_attribute(self, locator=None, element=None,
                       attribute_name=None, type='locator'):
         """Fetch attribute from locator/element/parent.
@@ -175,13 +488,11 @@ class BrowserActions(unittest.TestCase):
             raise AssertionError("Invalid Specification/condition")
         if type == 'locator':
             if locator is not None and attribute_name is not None:
-                self.locator_check(locator)
                 self.page_readiness_wait()
-                if attribute_name is not None and isinstance(locator, dict):
-                    return self.driver.find_element(
-                        self.by_value,
-                        value=locator['locatorvalue']).get_attribute(
-                            attribute_name)
+                if attribute_name is not None and is_locator(locator):
+                    return self.__on_element(
+                        locator, lambda elt: elt.get_attribute(
+                            attribute_name))
                 else:
                     raise AssertionError(
                         "Invalid locator or Attribute is'{}'".format(
@@ -198,18 +509,17 @@ class BrowserActions(unittest.TestCase):
         if type == 'mixed':
             if element is not None:
                 if locator is not None and attribute_name is not None:
-                    self.locator_check(locator)
                     self.page_readiness_wait()
-                    if isinstance(locator, dict):
+                    if is_locator(locator):
                         return element.find_element(
-                            self.by_value,
-                            value=locator['locatorvalue']).get_attribute(
+                            *Locator.of(locator).selector).get_attribute(
                                 attribute_name)
                     else:
                         raise AssertionError(
                             "Invalid locator/element/attribute'{}'".format(
                                 attribute_name))
 
+    @_action
     def click(self, locator, index=None):
         """Click an element.
 
@@ -218,8 +528,7 @@ class BrowserActions(unittest.TestCase):
         :param index: Defaults None, number/position of element
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            self.locator_check(locator)
+        if is_locator(locator):
             if index is not None:
                 web_elts = self.find_elements(locator)
                 if index < len(web_elts):
@@ -228,13 +537,15 @@ class BrowserActions(unittest.TestCase):
                     raise AssertionError(
                         "Index is greater than no. of elements present")
             else:
-                self.__find_element(locator).click()
+                self.__on_element(locator, lambda elt: elt.click())
         elif isinstance(locator, WebElement):
             locator.click()
         else:
             raise AssertionError(
                 "Dictionary/Weblement are valid Locator types.")
+        self._mark_navigation(keep_elements=True)
 
+    @_action
     def javascript_click(self, locator, index=None):
         """Javascript Click on provided element.
 
@@ -244,8 +555,7 @@ class BrowserActions(unittest.TestCase):
         :param index: Number/position of element present
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            self.locator_check(locator)
+        if is_locator(locator):
             if index is not None:
                 web_elts = self.find_elements(locator)
                 if index < len(web_elts):
@@ -255,15 +565,17 @@ class BrowserActions(unittest.TestCase):
                     raise AssertionError(
                         "Index is greater than the number of elements")
             else:
-                self.driver.execute_script(
-                    "arguments[0].click();", self.driver.find_element(
-                        self.by_value, value=locator['locatorvalue']))
+                self.__on_element(
+                    locator, lambda elt: self.driver.execute_script(
+                        "arguments[0].click();", elt))
         elif isinstance(locator, WebElement):
             self.__execute_script("arguments[0].click();", locator)
         else:
             raise AssertionError(
                 "Locator type should be either dictionary or Weblement.")
+        self._mark_navigation(keep_elements=True)
 
+    @_action
     def is_element_displayed(self, locator: dict):
         """
         Check whether an element is diplayed.
@@ -272,15 +584,14 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            return self.driver.find_element(
-                self.by_value,
-                value=locator['locatorvalue']).is_displayed()
+        if is_locator(locator):
+            return self.__on_element(
+                locator, lambda elt: elt.is_displayed())
         else:
             raise AssertionError("Locator type should be dictionary.")
 
+    @_action
     def is_element_enabled(self, locator: dict):
         """
         Check whether an element is enabled.
@@ -289,13 +600,14 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            return self.__find_element(locator).is_enabled()
+        if is_locator(locator):
+            return self.__on_element(
+                locator, lambda elt: elt.is_enabled())
         else:
             raise AssertionError("Locator type should be dictionary.")
 
+    @_action
     def is_element_selected(self, locator: dict):
         """
         Check whether an element is selecte.
@@ -304,13 +616,14 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            return self.__find_element(locator).is_selected()
+        if is_locator(locator):
+            return self.__on_element(
+                locator, lambda elt: elt.is_selected())
         else:
             raise AssertionError("Locator type should be dictionary.")
 
+    @_action
     def send_keys(self, locator: dict, value=None):
         """Send text but does not clear the existing text.
 
@@ -319,14 +632,18 @@ class BrowserActions(unittest.TestCase):
         :type locator: dict
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            self.locator_check(locator)
-
-            self.__find_element(locator).send_keys(
-                locator['value'] if value is None else value)
+        if is_locator(locator):
+
+            value = locator['value'] if value is None else value
+            self.__on_element(locator, lambda elt: elt.send_keys(value))
+            if isinstance(value, str) and (
+                    Keys.ENTER in value or Keys.RETURN in value):
+                # Submitting a form navigates away.
+                self._mark_navigation(keep_elements=True)
         else:
             raise AssertionError("Locator type should be dictionary.")
 
+    @_action
     def get_text(self, locator, index=None):
         """Get text from provided Locator.
 
@@ -334,8 +651,7 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            self.locator_check(locator)
+        if is_locator(locator):
             if index is not None:
                 web_elts = self.find_elements(locator)
                 if index < len(web_elts):
@@ -344,7 +660,7 @@ class BrowserActions(unittest.TestCase):
                     raise AssertionError(
                         "Index is greater than the number of elements")
             else:
-                return self.__find_element(locator).text
+                return self.__on_element(locator, lambda elt: elt.text)
 
         elif isinstance(locator, WebElement):
             return locator.text
@@ -352,20 +668,68 @@ class BrowserActions(unittest.TestCase):
             raise AssertionError(
                 "Locator type should be either dictionary or Weblement.")
 
+    @_action
+    def get_texts(self, locators, all_matches=False):
+        """Get the text of many locators in a single browser round trip.
+
+        :param locators: dictionary of name: locator, or a list of locators.
+        :param all_matches: return the texts of every matching element
+            instead of the first one.
+        :return: texts keyed like the passed locators, None (or an empty
+            list with all_matches) for locators matching nothing.
+        """
+        return self.__batch_query(
+            locators, (), all_matches, lambda state: state['text'])
+
+    @_action
+    def get_attributes(self, locators, attribute_names, all_matches=False):
+        """Get attributes of many locators in a single browser round trip.
+
+        :param locators: dictionary of name: locator, or a list of locators.
+        :param attribute_names: list of attribute names to read.
+        :param all_matches: read every matching element, not only the first.
+        :return: dictionaries of attribute name: value keyed like the
+            passed locators.
+        """
+        return self.__batch_query(
+            locators, attribute_names, all_matches,
+            lambda state: state['attributes'])
+
+    @_action
+    def snapshot_state(self, locators, attribute_names=(),
+                       all_matches=False):
+        """Read text, visibility, enabled/selected state and attributes.
+
+        All locators are resolved by one injected script, which also
+        approximates displayed from computed style and layout.
+        :param locators: dictionary of name: locator, or a list of locators.
+        :param attribute_names: (optional) attribute names to read as well.
+        :param all_matches: read every matching element, not only the first.
+        :return: dictionaries with 'text', 'displayed', 'enabled',
+            'selected' and 'attributes' keyed like the passed locators.
+        """
+        return self.__batch_query(
+            locators, attribute_names, all_matches, lambda state: state)
+
+    @_action
     def go_back(self):
         """Simulate back button on browser using selenium or js."""
+        self._mark_navigation()
         try:
             self.driver.back()
         except BaseException:
             self.__execute_script("window.history.go(-1)")
 
+    @_action
     def go_forward(self):
         """Simulate forward button on browser using  selenium or js."""
+        self._mark_navigation()
         try:
             self.driver.forward()
         except BaseException:
             self.__execute_script("window.history.go(+1)")
 
+    @_action
     def set_window_size(self, width, height):
         """Set width and height of the current window. (window.resizeTo).
 
@@ -381,6 +745,7 @@ class BrowserActions(unittest.TestCase):
         else:
             AssertionError("Window size Invalid")
 
+    @_action
     def maximize(self):
         """Maximize the current window."""
         # https://bugs.chromium.org/p/chromedriver/issues/detail?id=985
@@ -392,15 +757,18 @@ class BrowserActions(unittest.TestCase):
         else:
             self.driver.maximize_window()
 
+    @_action
     def get_driver_name(self):
         """Return the name of webdriver instance."""
         return self.driver.name
 
+    @_action
     def get_domain_url(self):
         """Method to extract domain url from webdriver itself."""
         url = self.driver.current_url
         return url.split('//')[0] + '//' + url.split('/')[2]
 
+    @_action
     def clear_text(self, locator: dict):
         """Clear the text if it's a text entry element.
 
@@ -408,34 +776,81 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            return self.__find_element(locator).clear()
+        if is_locator(locator):
+            return self.__on_element(
+                locator, lambda elt: elt.clear())
         else:
             raise AssertionError("Locator type should be dictionary")
 
+    @_action
     def capture_screenshot(self, filepath):
         """Save screenshot to the directory(existing or new one).
 
         :param filepath: file name with directory path(C:/images/image.png).
         """
-        self.page_readiness_wait()
+        return self.capture_screenshot_async(filepath).result()
+
+    @_action
+    def capture_screenshot_async(self, filepath):
+        """Capture a screenshot in memory and save it in the background.
 
-        if not self.driver.service.process:
+        Only the capture itself is done before returning; the file is
+        written by the screenshot_writer's threads.
+        :param filepath: file name with directory path(C:/images/image.png).
+        :return: Future resolving to the saved path (the path of the
+            identical earlier frame when the writer dedupes).
+        """
+        self.page_readiness_wait()
+        service = getattr(self.driver, 'service', None)
+        if service is not None and not service.process:
             logger.info('Cannot capture ScreenShot'
                         ' because no browser is open.')
-            return
+            return completed(None)
         path = filepath.replace('/', os.sep)
+        return self.screenshot_writer.submit(
+            self.driver.get_screenshot_as_png(), path)
+
+    @_action
+    def capture_image(self, locator=None):
+        """Return the viewport or an element as a BGR ndarray.
 
-        if not os.path.exists(path.split(os.sep)[0]):
-            os.makedirs(path.split(os.sep)[0])
-        elif os.path.exists(path):
-            os.remove(path)
-        if not self.driver.get_screenshot_as_file(path):
-            raise RuntimeError("Failed to save screenshot '{}'.".format(path))
-        return path
+        The screenshot is decoded in memory, nothing is written to disk.
+        :param locator: (optional) dictionary of identifier type
+            and value of the element to crop to.
+        """
+        return decode_png(self.__capture_png(locator))
+
+    @_action
+    def assert_visually_matches(self, name, locator=None, threshold=None):
+        """Compare the viewport or an element with its stored baseline.
+
+        The first run (or any run with update_baselines set) stores the
+        baseline instead. A mismatching image is saved under the store's
+        failures directory.
+        :param name: baseline name, unique per page state.
+        :param locator: (optional) dictionary of identifier type
+            and value of the element to compare.
+        :param threshold: lowest SSIM accepted, visual_threshold by
+            default.
+        """
+        from prodigyqa.comparison import image_similarity
+        png = self.__capture_png(locator)
+        baseline = self.baseline_store.get(name)
+        if baseline is None or self.update_baselines:
+            self.baseline_store.put(name, png)
+            return
+        threshold = self.visual_threshold if threshold is None else threshold
+        score = image_similarity(decode_png(baseline), decode_png(png))
+        if score < threshold:
+            path = self.baseline_store.save_failure(name, png)
+            raise AssertionError(
+                "'{}' differs from its baseline: SSIM {:.4f} < {} "
+                "(saved to {})".format(name, score, threshold, path))
+        logger.info("'{}' matches its baseline: SSIM {:.4f}".format(
+            name, score))
 
+    @_action
     def switch_to_active_element(self):
         """Return the element with focus, or BODY if nothing has focus."""
         self.page_readiness_wait()
@@ -444,19 +859,23 @@ class BrowserActions(unittest.TestCase):
         except BaseException:
             return self.__execute_script('''document.activeElement''')
 
+    @_action
     def switch_to_window(self, window):
         """Switch focus to the specified window using selenium/javascript.
 
         :param window: name of the window to switch
         """
+        self._mark_navigation()
         try:
             self.driver.switch_to.window(window)
         except selenium_exceptions.NoSuchWindowException:
             AssertionError(
                 "Targeted window {} to be switched doesn't exist".window)
 
+    @_action
     def switch_to_active_window(self):
         """Switch focus to Active window."""
+        self._mark_navigation()
         try:
             handles = self.driver.window_handles
             size = len(handles)
@@ -467,6 +886,7 @@ class BrowserActions(unittest.TestCase):
             AssertionError(
                 "Targeted window {} to be switched doesn't exist".window)
 
+    @_action
     def switch_to_frame(self, framename):
         """Switch focus to the specified frame.
 
@@ -475,10 +895,12 @@ class BrowserActions(unittest.TestCase):
         self.page_readiness_wait()
         try:
             self.driver.switch_to.frame(framename)
+            self._mark_navigation()
         except selenium_exceptions.NoSuchFrameException:
             AssertionError(
                 "Targeted frame {} to be switched doesn't exist".framename)
 
+    @_action
     def switch_to_frame_by_index(self, index):
         """Switch focus to the specified frame .
 
@@ -487,19 +909,23 @@ class BrowserActions(unittest.TestCase):
         self.page_readiness_wait()
         try:
             self.driver.switch_to.frame(index)
+            self._mark_navigation()
         except selenium_exceptions.NoSuchFrameException:
             raise AssertionError(
                 "Targeted frame {} doesn't exist at passed index".index)
 
+    @_action
     def switch_to_default_content(self):
         """Switch focus to the default frame."""
         self.page_readiness_wait()
         try:
             self.driver.switch_to.default_content()
+            self._mark_navigation()
         except selenium_exceptions.InvalidSwitchToTargetException:
             AssertionError(
                 "Frame or Window targeted to be switched doesn't exist")
 
+    @_action
     def switch_to_alert(self):
         """Switch focus to an alert on the page."""
         try:
@@ -507,6 +933,7 @@ class BrowserActions(unittest.TestCase):
         except selenium_exceptions.NoAlertPresentException:
             AssertionError("Alert targeted to be switched doesn't exist")
 
+    @_action
     def hover_on_element(self, locator: dict):
         """Hover on a particular element.
 
@@ -514,12 +941,12 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
+        if is_locator(locator):
             try:
-                ActionChains(self.driver).move_to_element(
-                    self.__find_element(locator)).perform()
+                self.__on_element(
+                    locator, lambda elt: ActionChains(
+                        self.driver).move_to_element(elt).perform())
             except selenium_exceptions.NoSuchElementException:
                 AssertionError(
                     "Element{} not found".format(locator['by']) +
@@ -527,13 +954,13 @@ class BrowserActions(unittest.TestCase):
         else:
             raise AssertionError("Locator type should be dictionary")
 
+    @_action
     def hover_on_click(self, locator):
         """Hover & click a particular element.
 
         :param locator: dictionary of identifier type
             and value ({'by':'id', 'value':'start-of-content.'}).
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
         try:
             self.hover_on_element(locator)
@@ -543,6 +970,7 @@ class BrowserActions(unittest.TestCase):
                 "Element {} not found".format(
                     locator['by']) + '=' + locator['locatorvalue'])
 
+    @_action
     def wait_for_element(self, locator) -> bool:
         """Wait for an element to exist in UI.
 
@@ -550,35 +978,171 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :rtype: bool
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
         try:
-            if self.__find_element(locator):
-                return True
+            return bool(self.__find_element(locator, check=True))
         except selenium_exceptions.NoSuchElementException:
-            AssertionError("Failed to wait for element {}".format(
+            logger.error("Failed to wait for element {}".format(
                 locator['by'] + '=' + locator['locatorvalue']))
+            return False
+
+    @_action
+    def save_auth_state(self, path=None):
+        """Save cookies and web storage of the logged in page to a file.
+
+        Call it on a page of the application once logged in.
+        :param path: snapshot file, auth_state_file by default.
+        :return: the saved state.
+        """
+        path = path or self.auth_state_file
+        if not path:
+            raise AssertionError("Snapshot path or auth_state_file needed")
+        self.page_readiness_wait()
+        state = capture_state(self.driver)
+        save_state(state, path)
+        logger.info("Saved login state of {} to '{}'".format(
+            state['origin'], path))
+        return state
+
+    @_action
+    def restore_auth_state(self, path=None):
+        """Restore cookies and web storage saved by save_auth_state.
+
+        :param path: snapshot file, auth_state_file by default.
+        :return: False when there is no usable snapshot.
+        :rtype: bool
+        """
+        path = path or self.auth_state_file
+        state = load_state(path, self.auth_state_max_age) if path else None
+        if state is None:
+            return False
+        self.__remove_auth_script(self.driver)
+        self._auth_script = restore_state(self.driver, state)
+        self._auth_restored = path
+        self._mark_navigation()
+        logger.info("Restored login state of {} from '{}'".format(
+            state['origin'], path))
+        return True
+
+    @_action
+    def login_once(self, login, path=None):
+        """Log in through login only when no snapshot can be restored.
+
+        :param login: callable logging in through the UI, e.g.
+            self.login_as_admin.
+        :param path: snapshot file, auth_state_file by default.
+        :return: True when login was called.
+        :rtype: bool
+        """
+        # Getting the driver restores auth_state_file on a new one.
+        if self.driver and (
+                self._auth_restored == (path or self.auth_state_file) or
+                self.restore_auth_state(path)):
+            return False
+        login()
+        self.save_auth_state(path)
+        return True
+
+    @_action
+    def get_page_metrics(self):
+        """Return load metrics of the current page once it is ready.
+
+        Navigation timing (ttfb, dom_content_loaded, load,
+        first_contentful_paint in ms), requests, transfer_size (bytes),
+        long_tasks and long_task_time (drivers built with
+        ChromeDriverFactory(performance_log=True) only), plus the
+        resources and long_task_entries lists.
+        :rtype: dict
+        """
+        self.page_readiness_wait()
+        return page_metrics(self.driver)
 
+    @_action
+    def assert_page_budget(self, metrics=None, **budgets):
+        """Fail when page metrics exceed their budget.
+
+        :param metrics: (optional) metrics of get_page_metrics, taken
+            from the current page by default.
+        :param budgets: maximum value per metric, e.g. load=3000,
+            transfer_size=2000000, long_tasks=0.
+        :return: the metrics checked.
+        """
+        metrics = metrics or self.get_page_metrics()
+        over = check_budget(metrics, budgets)
+        if over:
+            raise AssertionError("Page '{}' is over budget: {}".format(
+                metrics['url'], ', '.join(over)))
+        return metrics
+
+    @_action
+    def wait_for_network_idle(self, idle_time=0.5, max_inflight=0,
+                              timeout=None):
+        """Wait until the page has had no network activity for a while.
+
+        Requests are followed through Chrome's performance log when the
+        driver has one (ChromeDriverFactory(performance_log=True)), else
+        through the page's resource timing and pending XHR/fetch calls.
+        :param idle_time: seconds without new or finished requests.
+        :param max_inflight: requests allowed to stay open, e.g. for
+            long polling.
+        :param timeout: (optional) seconds to wait instead of the
+            remaining time of the action.
+        """
+        monitor = self.__network_monitor()
+        if monitor is not None:
+            def idle(driver):
+                return (monitor.poll() <= max_inflight and
+                        time.time() - monitor.last_activity >= idle_time)
+        else:
+            last = {'activity': None, 'since': time.time()}
+
+            def idle(driver):
+                activity = resource_activity(driver)
+                if activity != last['activity']:
+                    last['activity'], last['since'] = activity, time.time()
+                return (activity[1] <= max_inflight and
+                        time.time() - last['since'] >= idle_time)
+        self.wait_until(Condition(idle, 'network idle'), timeout)
+
+    def wait_until(self, condition, timeout=None, message=None):
+        """Wait until the condition is met and return its value.
+
+        :param condition: prodigyqa.waits condition, e.g.
+            visible(locator) & enabled(locator), or any callable taking
+            the driver such as selenium's expected conditions.
+        :param timeout: (optional) seconds to wait instead of the
+            remaining time of the action.
+        :param message: (optional) text of the TimeoutException.
+        """
+        budget = self._budget if timeout is None else self.waits.budget(
+            timeout)
+        return self.waits.until(self.driver, condition, budget, message)
+
+    @_action
     def wait_and_accept_alert(self):
         """Wait and accept alert present on the page."""
         try:
-            Wait(self.driver, TIME_OUT).until(ec.alert_is_present())
+            self.wait_until(ec.alert_is_present())
             self.driver.switch_to.alert.accept()
+            self._mark_navigation(keep_elements=True)
             logger.info("alert accepted")
         except selenium_exceptions.TimeoutException:
             logger.error(
                 "Could Not Find Alert Within The Permissible Time Limit")
 
+    @_action
     def wait_and_reject_alert(self):
         """Wait for alert and rejects."""
         try:
-            Wait(self.driver, TIME_OUT).until(ec.alert_is_present())
+            self.wait_until(ec.alert_is_present())
             self.driver.switch_to.alert.dismiss()
+            self._mark_navigation(keep_elements=True)
             logger.info("alert dismissed")
         except selenium_exceptions.TimeoutException:
             logger.error(
                 "Could Not Find Alert Within The Permissible Time Limit")
 
+    @_action
     def select_option_by_index(self, locator: dict, index: int):
         """Select the option by index.
 
@@ -588,11 +1152,10 @@ class BrowserActions(unittest.TestCase):
         :type locator: dict
         :type index: int
         """
-        self.by_value = locator['by']
-        if isinstance(locator, dict) and isinstance(index, int):
-            self.locator_check(locator)
+        if is_locator(locator) and isinstance(index, int):
             try:
-                Select(self.__find_element(locator)).select_by_index(index)
+                self.__on_element(
+                    locator, lambda elt: Select(elt).select_by_index(index))
             except selenium_exceptions.NoSuchElementException:
                 logger.error("Exception : Element '{}' Not Found".format(
                     locator['by'] + '=' + locator['locatorvalue']))
@@ -600,6 +1163,7 @@ class BrowserActions(unittest.TestCase):
             AssertionError(
                 "Invalid locator '{}' or index '{}'".format(locator, index))
 
+    @_action
     def select_option_by_value(self, locator: dict, value: int):
         """Select the option by using value.
 
@@ -610,9 +1174,10 @@ class BrowserActions(unittest.TestCase):
         :type value: int
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict) and isinstance(value, int):
+        if is_locator(locator) and isinstance(value, int):
             try:
-                Select(self.__find_element(locator)).select_by_value(value)
+                self.__on_element(
+                    locator, lambda elt: Select(elt).select_by_value(value))
 
             except selenium_exceptions.NoSuchElementException:
                 logger.error("Exception : Element '{}' Not Found".format(
@@ -621,6 +1186,7 @@ class BrowserActions(unittest.TestCase):
             AssertionError(
                 "Invalid locator '{}' or value '{}'".format(locator, value))
 
+    @_action
     def select_option_by_text(self, locator: dict, text):
         """Select the value by using text.
 
@@ -630,17 +1196,18 @@ class BrowserActions(unittest.TestCase):
         :type locator: dict
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            self.locator_check(locator)
+        if is_locator(locator):
             try:
-                Select(self.__find_element(locator)
-                       ).select_by_visible_text(text)
+                self.__on_element(
+                    locator,
+                    lambda elt: Select(elt).select_by_visible_text(text))
             except selenium_exceptions.NoSuchElementException:
                 logger.error("Exception : Element '{}' Not Found".format(
                     locator['by'] + '=' + locator['locatorvalue']))
         else:
             AssertionError("Invalid locator type")
 
+    @_action
     def scroll_to_footer(self):
         """Scroll till end of the page."""
         self.page_readiness_wait()
@@ -650,6 +1217,7 @@ class BrowserActions(unittest.TestCase):
         except selenium_exceptions.JavascriptException:
             logger.error('Exception : Not Able to Scroll To Footer')
 
+    @_action
     def find_elements(self, locator: dict):
         """Return elements matched with locator.
 
@@ -657,15 +1225,13 @@ class BrowserActions(unittest.TestCase):
             and value ({'by':'id', 'value':'start-of-content.'}).
         :type locator: dict
         """
-        self.locator_check(locator)
         self.page_readiness_wait()
-        if isinstance(locator, dict):
-            return self.driver.find_elements(
-                self.by_value,
-                value=locator['locatorvalue'])
+        if is_locator(locator):
+            return self.driver.find_elements(*Locator.of(locator).selector)
         else:
             AssertionError("Invalid locator type")
 
+    @_action
     def scroll_to_element(self, locator: dict):
         """Scroll to a particular element on the page.
 
@@ -674,12 +1240,11 @@ class BrowserActions(unittest.TestCase):
         :type locator: dict
         """
         self.page_readiness_wait()
-        if isinstance(locator, dict):
+        if is_locator(locator):
             try:
-                self.locator_check(locator)
-                element = self.__find_element(locator)
-                actions = ActionChains(self.driver)
-                actions.move_to_element(element).perform()
+                self.__on_element(
+                    locator, lambda elt: ActionChains(
+                        self.driver).move_to_element(elt).perform())
             except selenium_exceptions.NoSuchElementException:
                 logger.error('Exception : Not Able To Scroll to Element')
             except BaseException:
@@ -689,16 +1254,107 @@ class BrowserActions(unittest.TestCase):
         else:
             AssertionError("Invalid locator type")
 
-    def __find_element(self, locator: dict):
+    def __find_element(self, locator: dict, check=False):
         """Private method simplified finding element.
 
-        :type locator: dict
+        Waits for the element within the budget of the current action.
+        A cached handle is checked for staleness once after a possible
+        navigation, or on every call with check.
+        :type locator: dict or Locator
+        """
+        if is_locator(locator):
+            selector = Locator.of(locator).selector
+            if not self.cache_elements:
+                return self.wait_until(present(locator))
+            element = self._element_cache.get(selector)
+            if element is not None and (
+                    check or selector not in self._checked_elements):
+                try:
+                    element.is_enabled()
+                except selenium_exceptions.StaleElementReferenceException:
+                    element = None
+            if element is None:
+                element = self.wait_until(present(locator))
+                self._element_cache[selector] = element
+            self._checked_elements.add(selector)
+            return element
+
+    def __remove_auth_script(self, driver):
+        """Private method removing the sessionStorage restoring script."""
+        if self._auth_script is None:
+            return
+        try:
+            driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument',
+                                   {'identifier': self._auth_script})
+        except selenium_exceptions.WebDriverException:
+            pass
+        self._auth_script = None
+
+    def __block_requests(self, driver):
+        """Private method blocking the requests this class doesn't want.
+
+        Also lifts the blocking a pooled driver kept from another class.
+        """
+        apply_blocking(driver, blocked_url_patterns(
+            self.blocked_resources, self.blocked_domains, self.blocked_urls))
+
+    def __network_monitor(self):
+        """Private method returning the NetworkMonitor of the driver.
+
+        :return: None when the driver has no performance log.
+        """
+        if self._network_monitor is None:
+            monitor = NetworkMonitor(self.driver)
+            try:
+                monitor.poll()
+            except selenium_exceptions.WebDriverException:
+                monitor = False
+            self._network_monitor = monitor
+        return self._network_monitor or None
+
+    def __capture_png(self, locator=None):
+        """Private method returning PNG bytes of the viewport or element."""
+        self.page_readiness_wait()
+        if locator is None:
+            return self.driver.get_screenshot_as_png()
+        if not is_locator(locator):
+            raise AssertionError("Locator type should be dictionary")
+        return self.__on_element(locator, lambda elt: elt.screenshot_as_png)
+
+    def __on_element(self, locator, action):
+        """Run action on the element of locator.
+
+        The element is looked up again once if it went stale, e.g. because
+        a cached handle outlived a DOM update.
         """
-        if isinstance(locator, dict):
-            self.locator_check(locator)
-            return self.driver.find_element(
-                self.by_value,
-                value=locator['locatorvalue'])
+        try:
+            return action(self.__find_element(locator))
+        except selenium_exceptions.StaleElementReferenceException:
+            self._element_cache.pop(Locator.of(locator).selector, None)
+            return action(self.__find_element(locator))
+
+    def __batch_query(self, locators, attribute_names, all_matches, pick):
+        """Private method running BATCH_QUERY_SCRIPT over the locators.
+
+        :param pick: callable extracting the wanted part of an element
+            state returned by the script.
+        """
+        self.page_readiness_wait()
+        if isinstance(locators, dict):
+            names, locators = list(locators), list(locators.values())
+        else:
+            names = None
+        queries = [list(Locator.of(locator).selector) for locator in locators]
+        results = self.driver.execute_script(
+            BATCH_QUERY_SCRIPT, queries, list(attribute_names),
+            bool(all_matches))
+        values = []
+        for result in results:
+            if all_matches:
+                values.append([pick(state) for state in result])
+            else:
+                values.append(None if result is None else pick(result))
+        return values if names is None else dict(zip(names, values))
 
     def __execute_script(self, script, web_elm=None):
         """
@@ -711,7 +1367,7 @@ class BrowserActions(unittest.TestCase):
             return self.driver.execute_script(script)
         if isinstance(web_elm, WebElement):
             return self.driver.execute_script(script, web_elm)
-        if isinstance(web_elm, dict):
+        if is_locator(web_elm):
             return self.driver.execute_script(
                 script,
                 self.__find_element(web_elm))
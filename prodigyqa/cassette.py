@@ -0,0 +1,330 @@
+"""Record API responses to a cassette and replay them without network."""
+from loguru import logger
+
+import atexit
+
+import hashlib
+
+import io
+
+import json
+
+import os
+
+import sqlite3
+
+import threading
+
+import time
+
+import zlib
+
+import requests
+
+from requests.adapters import BaseAdapter
+
+from requests.structures import CaseInsensitiveDict
+
+from requests.utils import get_encoding_from_headers
+
+from urllib3 import HTTPResponse
+
+from urllib3.exceptions import HTTPError
+
+from prodigyqa.sessions import SessionPool
+
+MODES = ('record', 'replay', 'auto')
+
+CASSETTE = os.environ.get('PRODIGYQA_CASSETTE')
+
+CASSETTE_MODE = os.environ.get('PRODIGYQA_CASSETTE_MODE', 'replay')
+
+# Headers describing the wire format, not the decoded body stored.
+DROPPED_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+CHUNK_SIZE = 64 * 1024
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS interactions (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    elapsed REAL NOT NULL,
+    PRIMARY KEY (key, seq)
+)
+'''
+
+
+def request_key(method, url, body):
+    """Return the cassette key of a request: method, url and body hash.
+
+    :param body: request body as bytes, str or None.
+    """
+    if body is None:
+        body = b''
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        # Streamed uploads can't be hashed without consuming them.
+        body = b'<stream>'
+    digest = hashlib.sha256(body).hexdigest()
+    return hashlib.sha256('{} {} {}'.format(
+        method.upper(), url, digest).encode('utf-8')).hexdigest()
+
+
+class Cassette(object):
+    """Indexed sqlite file of compressed request/response pairs.
+
+    Identical requests are stored in sequence and replayed in the same
+    order, e.g. a GET before and after a POST changing the resource.
+    """
+
+    def __init__(self, path, mode='replay'):
+        """Cassette declarations.
+
+        :param path: sqlite file of the cassette.
+        :param mode: 'record' sends requests and stores the responses,
+            'replay' only serves stored ones, 'auto' replays what is
+            stored and records the rest.
+        """
+        if mode not in MODES:
+            raise AssertionError("Cassette mode should be one of {}".format(
+                MODES))
+        self.path = path
+        self.mode = mode
+        self._served = {}
+        self._recorded = set()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def play(self, key):
+        """Return the next stored interaction of key, None if there's none.
+
+        :rtype: dict
+        """
+        with self._lock:
+            seq = self._served.get(key, 0)
+            row = self._db.execute(
+                'SELECT method, url, status, reason, headers, body, elapsed '
+                'FROM interactions WHERE key = ? AND seq <= ? '
+                'ORDER BY seq DESC LIMIT 1', (key, seq)).fetchone()
+            if row is None:
+                return None
+            self._served[key] = seq + 1
+        method, url, status, reason, headers, body, elapsed = row
+        return {'method': method, 'url': url, 'status': status,
+                'reason': reason, 'headers': json.loads(headers),
+                'body': zlib.decompress(body), 'elapsed': elapsed}
+
+    def record(self, key, method, url, response, body, elapsed):
+        """Store a response after the ones already recorded for key.
+
+        Recordings of a key made by earlier runs are replaced.
+        :param body: zlib compressed, decoded response body.
+        :param elapsed: seconds the request took when recorded.
+        """
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_HEADERS}
+        with self._lock:
+            if key not in self._recorded and self.mode == 'record':
+                self._db.execute('DELETE FROM interactions WHERE key = ?',
+                                 (key,))
+            self._recorded.add(key)
+            seq = self._db.execute(
+                'SELECT COUNT(*) FROM interactions WHERE key = ?',
+                (key,)).fetchone()[0]
+            self._db.execute(
+                'INSERT INTO interactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, seq, method, url, response.status_code,
+                 response.reason, json.dumps(headers), body, elapsed))
+            self._db.commit()
+
+    def close(self):
+        """Close the cassette file."""
+        with self._lock:
+            self._db.close()
+
+
+class _RecordingBody(object):
+    """File object over a live response body, recording what is read.
+
+    The decoded body is compressed chunk by chunk as the response is
+    consumed, streamed or not, and stored once read to the end. Closing
+    it early reads the rest first so no truncated body is stored.
+    """
+
+    def __init__(self, raw, store):
+        """Body declarations.
+
+        :param raw: urllib3 response sent by the wrapped adapter.
+        :param store: callable taking the compressed body once complete.
+        """
+        self.raw = raw
+        self.closed = False
+        self._store = store
+        self._compressor = zlib.compressobj()
+        self._compressed = []
+
+    def read(self, amt=None):
+        """Return up to amt decoded bytes, all of them by default."""
+        if self.closed:
+            return b''
+        data = self.raw.read(amt, decode_content=True)
+        self._compressed.append(self._compressor.compress(data))
+        if amt is None or not data:
+            self.close()
+        return data
+
+    def close(self):
+        """Read what is left of the body, store it and free the connection."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            for chunk in self.raw.stream(CHUNK_SIZE, decode_content=True):
+                self._compressed.append(self._compressor.compress(chunk))
+        except (HTTPError, OSError) as e:
+            self.raw.close()
+            logger.warning("Response body not recorded: {}".format(e))
+            return
+        self.raw.release_conn()
+        self._compressed.append(self._compressor.flush())
+        self._store(b''.join(self._compressed))
+        self._compressed = []
+
+
+class CassetteAdapter(BaseAdapter):
+    """Transport adapter answering from a cassette, recording as told."""
+
+    def __init__(self, cassette, adapter):
+        """Adapter declarations.
+
+        :param cassette: Cassette to play and record.
+        :param adapter: adapter sending the requests which are recorded.
+        """
+        super(CassetteAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        """Return the stored response of request, or send and record it.
+
+        Sent responses are recorded as their body is read, so streamed
+        ones keep their bounded memory; a streamed response is stored
+        once read to the end or closed.
+        """
+        key = request_key(request.method, request.url, request.body)
+        if self.cassette.mode != 'record':
+            stored = self.cassette.play(key)
+            if stored is not None:
+                return self._response(request, stored)
+            if self.cassette.mode == 'replay':
+                raise AssertionError(
+                    "{} {} is not in cassette '{}'; record it with "
+                    "PRODIGYQA_CASSETTE_MODE=record".format(
+                        request.method, request.url, self.cassette.path))
+        start = time.time()
+        response = self.adapter.send(request, **kwargs)
+        elapsed = time.time() - start
+
+        def store(body):
+            self.cassette.record(key, request.method, request.url, response,
+                                 body, elapsed)
+            logger.debug("Recorded {} {}".format(request.method, request.url))
+
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_HEADERS}
+        response.raw = HTTPResponse(
+            body=_RecordingBody(response.raw, store), headers=headers,
+            status=response.status_code, preload_content=False)
+        return response
+
+    def _response(self, request, stored):
+        """Build a requests.Response from a stored interaction."""
+        response = requests.Response()
+        response.status_code = stored['status']
+        response.reason = stored['reason']
+        response.headers = CaseInsensitiveDict(stored['headers'])
+        response.headers['Content-Length'] = str(len(stored['body']))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = HTTPResponse(
+            body=io.BytesIO(stored['body']), headers=response.headers,
+            status=stored['status'], preload_content=False)
+        response.url = stored['url']
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        """Close the wrapped adapter."""
+        self.adapter.close()
+
+
+class CassettePool(SessionPool):
+    """SessionPool whose sessions send through a cassette."""
+
+    def __init__(self, cassette, pool):
+        """Pool declarations.
+
+        :param cassette: Cassette played and recorded.
+        :param pool: SessionPool whose settings are used when recording.
+        """
+        super(CassettePool, self).__init__(
+            pool.pool_maxsize, pool.max_retries, pool.backoff_factor,
+            pool.retry_statuses, pool.keep_alive)
+        self.cassette = cassette
+        self._wrapped = {}
+
+    def adapter(self, url):
+        """Return the CassetteAdapter shared by the sessions of url's host."""
+        adapter = super(CassettePool, self).adapter(url)
+        with self._lock:
+            wrapped = self._wrapped.get(adapter)
+            if wrapped is None:
+                wrapped = self._wrapped[adapter] = CassetteAdapter(
+                    self.cassette, adapter)
+            return wrapped
+
+    def close(self):
+        """Close the connections of every host."""
+        super(CassettePool, self).close()
+        self._wrapped = {}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def cassette_pool(path, mode, pool):
+    """Return the CassettePool of a cassette file, opened once per process.
+
+    :param path: sqlite file of the cassette.
+    :param mode: 'record', 'replay' or 'auto'.
+    :param pool: SessionPool used when recording.
+    """
+    with _pools_lock:
+        cassettes = _pools.get((path, mode, pool))
+        if cassettes is None:
+            cassettes = _pools[(path, mode, pool)] = CassettePool(
+                Cassette(path, mode), pool)
+        return cassettes
+
+
+@atexit.register
+def _close_cassettes():
+    """Close the cassette files and their connections."""
+    for pool in list(_pools.values()):
+        pool.close()
+        pool.cassette.close()
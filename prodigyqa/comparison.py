@@ -9,6 +9,21 @@ from jsondiff import diff
 import os
 
 
+def image_similarity(source, target):
+    """Return the SSIM of two images already loaded as arrays.
+
+    The target is resized to the source's size first.
+    :param source: source image as returned by cv2.imread.
+    :param target: target image as returned by cv2.imread.
+    :return: SSIM of the images which ranges between 0 and 1
+    :rtype: float
+    """
+    if source.shape != target.shape:
+        target = cv2.resize(
+            target, (int(source.shape[1]), int(source.shape[0])))
+    return ssim(source, target, multichannel=True)
+
+
 class Compare(unittest.TestCase):
     """File Comparison module which includes image, csv and workbook."""
 
@@ -42,10 +57,7 @@ class Compare(unittest.TestCase):
         self.target_extn = target.split(".")[1]
         if self.source_extn and self.target_extn not in self.image_extn:
             logger.error("Invalid image extension")
-        self.target = cv2.resize(
-            self.target, (int(self.source.shape[1]),
-                          int(self.source.shape[0])))
-        return ssim(self.source, self.target, multichannel=True)
+        return image_similarity(self.source, self.target)
 
     def compare_json(self, source, target):
         """Compare json files.
@@ -0,0 +1,217 @@
+"""Pool of warmed webdriver instances shared across BrowserActions tests."""
+from loguru import logger
+
+import atexit
+
+import os
+
+import threading
+
+from collections import deque
+
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import WebDriverException
+
+from prodigyqa.blocking import forget_blocking
+
+POOL_SIZE = int(os.environ.get('PRODIGYQA_POOL_SIZE', 1))
+
+# Pages without web storage (about:blank, data: urls) throw on access.
+CLEAR_STORAGE_SCRIPT = '''
+try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}
+'''
+
+_pools = {}
+
+_pools_lock = threading.Lock()
+
+
+def _origin(url):
+    """Return the scheme://host:port origin of a web url, None otherwise."""
+    parts = urlsplit(url or '')
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    return '{}://{}'.format(parts.scheme, parts.netloc)
+
+
+def visited_origins(driver):
+    """Return the origins of the current tab's history and frames.
+
+    :param driver: Chrome driver, for its CDP commands.
+    :rtype: set
+    """
+    urls = [entry['url'] for entry in driver.execute_cdp_cmd(
+        'Page.getNavigationHistory', {})['entries']]
+    frames = [driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']]
+    while frames:
+        tree = frames.pop()
+        urls.append(tree['frame'].get('url'))
+        frames.extend(tree.get('childFrames', ()))
+    return set(filter(None, map(_origin, urls)))
+
+
+class DriverPool(object):
+    """Hand out reusable drivers and take them back once a test is done.
+
+    Drivers are reset (extra windows closed, cookies and storage cleared,
+    navigated to a blank page) on check in, so the next checkout gets a
+    clean browser without paying for a new browser start. Factories with
+    a prepare method get each driver on checkout, to set up what a reset
+    tab has lost.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE):
+        """Pool declarations.
+
+        :param factory: callable returning a new webdriver instance.
+        :param size: maximum number of idle drivers kept warm.
+        """
+        self.factory = factory
+        self.size = size
+        self.pid = os.getpid()
+        self.worker = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def prewarm(self, count=None):
+        """Start drivers up front so the first tests don't wait on them.
+
+        :param count: number of idle drivers wanted, defaults to pool size.
+        """
+        count = self.size if count is None else min(count, self.size)
+        while len(self._idle) < count:
+            self._idle.append(self.factory())
+
+    def checkout(self):
+        """Return an idle driver, starting a new one if none is left."""
+        with self._lock:
+            driver = self._idle.popleft() if self._idle else None
+        if driver is None:
+            logger.info("Starting new driver for worker '{}'".format(
+                self.worker))
+            driver = self.factory()
+        if hasattr(self.factory, 'prepare'):
+            self.factory.prepare(driver)
+        return driver
+
+    def checkin(self, driver):
+        """Reset the driver and keep it for reuse, or quit it if pool is full.
+
+        :param driver: driver previously handed out by checkout.
+        """
+        if driver is None or not self.reset(driver):
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(driver)
+                return
+        self._quit(driver, park=True)
+
+    def reset(self, driver):
+        """Clear windows, cookies and storage left over by the last test.
+
+        The storage of every origin the windows visited or framed is
+        cleared through CDP, and the test's tabs are replaced by a new
+        blank one, dropping their sessionStorage. Drivers without CDP,
+        such as remote ones, are reset in place: only the cookies and
+        storage of the pages open in their windows can be cleared.
+        :return: False when the driver is no longer usable and was quit.
+        :rtype: bool
+        """
+        if not hasattr(driver, 'execute_cdp_cmd'):
+            return self._reset_in_place(driver)
+        try:
+            handles = driver.window_handles
+            origins = set()
+            for handle in handles:
+                driver.switch_to.window(handle)
+                origins.update(visited_origins(driver))
+            driver.execute_cdp_cmd('Target.createTarget',
+                                   {'url': 'about:blank'})
+            blank = [handle for handle in driver.window_handles
+                     if handle not in handles][0]
+            for handle in handles:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(blank)
+            forget_blocking(driver)
+            for origin in sorted(origins):
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin, 'storageTypes': 'all'})
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            return True
+        except Exception as e:
+            logger.warning("Discarding driver which failed to reset: "
+                           "{}".format(e))
+            self._quit(driver)
+            return False
+
+    def _reset_in_place(self, driver):
+        """Reset a driver through WebDriver commands only.
+
+        Every window but the first is closed, each after its page's
+        storage is cleared, then the first one is cleared and left on a
+        blank page.
+        :return: False when the driver failed to reset and was quit.
+        """
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.execute_script(CLEAR_STORAGE_SCRIPT)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_script(CLEAR_STORAGE_SCRIPT)
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+            return True
+        except WebDriverException as e:
+            logger.warning("Discarding driver which failed to reset: "
+                           "{}".format(e))
+            self._quit(driver)
+            return False
+
+    def close(self):
+        """Quit every idle driver held by the pool."""
+        with self._lock:
+            drivers, self._idle = list(self._idle), deque()
+        for driver in drivers:
+            self._quit(driver, park=True)
+
+    def _quit(self, driver, park=False):
+        """Quit the driver ignoring sessions that are already gone.
+
+        :param park: hand healthy drivers to the factory's park method
+            instead, for factories keeping sessions alive.
+        """
+        try:
+            if park and hasattr(self.factory, 'park'):
+                self.factory.park(driver)
+            else:
+                driver.quit()
+        except Exception:
+            pass
+
+
+def get_pool(factory, size=None):
+    """Return the pool of this process (or xdist worker) for a factory.
+
+    :param factory: callable returning a new webdriver instance.
+    :param size: pool size used when the pool is created.
+    """
+    with _pools_lock:
+        pool = _pools.get(factory)
+        if pool is None or pool.pid != os.getpid():
+            # Drivers can't be shared with a forked child process.
+            pool = DriverPool(factory, POOL_SIZE if size is None else size)
+            _pools[factory] = pool
+        return pool
+
+
+@atexit.register
+def close_pools():
+    """Quit all pooled drivers of the current process."""
+    for pool in list(_pools.values()):
+        if pool.pid == os.getpid():
+            pool.close()
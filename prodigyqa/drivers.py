@@ -0,0 +1,214 @@
+"""Factories building the webdriver used by BrowserActions."""
+from loguru import logger
+
+import hashlib
+
+import json
+
+import os
+
+import platform
+
+import threading
+
+import urllib3
+
+from selenium import webdriver
+
+from selenium.common.exceptions import WebDriverException
+
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from prodigyqa.performance import LONG_TASK_OBSERVER
+
+POOL_CONNECTIONS = 10
+
+SESSIONS_DIR = '.prodigyqa_sessions'
+
+_connections = {}
+
+_connections_lock = threading.Lock()
+
+
+class ChromeDriverFactory(object):
+    """Start local Chrome drivers, headless on Linux by default.
+
+    Assign an instance to BrowserActions.driver_factory to change the
+    options used by a test class, e.g.
+    driver_factory = ChromeDriverFactory(headless=False).
+    """
+
+    def __init__(self, headless=None, arguments=None, options=None,
+                 performance_log=False, **kwargs):
+        """Factory declarations.
+
+        :param headless: run without a window, defaults to True on Linux.
+        :param arguments: extra chrome command line switches.
+        :param options: ChromeOptions to start from.
+        :param performance_log: enable Chrome's performance log (network
+            events for wait_for_network_idle) and record long tasks.
+        :param kwargs: extra keyword arguments passed to webdriver.Chrome.
+        """
+        linux = platform.system() == 'Linux'
+        self.headless = linux if headless is None else headless
+        self.arguments = list(arguments or [])
+        if linux and '--no-sandbox' not in self.arguments:
+            self.arguments.append('--no-sandbox')
+        self.base_options = options
+        self.performance_log = performance_log
+        self.kwargs = kwargs
+
+    def options(self):
+        """Build the ChromeOptions for a new driver."""
+        options = self.base_options or webdriver.ChromeOptions()
+        if self.headless and '--headless' not in options.arguments:
+            options.add_argument('--headless')
+        for argument in self.arguments:
+            if argument not in options.arguments:
+                options.add_argument(argument)
+        if self.performance_log:
+            preferences = {'performance': 'ALL'}
+            # chromedriver 75+ reads the prefixed name, older ones the other.
+            options.set_capability('goog:loggingPrefs', preferences)
+            options.set_capability('loggingPrefs', preferences)
+        return options
+
+    def __call__(self):
+        """Return a new Chrome driver."""
+        return webdriver.Chrome(chrome_options=self.options(), **self.kwargs)
+
+    def prepare(self, driver):
+        """Set up the current tab of a driver checked out of the pool.
+
+        Scripts run on new documents belong to one tab, and the pool
+        replaces the tab on every reset.
+        """
+        if self.performance_log:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument',
+                                   {'source': LONG_TASK_OBSERVER})
+
+
+class _AttachedRemote(webdriver.Remote):
+    """Remote driver taking over a running session instead of a new one."""
+
+    def __init__(self, session_id, *args, **kwargs):
+        """Remember the session to attach to before the driver starts."""
+        self.attach_session_id = session_id
+        super(_AttachedRemote, self).__init__(*args, **kwargs)
+
+    def start_session(self, capabilities, browser_profile=None):
+        """Attach to the running session without a NEW_SESSION command."""
+        self.session_id = self.attach_session_id
+        self.capabilities = capabilities
+        self.w3c = True
+        self.command_executor.w3c = True
+
+
+def remote_connection(url, maxsize=POOL_CONNECTIONS):
+    """Return the keep-alive connection shared by all drivers of a server.
+
+    :param url: url of the remote server.
+    :param maxsize: connections kept open to the server.
+    """
+    with _connections_lock:
+        connection = _connections.get(url)
+        if connection is None:
+            connection = RemoteConnection(url, keep_alive=True)
+            connection._conn = urllib3.PoolManager(
+                timeout=connection._timeout, maxsize=maxsize)
+            _connections[url] = connection
+        return connection
+
+
+class RemoteDriverFactory(object):
+    """Start drivers on a Selenium Grid or standalone server.
+
+    All drivers of one server share a keep-alive connection pool. With
+    reuse_sessions, sessions are left running when the process is done
+    and taken over by the next process (or run) with the same server
+    and capabilities, instead of starting a new browser on the grid.
+    """
+
+    def __init__(self, command_executor='http://127.0.0.1:4444/wd/hub',
+                 desired_capabilities=None, options=None, keep_alive=True,
+                 reuse_sessions=False, sessions_dir=SESSIONS_DIR, **kwargs):
+        """Factory declarations.
+
+        :param command_executor: url of the remote server.
+        :param desired_capabilities: capabilities of the requested browser.
+        :param options: driver options converted to capabilities.
+        :param keep_alive: share a persistent connection pool per server.
+        :param reuse_sessions: park sessions for later processes instead
+            of quitting them.
+        :param sessions_dir: directory where parked sessions are listed.
+        :param kwargs: extra keyword arguments passed to webdriver.Remote.
+        """
+        if desired_capabilities is None and options is None:
+            desired_capabilities = webdriver.DesiredCapabilities.CHROME.copy()
+        self.command_executor = command_executor
+        self.desired_capabilities = desired_capabilities
+        self.options = options
+        self.keep_alive = keep_alive
+        self.reuse_sessions = reuse_sessions
+        self.sessions_dir = sessions_dir
+        self.kwargs = kwargs
+
+    def __call__(self):
+        """Return a remote driver, on a parked session when one is alive."""
+        for session_id in self._claim_sessions():
+            driver = self._remote(session_id)
+            try:
+                driver.current_url
+            except WebDriverException:
+                continue
+            logger.info("Reusing remote session {}".format(session_id))
+            return driver
+        return self._remote()
+
+    def park(self, driver):
+        """Leave the session running for a later process to reuse.
+
+        Quits the driver when reuse_sessions is off.
+        """
+        if not self.reuse_sessions:
+            driver.quit()
+            return
+        path = self._sessions_path()
+        if not os.path.exists(path):
+            os.makedirs(path)
+        open(os.path.join(path, driver.session_id), 'w').close()
+
+    def _remote(self, session_id=None):
+        """Start a new session, or attach to session_id."""
+        executor = self.command_executor
+        if self.keep_alive and isinstance(executor, str):
+            executor = remote_connection(executor)
+        kwargs = dict(command_executor=executor,
+                      desired_capabilities=self.desired_capabilities,
+                      options=self.options, **self.kwargs)
+        if session_id is None:
+            return webdriver.Remote(**kwargs)
+        return _AttachedRemote(session_id, **kwargs)
+
+    def _sessions_path(self):
+        """Directory of parked sessions for this server and capabilities."""
+        capabilities = dict(self.desired_capabilities or {})
+        if self.options is not None:
+            capabilities.update(self.options.to_capabilities())
+        key = json.dumps([str(self.command_executor), capabilities],
+                         sort_keys=True, default=str)
+        return os.path.join(
+            self.sessions_dir, hashlib.sha1(key.encode()).hexdigest())
+
+    def _claim_sessions(self):
+        """Yield parked session ids, each one claimed by one process only."""
+        path = self._sessions_path()
+        if not self.reuse_sessions or not os.path.isdir(path):
+            return
+        for session_id in os.listdir(path):
+            try:
+                os.remove(os.path.join(path, session_id))
+            except OSError:
+                # Claimed by another process in the meantime.
+                continue
+            yield session_id
@@ -0,0 +1,220 @@
+"""Replay ApiTester request scenarios as load tests."""
+import math
+
+import threading
+
+import time
+
+from collections import Counter
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bounds in milliseconds of the latency histogram buckets.
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# SLO names checked as minimums, all others are maximums.
+MINIMUM_SLOS = ('throughput',)
+
+
+class LoadResult(object):
+    """Latencies and outcomes of the requests of one load run."""
+
+    def __init__(self):
+        """Variable Stack Declaration."""
+        self.latencies = []
+        self.outcomes = Counter()
+        self.errors = 0
+        self.started = None
+        self.ended = None
+        self._lock = threading.Lock()
+
+    def record(self, latency, outcome, error):
+        """Store one request.
+
+        :param latency: seconds the request took.
+        :param outcome: status code or exception name.
+        :param error: whether the request failed.
+        """
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes[outcome] += 1
+            self.errors += bool(error)
+
+    @property
+    def requests(self):
+        """Number of requests sent."""
+        return len(self.latencies)
+
+    @property
+    def duration(self):
+        """Seconds from the first request to the end of the last."""
+        return (self.ended or time.time()) - (self.started or time.time())
+
+    def percentile(self, percent):
+        """Return the latency in ms below which percent of requests are.
+
+        :param percent: 0 to 100, e.g. 95.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(int(math.ceil(percent / 100.0 * len(ordered))) - 1, 0)
+        return ordered[rank] * 1000
+
+    def histogram(self, buckets=HISTOGRAM_BUCKETS):
+        """Return request counts per latency bucket.
+
+        :param buckets: increasing upper bounds in ms.
+        :return: (upper bound, count) pairs, the last one with bound
+            None for slower requests.
+        """
+        counts = [0] * (len(buckets) + 1)
+        for latency in self.latencies:
+            milliseconds = latency * 1000
+            index = next((i for i, bound in enumerate(buckets)
+                          if milliseconds <= bound), len(buckets))
+            counts[index] += 1
+        return list(zip(list(buckets) + [None], counts))
+
+    def summary(self):
+        """Return the figures SLOs are checked against.
+
+        Latencies are in ms, throughput in requests per second.
+        :rtype: dict
+        """
+        count = self.requests
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': self.errors / count if count else 0.0,
+            'throughput': count / self.duration if self.duration else 0.0,
+            'mean': sum(self.latencies) * 1000 / count if count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': max(self.latencies) * 1000 if count else 0.0,
+        }
+
+    def report(self):
+        """Return the summary, outcomes and histogram as text."""
+        summary = self.summary()
+        lines = ['{requests} requests, {errors} errors ({error_rate:.2%}), '
+                 '{throughput:.1f} req/s; latency ms mean {mean:.1f}, '
+                 'p50 {p50:.1f}, p95 {p95:.1f}, p99 {p99:.1f}, '
+                 'max {max:.1f}'.format(**summary)]
+        lines.append('Outcomes: {}'.format(', '.join(
+            '{} x{}'.format(outcome, count) for outcome, count
+            in self.outcomes.most_common())))
+        for bound, count in self.histogram():
+            if count:
+                lines.append('  {:>8} {:6d}'.format(
+                    '<={}ms'.format(bound) if bound else 'slower', count))
+        return '\n'.join(lines)
+
+    def check_slo(self, **slo):
+        """Return the SLOs missed as readable strings.
+
+        :param slo: limits on summary figures, e.g. p95=200,
+            error_rate=0.01, throughput=50 (a minimum).
+        """
+        summary = self.summary()
+        missed = []
+        for name, limit in sorted(slo.items()):
+            if name not in summary:
+                raise AssertionError("Unknown SLO '{}'".format(name))
+            value = summary[name]
+            if name in MINIMUM_SLOS and value < limit:
+                missed.append('{} {:.2f} < {}'.format(name, value, limit))
+            elif name not in MINIMUM_SLOS and value > limit:
+                missed.append('{} {:.2f} > {}'.format(name, value, limit))
+        return missed
+
+
+def outcome_of(response):
+    """Return the outcome name of a scenario result and if it failed.
+
+    Scenarios may return a response, a list of them, or nothing.
+    """
+    if isinstance(response, (list, tuple)):
+        outcomes = [outcome_of(item) for item in response] or [('ok', False)]
+        return next((outcome for outcome in outcomes if outcome[1]),
+                    outcomes[-1])
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        return 'ok', False
+    return status, status >= 400
+
+
+class LoadRunner(object):
+    """Run a scenario from a thread pool at a concurrency or a rate.
+
+    With a rate, requests are started on a fixed schedule (open model)
+    and latency is measured from the scheduled start, so time spent
+    waiting for a free worker counts instead of being hidden.
+    """
+
+    def __init__(self, scenario, concurrency=10, rate=None, duration=None,
+                 iterations=None):
+        """Runner declarations.
+
+        :param scenario: callable sending the requests of one iteration,
+            failing by raising or returning an error response.
+        :param concurrency: worker threads.
+        :param rate: (optional) iterations started per second.
+        :param duration: (optional) seconds to run.
+        :param iterations: (optional) iterations to run, defaults to
+            10 per worker when no duration is given.
+        """
+        if duration is None and iterations is None:
+            iterations = concurrency * 10
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.iterations = iterations
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def _ticket(self, result):
+        """Return the scheduled start of the next iteration, None if done."""
+        with self._lock:
+            index = self._issued
+            if self.iterations is not None and index >= self.iterations:
+                return None
+            if self.rate:
+                start = result.started + index / float(self.rate)
+            else:
+                start = time.time()
+            if (self.duration is not None and
+                    start - result.started >= self.duration):
+                return None
+            self._issued += 1
+            return start
+
+    def _worker(self, result):
+        """Run iterations until the run is over."""
+        while True:
+            start = self._ticket(result)
+            if start is None:
+                return
+            delay = start - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                outcome, failed = outcome_of(self.scenario())
+            except Exception as e:
+                outcome, failed = type(e).__name__, True
+            result.record(time.time() - start, outcome, failed)
+
+    def run(self):
+        """Run the scenario and return the LoadResult."""
+        result = LoadResult()
+        self._issued = 0
+        result.started = time.time()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            workers = [executor.submit(self._worker, result)
+                       for _ in range(self.concurrency)]
+            for worker in workers:
+                worker.result()
+        result.ended = time.time()
+        return result
@@ -0,0 +1,124 @@
+"""Immutable locators resolving their selenium By strategy once."""
+from functools import lru_cache
+
+from selenium.webdriver.common.by import By
+
+# Longest names first so 'By.CLASS_NAME' doesn't resolve to By.NAME.
+STRATEGIES = (
+    ('PARTIAL_LINK_TEXT', By.PARTIAL_LINK_TEXT),
+    ('CSS_SELECTOR', By.CSS_SELECTOR),
+    ('CLASS_NAME', By.CLASS_NAME),
+    ('LINK_TEXT', By.LINK_TEXT),
+    ('TAG_NAME', By.TAG_NAME),
+    ('XPATH', By.XPATH),
+    ('NAME', By.NAME),
+    ('ID', By.ID),
+)
+
+
+@lru_cache(maxsize=None)
+def resolve_by(by):
+    """Return the selenium By value for strings like 'By.ID' or 'xpath'.
+
+    :param by: locator type as written in locator dictionaries.
+    :rtype: str
+    """
+    text = by.upper().replace(' ', '_')
+    if text.startswith('BY.'):
+        text = text[3:]
+    for name, strategy in STRATEGIES:
+        if text == name:
+            return strategy
+    for name, strategy in STRATEGIES:
+        if name in text:
+            return strategy
+    raise AssertionError("Invalid locator type '{}'".format(by))
+
+
+class Locator(object):
+    """Locator of an element, usable wherever a locator dictionary is.
+
+    Built from the usual dictionaries
+    ({'by': 'By.ID', 'locatorvalue': 'search', 'value': 'text to send'})
+    with Locator.of, or directly as Locator('By.ID', 'search').
+    """
+
+    __slots__ = ('by', 'locatorvalue', 'value', '_hash')
+
+    def __init__(self, by, locatorvalue, value=None):
+        """Resolve the By strategy of the locator.
+
+        :param by: locator type, e.g. 'By.ID' or 'css selector'.
+        :param locatorvalue: value identifying the element.
+        :param value: (optional) text sent by send_keys.
+        """
+        set_slot = object.__setattr__
+        set_slot(self, 'by', resolve_by(by))
+        set_slot(self, 'locatorvalue', locatorvalue)
+        set_slot(self, 'value', value)
+        set_slot(self, '_hash', hash((self.by, locatorvalue, value)))
+
+    @classmethod
+    def of(cls, locator):
+        """Return the passed locator as a Locator.
+
+        :param locator: Locator or locator dictionary.
+        """
+        if isinstance(locator, cls):
+            return locator
+        if isinstance(locator, dict):
+            return cls(locator['by'], locator['locatorvalue'],
+                       locator.get('value'))
+        raise AssertionError("Locator type should be dictionary.")
+
+    @property
+    def selector(self):
+        """Return the (by, value) pair taken by find_element."""
+        return self.by, self.locatorvalue
+
+    def get(self, key, default=None):
+        """Dictionary style access for code written against dicts."""
+        if key in self.__slots__[:3]:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        """Dictionary style access for code written against dicts."""
+        if key not in self.__slots__[:3]:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setattr__(self, name, value):
+        """Locators are immutable."""
+        raise AttributeError("Locator is immutable")
+
+    def __delattr__(self, name):
+        """Locators are immutable."""
+        raise AttributeError("Locator is immutable")
+
+    def __eq__(self, other):
+        """Compare strategy, locator value and value."""
+        if not isinstance(other, Locator):
+            return NotImplemented
+        return (self.by, self.locatorvalue, self.value) == (
+            other.by, other.locatorvalue, other.value)
+
+    def __hash__(self):
+        """Return the hash computed when the locator was built."""
+        return self._hash
+
+    def __reduce__(self):
+        """Pickle through the constructor, slots are read only."""
+        return Locator, (self.by, self.locatorvalue, self.value)
+
+    def __repr__(self):
+        """Representation of the locator."""
+        return 'Locator({!r}, {!r})'.format(self.by, self.locatorvalue)
+
+
+def is_locator(locator):
+    """Return True for Locator objects and locator dictionaries.
+
+    :rtype: bool
+    """
+    return isinstance(locator, (Locator, dict))
@@ -0,0 +1,209 @@
+"""Dotted response paths compiled once into accessors."""
+from functools import lru_cache
+
+WILDCARD = '*'
+
+
+def _key(name):
+    """Return the accessor of a dictionary key."""
+    def get(value):
+        return value[name]
+    return get
+
+
+def _index(number):
+    """Return the accessor of a list index, or of a digit key."""
+    def get(value):
+        if isinstance(value, dict) and number not in value:
+            return value[str(number)]
+        return value[number]
+    return get
+
+
+class ResponsePath(object):
+    """Accessor of the values at a path like resp.data.0.name.
+
+    The leading 'resp' names the response itself, numbers index lists
+    and '*' matches every item of a list or every value of a dictionary.
+    """
+
+    __slots__ = ('path', 'segments', 'steps', 'wildcard')
+
+    def __init__(self, path):
+        """Parse the path.
+
+        :param path: key path in dot format, e.g. resp.data.*.name.
+        """
+        parts = path.split('.')
+        if parts and parts[0] == 'resp':
+            parts = parts[1:]
+        segments, steps = [], []
+        for part in parts:
+            if part == WILDCARD:
+                segments.append(None)
+                steps.append(None)
+                continue
+            try:
+                segments.append(int(part))
+                steps.append(_index(int(part)))
+            except ValueError:
+                segments.append(part)
+                steps.append(_key(part))
+        self.path = path
+        self.segments = tuple(segments)
+        self.steps = tuple(steps)
+        self.wildcard = None in self.steps
+
+    def get(self, data):
+        """Return the value at the path.
+
+        Paths with a wildcard return the list of all matches.
+        Missing keys raise KeyError, IndexError or TypeError.
+        :param data: parsed json response.
+        """
+        if self.wildcard:
+            return self.find_all(data)
+        for step in self.steps:
+            data = step(data)
+        return data
+
+    def find_all(self, data):
+        """Return every value matching the path, [] when none does.
+
+        Branches missing a key are skipped.
+        :param data: parsed json response.
+        :rtype: list
+        """
+        values = [data]
+        for step in self.steps:
+            matches = []
+            for value in values:
+                if step is None:
+                    if isinstance(value, dict):
+                        matches.extend(value.values())
+                    elif isinstance(value, list):
+                        matches.extend(value)
+                    continue
+                try:
+                    matches.append(step(value))
+                except (KeyError, IndexError, TypeError):
+                    continue
+            values = matches
+        return values
+
+    def matches(self, location):
+        """Return True when a location is one the path points to.
+
+        Used on streamed documents, where negative indexes never match.
+        :param location: tuple of the keys and list indexes leading to
+            a value.
+        """
+        if len(location) != len(self.segments):
+            return False
+        for segment, part in zip(self.segments, location):
+            if segment is None or segment == part:
+                continue
+            if isinstance(segment, int) and part == str(segment):
+                continue
+            return False
+        return True
+
+    def __repr__(self):
+        """Representation of the path."""
+        return 'ResponsePath({!r})'.format(self.path)
+
+
+class _Node(object):
+    """Trie node: the paths ending here and the segments going on."""
+
+    __slots__ = ('children', 'wildcard', 'paths')
+
+    def __init__(self):
+        """Node declarations."""
+        self.children = {}
+        self.wildcard = None
+        self.paths = []
+
+
+class PathTrie(object):
+    """Paths grouped by shared prefix, resolved in one walk of a document.
+
+    Each key and list item common to several paths is looked up once,
+    instead of once per path from the root.
+    """
+
+    def __init__(self, paths):
+        """Build the trie.
+
+        :param paths: ResponsePath objects.
+        """
+        self.paths = list(paths)
+        self.root = _Node()
+        for path in self.paths:
+            node = self.root
+            for segment in path.segments:
+                if segment is None:
+                    if node.wildcard is None:
+                        node.wildcard = _Node()
+                    node = node.wildcard
+                else:
+                    child = node.children.get(segment)
+                    if child is None:
+                        child = node.children[segment] = _Node()
+                    node = child
+            node.paths.append(path)
+
+    def resolve(self, data):
+        """Return the values found at each path, in document order.
+
+        Paths without a wildcard get at most one value; missing keys give
+        no value.
+        :param data: parsed json response.
+        :rtype: dict
+        """
+        found = {path: [] for path in self.paths}
+        self._walk(self.root, data, found)
+        return found
+
+    def _walk(self, node, value, found):
+        """Collect the values below node."""
+        for path in node.paths:
+            found[path].append(value)
+        for segment, child in node.children.items():
+            if isinstance(value, dict):
+                if segment in value:
+                    self._walk(child, value[segment], found)
+                elif isinstance(segment, int) and str(segment) in value:
+                    self._walk(child, value[str(segment)], found)
+            elif isinstance(value, list) and isinstance(segment, int):
+                if -len(value) <= segment < len(value):
+                    self._walk(child, value[segment], found)
+        if node.wildcard is not None:
+            if isinstance(value, dict):
+                items = value.values()
+            elif isinstance(value, list):
+                items = value
+            else:
+                return
+            for item in items:
+                self._walk(node.wildcard, item, found)
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path):
+    """Return the cached ResponsePath of a dotted path.
+
+    :param path: key path in dot format, e.g. resp.data.0.name.
+    :rtype: ResponsePath
+    """
+    return ResponsePath(path)
+
+
+@lru_cache(maxsize=256)
+def compile_trie(paths):
+    """Return the cached PathTrie of a tuple of dotted paths.
+
+    :param paths: tuple of key paths in dot format.
+    :rtype: PathTrie
+    """
+    return PathTrie(compile_path(path) for path in paths)
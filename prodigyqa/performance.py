@@ -0,0 +1,150 @@
+"""Page load metrics and network activity of Chrome pages."""
+import json
+
+import time
+
+# Records long tasks from the start of every document, as they are not
+# kept in the performance timeline for later reads.
+LONG_TASK_OBSERVER = '''
+window.__prodigyqaLongTasks = [];
+try {
+    new PerformanceObserver(function (list) {
+        list.getEntries().forEach(function (entry) {
+            window.__prodigyqaLongTasks.push(
+                {start: entry.startTime, duration: entry.duration});
+        });
+    }).observe({entryTypes: ['longtask']});
+} catch (e) {}
+'''
+
+PAGE_METRICS_SCRIPT = '''
+var navigation = performance.getEntriesByType('navigation')[0], timing;
+if (navigation) {
+    timing = {
+        responseStart: navigation.responseStart,
+        domContentLoaded: navigation.domContentLoadedEventEnd,
+        load: navigation.loadEventEnd,
+        transferSize: navigation.transferSize || 0
+    };
+} else {
+    var legacy = performance.timing;
+    timing = {
+        responseStart: legacy.responseStart - legacy.navigationStart,
+        domContentLoaded:
+            legacy.domContentLoadedEventEnd - legacy.navigationStart,
+        load: Math.max(legacy.loadEventEnd - legacy.navigationStart, 0),
+        transferSize: 0
+    };
+}
+var paint = performance.getEntriesByName('first-contentful-paint')[0];
+var resources = performance.getEntriesByType('resource').map(function (r) {
+    return {name: r.name, type: r.initiatorType, start: r.startTime,
+            duration: r.duration, transfer_size: r.transferSize || 0,
+            encoded_size: r.encodedBodySize || 0};
+});
+return {
+    url: location.href,
+    timing: timing,
+    first_contentful_paint: paint ? paint.startTime : null,
+    resources: resources,
+    long_tasks: window.__prodigyqaLongTasks || null
+};
+'''
+
+RESOURCE_COUNT_SCRIPT = '''
+return [performance.getEntriesByType('resource').length,
+        window.__prodigyqaPending || 0];
+'''
+
+
+def page_metrics(driver):
+    """Return load metrics of the current page of driver.
+
+    Times are in milliseconds from the start of the navigation, sizes
+    in bytes. long_tasks and long_task_time are None when the driver
+    wasn't started with performance_log, as long tasks can't be read
+    after the fact.
+    :rtype: dict
+    """
+    raw = driver.execute_script(PAGE_METRICS_SCRIPT)
+    timing = raw['timing']
+    resources = raw['resources']
+    long_tasks = raw['long_tasks']
+    return {
+        'url': raw['url'],
+        'ttfb': timing['responseStart'],
+        'dom_content_loaded': timing['domContentLoaded'],
+        'load': timing['load'],
+        'first_contentful_paint': raw['first_contentful_paint'],
+        'requests': len(resources) + 1,
+        'transfer_size': timing['transferSize'] + sum(
+            resource['transfer_size'] for resource in resources),
+        'long_tasks': None if long_tasks is None else len(long_tasks),
+        'long_task_time': None if long_tasks is None else sum(
+            task['duration'] for task in long_tasks),
+        'resources': resources,
+        'long_task_entries': long_tasks or [],
+    }
+
+
+def check_budget(metrics, budgets):
+    """Return the metrics over their budget as readable strings.
+
+    :param metrics: dictionary returned by page_metrics.
+    :param budgets: maximum value per metric name, e.g. {'load': 3000}.
+    """
+    over = []
+    for name, limit in sorted(budgets.items()):
+        if name not in metrics:
+            raise AssertionError("Unknown page metric '{}'".format(name))
+        value = metrics[name]
+        if value is not None and value > limit:
+            over.append('{} {} > {}'.format(name, round(value, 1), limit))
+    return over
+
+
+class NetworkMonitor(object):
+    """Track requests in flight from Chrome's performance log.
+
+    The driver has to be started with performance logging, e.g. by
+    ChromeDriverFactory(performance_log=True). Reading the log drains
+    it, so one monitor is kept per driver.
+    """
+
+    def __init__(self, driver):
+        """Monitor declarations.
+
+        :param driver: Chrome driver with performance logging enabled.
+        """
+        self.driver = driver
+        self.inflight = {}
+        self.transferred = 0
+        self.last_activity = time.time()
+
+    def poll(self):
+        """Read new log entries and update the requests in flight.
+
+        :return: number of requests in flight.
+        """
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method, params = message['method'], message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                url = params['request']['url']
+                if not url.startswith('data:'):
+                    self.inflight[params['requestId']] = url
+                    self.last_activity = time.time()
+            elif method in ('Network.loadingFinished',
+                            'Network.loadingFailed'):
+                if self.inflight.pop(params['requestId'], None) is not None:
+                    self.last_activity = time.time()
+                self.transferred += params.get('encodedDataLength', 0)
+        return len(self.inflight)
+
+
+def resource_activity(driver):
+    """Return a value which changes while the page loads resources.
+
+    Used to detect network idle on drivers without a performance log.
+    """
+    return tuple(driver.execute_script(RESOURCE_COUNT_SCRIPT))
@@ -0,0 +1,253 @@
+"""Run test classes in parallel across a pool of browser processes.
+
+Usage: python -m prodigyqa.runner -n 4 tests.test_module tests.other.Class
+"""
+from loguru import logger
+
+import argparse
+
+import importlib
+
+import inspect
+
+import json
+
+import multiprocessing
+
+import os
+
+import sys
+
+import time
+
+import traceback
+
+import unittest
+
+from multiprocessing import util
+
+from prodigyqa.driverpool import close_pools
+
+DURATIONS_FILE = '.prodigyqa_durations.json'
+
+
+class _RecordingResult(unittest.TestResult):
+    """Test result keeping a picklable record of every test outcome."""
+
+    def __init__(self):
+        """Variable Stack Declaration."""
+        super(_RecordingResult, self).__init__()
+        self.records = []
+        self._started = None
+
+    def startTest(self, test):
+        """Remember when the test started."""
+        super(_RecordingResult, self).startTest(test)
+        self._started = time.time()
+
+    def _record(self, test, outcome, details=None):
+        """Store the outcome of a finished test."""
+        self.records.append({
+            'test': test.id(), 'outcome': outcome, 'details': details,
+            'duration': time.time() - (self._started or time.time())})
+
+    def addSuccess(self, test):
+        """Record a passed test."""
+        super(_RecordingResult, self).addSuccess(test)
+        self._record(test, 'passed')
+
+    def addFailure(self, test, err):
+        """Record a failed test."""
+        super(_RecordingResult, self).addFailure(test, err)
+        self._record(test, 'failed', self.failures[-1][1])
+
+    def addError(self, test, err):
+        """Record a test which raised an error."""
+        super(_RecordingResult, self).addError(test, err)
+        self._record(test, 'error', self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        """Record a skipped test."""
+        super(_RecordingResult, self).addSkip(test, reason)
+        self._record(test, 'skipped', reason)
+
+    def addExpectedFailure(self, test, err):
+        """Record an expected failure as passed."""
+        super(_RecordingResult, self).addExpectedFailure(test, err)
+        self._record(test, 'passed')
+
+    def addUnexpectedSuccess(self, test):
+        """Record an unexpected success as failed."""
+        super(_RecordingResult, self).addUnexpectedSuccess(test)
+        self._record(test, 'failed', 'Unexpected success')
+
+
+def _import_class(name):
+    """Import a test class from its dotted 'module.Class' name."""
+    module_name, class_name = name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _init_worker():
+    """Quit the pooled drivers of a worker when the pool shuts it down.
+
+    Worker processes end without running atexit handlers.
+    """
+    util.Finalize(None, close_pools, exitpriority=10)
+
+
+def _run_class(name):
+    """Run all tests of one class inside a worker process.
+
+    Drivers stay in the worker's driver pool between classes. A class
+    which can't be imported or run is reported as one error record
+    instead of aborting the whole run.
+    :return: class name, wall time and test records.
+    """
+    result = _RecordingResult()
+    start = time.time()
+    try:
+        suite = unittest.defaultTestLoader.loadTestsFromTestCase(
+            _import_class(name))
+        suite.run(result)
+    except Exception:
+        result.records.append({
+            'test': name, 'outcome': 'error',
+            'details': traceback.format_exc(),
+            'duration': time.time() - start})
+    return name, time.time() - start, result.records
+
+
+def collect_classes(names):
+    """Return the 'module.Class' names of test classes to run.
+
+    :param names: dotted module names (all TestCase classes defined in
+        them are used) or 'module.Class' names.
+    """
+    classes = []
+    for name in names:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            classes.append(name)
+            continue
+        loader = unittest.defaultTestLoader
+        for attr, value in sorted(vars(module).items()):
+            if (inspect.isclass(value) and
+                    issubclass(value, unittest.TestCase) and
+                    value.__module__ == module.__name__ and
+                    loader.getTestCaseNames(value)):
+                classes.append('{}.{}'.format(name, attr))
+    return classes
+
+
+class ParallelRunner(object):
+    """Shard test classes across worker processes, each with its drivers.
+
+    Classes are dispatched longest first by their last recorded
+    duration, so slow classes don't end up starting last.
+    """
+
+    def __init__(self, workers=None, durations_file=DURATIONS_FILE):
+        """Runner declarations.
+
+        :param workers: number of worker processes, defaults to the
+            PRODIGYQA_WORKERS environment variable or the cpu count.
+        :param durations_file: json file of class durations from
+            previous runs.
+        """
+        self.workers = workers or int(os.environ.get(
+            'PRODIGYQA_WORKERS', multiprocessing.cpu_count()))
+        self.durations_file = durations_file
+        self.durations = self._load_durations()
+
+    def _load_durations(self):
+        """Read the durations recorded by previous runs."""
+        if not os.path.exists(self.durations_file):
+            return {}
+        try:
+            with open(self.durations_file) as f:
+                return json.load(f)
+        except ValueError:
+            logger.warning("Ignoring unreadable durations file '{}'".format(
+                self.durations_file))
+            return {}
+
+    def _save_durations(self):
+        """Write class durations for the next run's scheduling."""
+        with open(self.durations_file, 'w') as f:
+            json.dump(self.durations, f, indent=2, sort_keys=True)
+
+    def schedule(self, classes):
+        """Order classes longest first; unknown ones count as average.
+
+        :param classes: 'module.Class' names.
+        """
+        known = [self.durations[name] for name in classes
+                 if name in self.durations]
+        default = sum(known) / len(known) if known else 0
+        return sorted(classes, key=lambda name: self.durations.get(
+            name, default), reverse=True)
+
+    def run(self, classes):
+        """Run the classes and return the merged results.
+
+        :param classes: 'module.Class' names or TestCase classes.
+        :return: dictionary with 'records', per outcome counts and
+            'duration'.
+        :rtype: dict
+        """
+        classes = [name if isinstance(name, str) else '{}.{}'.format(
+            name.__module__, name.__name__) for name in classes]
+        ordered = self.schedule(classes)
+        start = time.time()
+        records = []
+        if self.workers == 1 or len(ordered) < 2:
+            outcomes = map(_run_class, ordered)
+            self._merge(outcomes, records)
+        else:
+            pool = multiprocessing.Pool(
+                min(self.workers, len(ordered)), initializer=_init_worker)
+            try:
+                self._merge(pool.imap_unordered(_run_class, ordered), records)
+            finally:
+                pool.close()
+                pool.join()
+        self._save_durations()
+        summary = {'records': records, 'duration': time.time() - start}
+        for outcome in ('passed', 'failed', 'error', 'skipped'):
+            summary[outcome] = sum(
+                1 for record in records if record['outcome'] == outcome)
+        return summary
+
+    def _merge(self, outcomes, records):
+        """Collect worker outcomes as they arrive."""
+        for name, duration, class_records in outcomes:
+            self.durations[name] = round(duration, 3)
+            records.extend(class_records)
+            logger.info("{} finished in {:.2f}s".format(name, duration))
+
+
+def main(argv=None):
+    """Command line entry point, returns the process exit code."""
+    parser = argparse.ArgumentParser(
+        description='Run test classes in parallel browser processes.')
+    parser.add_argument('names', nargs='+',
+                        help="test modules or 'module.Class' names")
+    parser.add_argument('-n', '--workers', type=int, default=None)
+    parser.add_argument('--durations-file', default=DURATIONS_FILE)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, os.getcwd())
+    runner = ParallelRunner(args.workers, args.durations_file)
+    summary = runner.run(collect_classes(args.names))
+    for record in summary['records']:
+        if record['outcome'] in ('failed', 'error'):
+            print('{} {}\n{}'.format(
+                record['outcome'].upper(), record['test'], record['details']))
+    print('{passed} passed, {failed} failed, {error} errors, '
+          '{skipped} skipped in {duration:.2f}s'.format(**summary))
+    return 1 if summary['failed'] or summary['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
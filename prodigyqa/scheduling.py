@@ -0,0 +1,203 @@
+"""Client side rate limiting and retries of ApiTester requests."""
+from loguru import logger
+
+import os
+
+import random
+
+import threading
+
+import time
+
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from prodigyqa.sessions import base_url
+
+# Requests per second sent to each host, unlimited when unset.
+RATE_LIMIT = float(os.environ.get('PRODIGYQA_HTTP_RATE', 0)) or None
+
+RETRIES = int(os.environ.get('PRODIGYQA_REQUEST_RETRIES', 2))
+
+RETRY_STATUSES = (429, 503)
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE')
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def retry_after(response):
+    """Return the seconds a response's Retry-After header asks to wait.
+
+    Both delay seconds and HTTP dates are understood; None when the
+    header is absent or invalid.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(),
+                   0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_idempotent(method, headers=None):
+    """Return True when a request can safely be sent again.
+
+    POST and PATCH requests are, only with an Idempotency-Key header.
+    """
+    if method.upper() in IDEMPOTENT_METHODS:
+        return True
+    return any(name.lower() == IDEMPOTENCY_HEADER.lower()
+               for name in headers or ())
+
+
+class TokenBucket(object):
+    """Rate limiter letting rate requests a second through, burst at once.
+
+    Callers reserve a token and sleep until it's due, so waiting threads
+    are served in order without polling. pause() holds every caller, as
+    asked by a Retry-After header.
+    """
+
+    def __init__(self, rate=None, burst=None, clock=time.time,
+                 sleep=time.sleep):
+        """Bucket declarations.
+
+        :param rate: tokens added per second, None for no limit.
+        :param burst: tokens the bucket holds, rate (at least 1) by
+            default.
+        :param clock: function returning the current time in seconds.
+        :param sleep: function waiting a number of seconds.
+        """
+        self.rate = rate
+        self.burst = burst or max(rate or 1, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for a token, return the seconds waited."""
+        with self._lock:
+            now = self.clock()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (
+                    now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+        if wait:
+            self.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold the requests of every caller for seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     self.clock() + seconds)
+
+
+class RequestScheduler(object):
+    """Send requests per host at a limited rate, retrying transient errors.
+
+    Responses with a retry status and connection errors are retried with
+    jittered exponential backoff, or after the delay of a Retry-After
+    header, which also holds the other requests to that host. Only
+    idempotent requests are retried.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=None, retries=RETRIES,
+                 retry_statuses=RETRY_STATUSES, backoff=0.5, max_backoff=30,
+                 clock=time.time, sleep=time.sleep):
+        """Scheduler declarations.
+
+        :param rate: requests per second per host, None for no limit.
+        :param burst: requests sent at once before the rate applies.
+        :param retries: times a request is sent again.
+        :param retry_statuses: status codes retried.
+        :param backoff: first retry waits up to backoff s, doubling after.
+        :param max_backoff: longest wait; a longer Retry-After isn't
+            waited for and its response is returned.
+        :param clock: function returning the current time in seconds.
+        :param sleep: function waiting a number of seconds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.retry_statuses = retry_statuses
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        """Return the TokenBucket of url's host."""
+        base = base_url(url)
+        with self._lock:
+            bucket = self._buckets.get(base)
+            if bucket is None:
+                bucket = self._buckets[base] = TokenBucket(
+                    self.rate, self.burst, self.clock, self.sleep)
+            return bucket
+
+    def delay(self, attempt):
+        """Return the jittered backoff before retry number attempt."""
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+    def send(self, method, url, headers, request, limit=True):
+        """Send a request through the host's rate limit, with retries.
+
+        :param method: HTTP method, deciding if retries are safe.
+        :param url: request url.
+        :param headers: request headers, checked for Idempotency-Key.
+        :param request: callable sending the request, returning the
+            response.
+        :param limit: False skips the rate limit, e.g. for replays.
+        """
+        bucket = self.bucket(url)
+        retries = self.retries if is_idempotent(method, headers) else 0
+        attempt = 0
+        while True:
+            if limit:
+                bucket.acquire()
+            try:
+                response = request()
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                if attempt >= retries:
+                    raise
+                wait = self.delay(attempt)
+                logger.warning("{} {} failed ({}), retrying in {:.2f}s".format(
+                    method, url, type(e).__name__, wait))
+            else:
+                if (response is None or attempt >= retries or
+                        response.status_code not in self.retry_statuses):
+                    return response
+                wait = retry_after(response)
+                if wait is None:
+                    wait = self.delay(attempt)
+                elif wait > self.max_backoff:
+                    return response
+                else:
+                    bucket.pause(wait)
+                    # Spread the retries of requests held together.
+                    wait += random.uniform(0, self.backoff)
+                logger.warning("{} {} returned {}, retrying".format(
+                    method, url, response.status_code))
+                response.close()
+            attempt += 1
+            self.sleep(wait)
@@ -0,0 +1,441 @@
+"""JSON Schema subset compiled into validator functions.
+
+Schemas are turned into Python source checking the whole document in
+straight-line code, with key paths only built for failures.
+Supported keywords: type, enum, const, properties, required,
+additionalProperties, items, minItems, maxItems, uniqueItems, minLength,
+maxLength, pattern, minimum, maximum, exclusiveMinimum,
+exclusiveMaximum, multipleOf, allOf, anyOf, oneOf, not and local $ref
+('#/definitions/...' or '#/$defs/...'). Annotations such as title or
+format are ignored; other keywords raise when compiling.
+"""
+import json
+
+import re
+
+import reprlib
+
+from functools import lru_cache
+
+# Keywords in the order their checks are generated, type first.
+KEYWORDS = ('type', 'enum', 'const', 'required', 'properties',
+            'additionalProperties', 'items', 'minItems', 'maxItems',
+            'uniqueItems', 'minLength', 'maxLength', 'pattern', 'minimum',
+            'maximum', 'exclusiveMinimum', 'exclusiveMaximum', 'multipleOf',
+            'allOf', 'anyOf', 'oneOf', 'not', '$ref')
+
+ANNOTATIONS = ('$schema', '$id', 'id', 'title', 'description', 'default',
+               'examples', 'format', 'definitions', '$defs', '$comment',
+               'readOnly', 'writeOnly', 'deprecated')
+
+TYPES = {
+    'object': 'isinstance({0}, dict)',
+    'array': 'isinstance({0}, list)',
+    'string': 'isinstance({0}, str)',
+    'boolean': '({0} is True or {0} is False)',
+    'null': '{0} is None',
+    'number': '(isinstance({0}, (int, float)) and '
+              'not isinstance({0}, bool))',
+    'integer': '(isinstance({0}, int) and not isinstance({0}, bool) or '
+               'isinstance({0}, float) and {0}.is_integer())',
+}
+
+NUMBER = TYPES['number']
+
+SCHEMA_CACHE_SIZE = 256
+
+
+def format_path(path, root='resp'):
+    """Return a location tuple as a resp.a.0.b key path."""
+    return '.'.join([root] + [str(part) for part in path])
+
+
+def _matches(validators, value):
+    """Return the number of validators value passes."""
+    matched = 0
+    for validator in validators:
+        errors = []
+        validator(value, (), errors)
+        matched += not errors
+    return matched
+
+
+def _canonical(value):
+    """Return value with integral floats as ints, as JSON compares them."""
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _duplicate(items):
+    """Return the index of the first repeated item, None if all differ.
+
+    Items are compared by their canonical JSON text, so 1 and true
+    differ while 1 and 1.0 don't.
+    """
+    seen = set()
+    for index, item in enumerate(items):
+        if isinstance(item, (dict, list)):
+            key = json.dumps(_canonical(item), sort_keys=True, default=repr)
+        else:
+            # Scalars tagged by type: True == 1 but they are distinct.
+            key = type(item) is bool, _canonical(item)
+        if key in seen:
+            return index
+        seen.add(key)
+    return None
+
+
+def _number(keyword, value, integer=False):
+    """Return a keyword's numeric value, raising for anything else.
+
+    Values end up in generated code, so nothing but numbers gets there.
+    """
+    kinds = int if integer else (int, float)
+    if not isinstance(value, kinds) or isinstance(value, bool):
+        raise AssertionError("{} should be {}, not {}".format(
+            keyword, 'an integer' if integer else 'a number',
+            reprlib.repr(value)))
+    return value
+
+
+def _names(keyword, names):
+    """Return a keyword's property names, raising unless all are str."""
+    if not all(isinstance(name, str) for name in names):
+        raise AssertionError("{} should only hold strings, not {}".format(
+            keyword, reprlib.repr(names)))
+    return names
+
+
+def _text(text):
+    """Escape text for use in a % format string."""
+    return text.replace('%', '%%')
+
+
+class _Generator(object):
+    """Generate the Python source of the validators of a schema.
+
+    Each generated function is called as validate(value, path, errors):
+    path is the tuple of keys leading to value and (path, message) pairs
+    are appended to errors.
+    """
+
+    def __init__(self, root):
+        """Generator declarations."""
+        self.root = root
+        self.namespace = {'reprlib': reprlib, '_matches': _matches,
+                          '_duplicate': _duplicate}
+        self.functions = []
+        self._refs = {}
+        self._count = 0
+
+    def name(self, prefix, value=None):
+        """Return a new variable name, bound to value when given."""
+        self._count += 1
+        name = '{}{}'.format(prefix, self._count)
+        if value is not None:
+            self.namespace[name] = value
+        return name
+
+    def function(self, schema, name=None):
+        """Generate the validator function of schema, return its name."""
+        name = name or self.name('validate')
+        body = self.block(schema, 'value', 'path', 1)
+        self.functions.append('\n'.join(
+            ['def {}(value, path, errors):'.format(name)] +
+            (body or ['    pass'])))
+        return name
+
+    def block(self, schema, var, path, depth):
+        """Return the lines checking variable var against schema.
+
+        :param path: expression of var's key path, only evaluated on
+            failures.
+        :param depth: indentation level.
+        """
+        if schema is True or schema == {}:
+            return []
+        if schema is False:
+            return self.fail(depth, path, 'no value is allowed')
+        if not isinstance(schema, dict):
+            raise AssertionError("Invalid schema {}".format(
+                reprlib.repr(schema)))
+        unknown = [key for key in schema
+                   if key not in KEYWORDS and key not in ANNOTATIONS]
+        if unknown:
+            raise AssertionError("Unsupported schema keywords {}".format(
+                unknown))
+        lines = []
+        for key in KEYWORDS:
+            if key in schema:
+                method = getattr(self, '_' + key.lstrip('$'))
+                lines.extend(method(schema[key], schema, var, path, depth))
+        return lines
+
+    def fail(self, depth, path, template, *values):
+        """Return the line adding a failure message.
+
+        :param template: message with a %s per expression in values.
+        """
+        message = repr(template)
+        if values:
+            message += ' % ({},)'.format(', '.join(values))
+        return ['{}errors.append(({}, {}))'.format('    ' * depth, path,
+                                                   message)]
+
+    def check(self, condition, depth, path, template, *values):
+        """Return the lines failing when condition is true."""
+        return (['{}if {}:'.format('    ' * depth, condition)] +
+                self.fail(depth + 1, path, template, *values))
+
+    def _type(self, names, schema, var, path, depth):
+        names = [names] if isinstance(names, str) else list(names)
+        unknown = [name for name in names if name not in TYPES]
+        if unknown:
+            raise AssertionError("Unknown schema types {}".format(unknown))
+        condition = ' or '.join(TYPES[name].format(var) for name in names)
+        return self.check('not ({})'.format(condition), depth, path,
+                          _text('expected {}, got '.format(
+                              ' or '.join(names))) + '%s',
+                          'type({}).__name__'.format(var))
+
+    def _enum(self, options, schema, var, path, depth):
+        constant = self.name('enum', list(options))
+        return self.check('{} not in {}'.format(var, constant), depth, path,
+                          '%s not in ' + _text(reprlib.repr(options)),
+                          'reprlib.repr({})'.format(var))
+
+    def _const(self, const, schema, var, path, depth):
+        constant = self.name('const', [const])
+        return self.check('{} != {}[0]'.format(var, constant), depth, path,
+                          '%s != ' + _text(reprlib.repr(const)),
+                          'reprlib.repr({})'.format(var))
+
+    def _required(self, names, schema, var, path, depth):
+        indent = '    ' * depth
+        name = self.name('key')
+        names = self.name('required', tuple(_names('required', names)))
+        return ['{}if isinstance({}, dict):'.format(indent, var),
+                '{}    for {} in {}:'.format(indent, name, names)] + \
+            self.check('{} not in {}'.format(name, var), depth + 2, path,
+                       'missing %r', name)
+
+    def _properties(self, properties, schema, var, path, depth):
+        indent = '    ' * depth
+        lines = []
+        _names('properties', properties)
+        for key, subschema in properties.items():
+            item = self.name('value')
+            body = self.block(subschema, item, '{} + ({!r},)'.format(
+                path, key), depth + 2)
+            if body:
+                lines.extend(['{}    if {!r} in {}:'.format(indent, key, var),
+                              '{}        {} = {}[{!r}]'.format(
+                                  indent, item, var, key)] + body)
+        if not lines:
+            return []
+        return ['{}if isinstance({}, dict):'.format(indent, var)] + lines
+
+    def _additionalProperties(self, additional, schema, var, path, depth):
+        indent = '    ' * depth
+        key, item = self.name('key'), self.name('value')
+        known = self.name('known', frozenset(schema.get('properties', ())))
+        if additional is False:
+            body = self.fail(depth + 3, path, 'unexpected %r', key)
+        else:
+            body = self.block(additional, item, '{} + ({},)'.format(
+                path, key), depth + 3)
+            if not body:
+                return []
+            body = ['{}            {} = {}[{}]'.format(indent, item, var,
+                                                       key)] + body
+        return ['{}if isinstance({}, dict):'.format(indent, var),
+                '{}    for {} in {}:'.format(indent, key, var),
+                '{}        if {} not in {}:'.format(indent, key, known)] + body
+
+    def _items(self, items, schema, var, path, depth):
+        indent = '    ' * depth
+        lines = []
+        if isinstance(items, list):
+            for position, subschema in enumerate(items):
+                item = self.name('value')
+                body = self.block(subschema, item, '{} + ({},)'.format(
+                    path, position), depth + 2)
+                if body:
+                    lines.extend(['{}    if len({}) > {}:'.format(
+                        indent, var, position), '{}        {} = {}[{}]'.format(
+                        indent, item, var, position)] + body)
+        else:
+            index, item = self.name('index'), self.name('value')
+            body = self.block(items, item, '{} + ({},)'.format(path, index),
+                              depth + 2)
+            if body:
+                lines = ['{}    for {}, {} in enumerate({}):'.format(
+                    indent, index, item, var)] + body
+        if not lines:
+            return []
+        return ['{}if isinstance({}, list):'.format(indent, var)] + lines
+
+    def _size(self, kind, operator, limit, template, var, path, depth):
+        """Lines checking the length of a list or string."""
+        constant = self.name('limit', limit)
+        return self.check('isinstance({0}, {1}) and len({0}) {2} {3}'.format(
+            var, kind, operator, constant), depth, path,
+            _text(template.format(limit)) + ': %s',
+            'reprlib.repr({})'.format(var))
+
+    def _minItems(self, limit, schema, var, path, depth):
+        return self._size('list', '<', _number('minItems', limit, True),
+                          'at least {} items', var, path, depth)
+
+    def _maxItems(self, limit, schema, var, path, depth):
+        return self._size('list', '>', _number('maxItems', limit, True),
+                          'at most {} items', var, path, depth)
+
+    def _minLength(self, limit, schema, var, path, depth):
+        return self._size('str', '<', _number('minLength', limit, True),
+                          'at least {} characters', var, path, depth)
+
+    def _maxLength(self, limit, schema, var, path, depth):
+        return self._size('str', '>', _number('maxLength', limit, True),
+                          'at most {} characters', var, path, depth)
+
+    def _uniqueItems(self, unique, schema, var, path, depth):
+        if not unique:
+            return []
+        index = self.name('index')
+        indent = '    ' * depth
+        return ['{}if isinstance({}, list):'.format(indent, var),
+                '{}    {} = _duplicate({})'.format(indent, index, var)] + \
+            self.check('{} is not None'.format(index), depth + 1, path,
+                       'duplicate item %s', 'reprlib.repr({}[{}])'.format(
+                           var, index))
+
+    def _pattern(self, pattern, schema, var, path, depth):
+        search = self.name('pattern', re.compile(pattern).search)
+        return self.check('isinstance({0}, str) and not {1}({0})'.format(
+            var, search), depth, path, '%s does not match ' + _text(repr(
+                pattern)), 'reprlib.repr({})'.format(var))
+
+    def _bound(self, operator, limit, template, var, path, depth):
+        """Lines checking a number against a limit."""
+        constant = self.name('limit', limit)
+        return self.check('{} and {} {} {}'.format(
+            NUMBER.format(var), var, operator, constant), depth, path,
+            _text(template.format(limit)) + ': %s', 'repr({})'.format(var))
+
+    def _minimum(self, limit, schema, var, path, depth):
+        return self._bound('<', _number('minimum', limit), 'below {}', var,
+                           path, depth)
+
+    def _maximum(self, limit, schema, var, path, depth):
+        return self._bound('>', _number('maximum', limit), 'above {}', var,
+                           path, depth)
+
+    def _exclusiveMinimum(self, limit, schema, var, path, depth):
+        return self._bound('<=', _number('exclusiveMinimum', limit),
+                           'not above {}', var, path, depth)
+
+    def _exclusiveMaximum(self, limit, schema, var, path, depth):
+        return self._bound('>=', _number('exclusiveMaximum', limit),
+                           'not below {}', var, path, depth)
+
+    def _multipleOf(self, factor, schema, var, path, depth):
+        if _number('multipleOf', factor) <= 0:
+            raise AssertionError("multipleOf should be above 0, not "
+                                 "{}".format(factor))
+        constant = self.name('factor', factor)
+        return self.check('{} and not ({} / {}).is_integer()'.format(
+            NUMBER.format(var), var, constant), depth, path,
+            '%s is not a multiple of ' + _text(repr(factor)),
+            'repr({})'.format(var))
+
+    def _allOf(self, schemas, schema, var, path, depth):
+        lines = []
+        for subschema in schemas:
+            lines.extend(self.block(subschema, var, path, depth))
+        return lines
+
+    def _validators(self, schemas):
+        """Return the name of the tuple of validators of schemas."""
+        names = [self.function(subschema) for subschema in schemas]
+        validators = self.name('validators')
+        self.functions.append('{} = ({},)'.format(validators,
+                                                  ', '.join(names)))
+        return validators
+
+    def _anyOf(self, schemas, schema, var, path, depth):
+        return self.check('not _matches({}, {})'.format(
+            self._validators(schemas), var), depth, path,
+            '%s matches none of anyOf', 'reprlib.repr({})'.format(var))
+
+    def _oneOf(self, schemas, schema, var, path, depth):
+        matched = self.name('matched')
+        return ['{}{} = _matches({}, {})'.format(
+            '    ' * depth, matched, self._validators(schemas), var)] + \
+            self.check('{} != 1'.format(matched), depth, path,
+                       '%s matches %s of oneOf',
+                       'reprlib.repr({})'.format(var), matched)
+
+    def _not(self, subschema, schema, var, path, depth):
+        return self.check('_matches({}, {})'.format(
+            self._validators([subschema]), var), depth, path,
+            '%s matches the not schema', 'reprlib.repr({})'.format(var))
+
+    def _ref(self, ref, schema, var, path, depth):
+        if not ref.startswith('#'):
+            raise AssertionError("Only local $ref are supported, not "
+                                 "{}".format(ref))
+        name = self._refs.get(ref)
+        if name is None:
+            target = self.root
+            for part in [p for p in ref[1:].split('/') if p]:
+                part = part.replace('~1', '/').replace('~0', '~')
+                target = target[int(part) if isinstance(target, list)
+                                else part]
+            # Named before generating, for recursive references.
+            name = self._refs[ref] = self.name('validate')
+            self.function(target, name)
+        return ['{}{}({}, {}, errors)'.format('    ' * depth, name, var,
+                                              path)]
+
+
+def compile_schema(schema, many=False):
+    """Return the validator function of a schema, compiled once.
+
+    The validator is called as validate(data, root='resp') and returns
+    the list of (key path, message) failures, empty when data is valid.
+    Validators are cached by schema content, so equal schemas built
+    anew by each test share one.
+    :param schema: JSON Schema as a dict.
+    :param many: validate lists of records, each against schema.
+    """
+    try:
+        text = json.dumps(schema, sort_keys=True)
+    except (TypeError, ValueError) as e:
+        raise AssertionError("Schema should be JSON: {}".format(e))
+    return _compile(text, many)
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _compile(text, many):
+    """Compile the schema serialized as text, see compile_schema."""
+    schema = json.loads(text)
+    generator = _Generator(schema)
+    root = generator.function({'type': 'array', 'items': schema} if many
+                              else schema)
+    source = '\n\n'.join(generator.functions)
+    exec(compile(source, '<schema>', 'exec'), generator.namespace)
+    check = generator.namespace[root]
+
+    def validate(data, root='resp'):
+        errors = []
+        check(data, (), errors)
+        return [(format_path(path, root), message)
+                for path, message in errors]
+    validate.source = source
+    return validate
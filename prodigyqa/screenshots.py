@@ -0,0 +1,154 @@
+"""Screenshots captured in memory and written by background threads."""
+from loguru import logger
+
+import atexit
+
+import hashlib
+
+import os
+
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+SCREENSHOT_WORKERS = int(os.environ.get('PRODIGYQA_SCREENSHOT_WORKERS', 2))
+
+# Frames held in memory waiting for a writer thread.
+SCREENSHOT_BUFFER = int(os.environ.get('PRODIGYQA_SCREENSHOT_BUFFER', 32))
+
+
+class ScreenshotWriter(object):
+    """Encode and write PNG screenshots off the test thread.
+
+    Tests hand over the PNG bytes returned by get_screenshot_as_png and
+    carry on; directories, optional recompression and the file write run
+    in a thread pool. Frames are dropped from memory once written; when
+    max_pending frames are waiting, submit blocks until one is. With
+    dedupe, a frame identical to one already written isn't written again
+    and resolves to the earlier file.
+    """
+
+    def __init__(self, workers=SCREENSHOT_WORKERS, dedupe=False,
+                 compress_level=None, max_pending=SCREENSHOT_BUFFER):
+        """Writer declarations.
+
+        :param workers: number of writer threads.
+        :param dedupe: skip frames identical to one already written.
+        :param compress_level: (optional) PNG compression level 0-9 to
+            encode frames with instead of the browser's encoding.
+        :param max_pending: frames kept in memory waiting to be written.
+        """
+        self.workers = workers
+        self.dedupe = dedupe
+        self.compress_level = compress_level
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._written = {}
+        self._pending = set()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, png, path):
+        """Queue the PNG bytes to be written to path.
+
+        :param png: PNG bytes of the screenshot.
+        :param path: file name with directory path.
+        :return: Future resolving to the path holding the frame.
+        :rtype: concurrent.futures.Future
+        """
+        digest = hashlib.sha1(png).hexdigest() if self.dedupe else None
+        with self._lock:
+            if digest in self._written:
+                return self._written[digest]
+        self._slots.acquire()
+        with self._lock:
+            if digest in self._written:
+                # Queued by another thread in the meantime.
+                self._slots.release()
+                return self._written[digest]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers)
+            future = self._executor.submit(self._write, png, path)
+            if self.dedupe:
+                self._written[digest] = future
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        """Forget a finished write and log it when it failed."""
+        with self._lock:
+            self._pending.discard(future)
+            self._slots.release()
+            if future.exception() is not None:
+                # Let the next identical frame try again.
+                self._written = {digest: written for digest, written
+                                 in self._written.items()
+                                 if written is not future}
+        if future.exception() is not None:
+            logger.error("Failed to save screenshot: {}".format(
+                future.exception()))
+
+    def _write(self, png, path):
+        """Encode and write one frame, replacing any previous file."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        if self.compress_level is not None:
+            png = encode_png(png, self.compress_level)
+        temporary = '{}.{}.tmp'.format(path, threading.get_ident())
+        with open(temporary, 'wb') as f:
+            f.write(png)
+        os.replace(temporary, path)
+        return path
+
+    def flush(self, timeout=None):
+        """Wait until every queued screenshot is written.
+
+        :param timeout: (optional) seconds to wait for each write.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result(timeout)
+            except Exception:
+                # Already logged by _done.
+                pass
+
+    def close(self):
+        """Write the queued screenshots and stop the writer threads."""
+        self.flush()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+def encode_png(png, compress_level):
+    """Return the PNG bytes encoded again with another compression level.
+
+    :param png: PNG bytes.
+    :param compress_level: zlib compression level 0-9.
+    """
+    import cv2
+    import numpy
+    image = cv2.imdecode(numpy.frombuffer(png, numpy.uint8),
+                         cv2.IMREAD_UNCHANGED)
+    ok, encoded = cv2.imencode(
+        '.png', image, [cv2.IMWRITE_PNG_COMPRESSION, compress_level])
+    if not ok:
+        raise RuntimeError("Failed to encode screenshot.")
+    return encoded.tobytes()
+
+
+def completed(value):
+    """Return a Future already resolved to value."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+SCREENSHOT_WRITER = ScreenshotWriter()
+
+atexit.register(SCREENSHOT_WRITER.close)
@@ -0,0 +1,112 @@
+"""Keep-alive requests sessions shared by ApiTester tests."""
+import atexit
+
+import os
+
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from urllib.parse import urlsplit
+
+from urllib3.util.retry import Retry
+
+POOL_MAXSIZE = int(os.environ.get('PRODIGYQA_HTTP_POOL_SIZE', 10))
+
+MAX_RETRIES = int(os.environ.get('PRODIGYQA_HTTP_RETRIES', 0))
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+def base_url(url):
+    """Return the 'scheme://host:port' part of url."""
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        raise requests.exceptions.InvalidURL(
+            "Invalid URL '{}': no scheme or host".format(url))
+    return '{}://{}'.format(parts.scheme.lower(), parts.netloc.lower())
+
+
+class SessionPool(object):
+    """Sessions per base url keeping connections open between requests.
+
+    Each thread gets its own Session per base url (sessions aren't safe
+    across threads), all of them sending through one HTTPAdapter per
+    base url, whose connection pool is thread safe. So connections and
+    TLS sessions are set up once per host instead of once per request.
+    Only connections are shared: cookies are cleared each time a session
+    is handed out, so no request sends cookies another one received.
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, max_retries=MAX_RETRIES,
+                 backoff_factor=0.3, retry_statuses=RETRY_STATUSES,
+                 keep_alive=True):
+        """Pool declarations.
+
+        :param pool_maxsize: connections kept open per host.
+        :param max_retries: retries of idempotent requests on connection
+            errors and retry_statuses.
+        :param backoff_factor: retries sleep backoff_factor * 2 ** n s.
+        :param retry_statuses: status codes retried.
+        :param keep_alive: False closes connections after each request.
+        """
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self.keep_alive = keep_alive
+        self._adapters = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def adapter(self, url):
+        """Return the HTTPAdapter shared by all sessions of url's host."""
+        base = base_url(url)
+        with self._lock:
+            adapter = self._adapters.get(base)
+            if adapter is None:
+                retries = Retry(total=self.max_retries,
+                                backoff_factor=self.backoff_factor,
+                                status_forcelist=self.retry_statuses,
+                                raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.pool_maxsize,
+                                      max_retries=retries)
+                self._adapters[base] = adapter
+            return adapter
+
+    def session(self, url):
+        """Return the calling thread's Session for url's host, cookieless.
+
+        :param url: any url of the host.
+        :rtype: requests.Session
+        """
+        base = base_url(url)
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        session = sessions.get(base)
+        if session is None:
+            session = requests.Session()
+            session.mount(base + '/', self.adapter(url))
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            sessions[base] = session
+        else:
+            session.cookies.clear()
+        return session
+
+    def close(self):
+        """Close the connections of every host."""
+        with self._lock:
+            adapters, self._adapters = list(self._adapters.values()), {}
+        for adapter in adapters:
+            adapter.close()
+        self._local = threading.local()
+
+
+SESSION_POOL = SessionPool()
+
+atexit.register(SESSION_POOL.close)
@@ -0,0 +1,310 @@
+"""Incremental JSON parsing of streamed responses.
+
+ijson is used when installed, a pure Python tokenizer otherwise. Only
+the values at the paths asked for are built, so memory stays bounded
+by the largest matched value instead of the whole document.
+"""
+import codecs
+
+import json
+
+import re
+
+import reprlib
+
+from decimal import Decimal
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+
+TOKEN = re.compile(r'''[\s]*(?:
+    (?P<punct>[{}\[\]:,])|
+    (?P<string>"(?:[^"\\]|\\.)*")|
+    (?P<number>-?\d+(?:\.\d*)?(?:[eE][+-]?\d*)?)|
+    (?P<literal>true|false|null))''', re.VERBOSE | re.DOTALL)
+
+LITERALS = {'true': ('boolean', True), 'false': ('boolean', False),
+            'null': ('null', None)}
+
+SCALARS = ('string', 'number', 'boolean', 'null')
+
+# Relation between member and value reported when a check fails.
+FAILED = {'in': 'not in', 'not_in': 'in', 'equal': '!=', 'not_equal': '==',
+          'all_equal': '!='}
+
+
+def _tokens(chunks):
+    """Yield JSON tokens from an iterable of byte chunks."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, final = '', 0, False
+    chunks = iter(chunks)
+    while True:
+        match = TOKEN.match(buffer, position)
+        # A token touching the end of the buffer may continue in the
+        # next chunk, except single punctuation characters. Numbers match
+        # leniently ('12.') for the same reason; json.loads rejects them.
+        if match and (final or match.end() < len(buffer) or
+                      match.lastgroup == 'punct'):
+            position = match.end()
+            yield match.lastgroup, match.group(match.lastgroup)
+            continue
+        if final:
+            if buffer[position:].strip():
+                raise ValueError("Invalid JSON near '{}'".format(
+                    buffer[position:position + 40]))
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+            text = decoder.decode(b'', final=True)
+        else:
+            text = decoder.decode(chunk)
+        buffer, position = buffer[position:] + text, 0
+
+
+def _basic_events(chunks):
+    """Yield ijson style (event, value) pairs from byte chunks."""
+    containers = []
+    expect_key = False
+    for kind, text in _tokens(chunks):
+        if kind == 'punct':
+            if text == '{':
+                containers.append('map')
+                expect_key = True
+                yield 'start_map', None
+            elif text == '[':
+                containers.append('array')
+                yield 'start_array', None
+            elif text == '}':
+                containers.pop()
+                expect_key = False
+                yield 'end_map', None
+            elif text == ']':
+                containers.pop()
+                yield 'end_array', None
+            elif text == ',':
+                expect_key = containers[-1] == 'map'
+            else:
+                expect_key = False
+        elif kind == 'string':
+            if expect_key:
+                yield 'map_key', json.loads(text)
+            else:
+                yield 'string', json.loads(text)
+        elif kind == 'number':
+            yield 'number', json.loads(text)
+        else:
+            yield LITERALS[text]
+
+
+def _ijson_events(raw):
+    """Yield (event, value) pairs parsed by ijson from a file object.
+
+    Decimal numbers are turned into floats, as json.loads gives.
+    """
+    for event, value in ijson.basic_parse(raw):
+        if isinstance(value, Decimal):
+            value = float(value)
+        yield event, value
+
+
+def response_events(response, chunk_size=CHUNK_SIZE):
+    """Yield (event, value) pairs of a response opened with stream=True.
+
+    :param response: requests.Response whose body wasn't read yet.
+    :param chunk_size: bytes read at once.
+    """
+    if ijson is not None:
+        response.raw.decode_content = True
+        return _ijson_events(response.raw)
+    return _basic_events(response.iter_content(chunk_size))
+
+
+class _Builder(object):
+    """Rebuild the value starting at one event from the next events."""
+
+    def __init__(self, path):
+        """Builder declarations."""
+        self.path = path
+        self.value = None
+        self.done = False
+        self._stack = []
+
+    def _add(self, value):
+        """Put a value into the container being built."""
+        if not self._stack:
+            self.value = value
+            return
+        container, key = self._stack[-1]
+        if isinstance(container, dict):
+            container[key] = value
+        else:
+            container.append(value)
+
+    def feed(self, event, value):
+        """Consume one event."""
+        if event in ('start_map', 'start_array'):
+            container = {} if event == 'start_map' else []
+            self._add(container)
+            self._stack.append([container, None])
+        elif event == 'map_key':
+            self._stack[-1][1] = value
+        elif event in ('end_map', 'end_array'):
+            self._stack.pop()
+        else:
+            self._add(value)
+        self.done = not self._stack
+
+
+def iter_matches(events, paths):
+    """Yield (path, value) for every value found at one of paths.
+
+    :param events: (event, value) pairs as yielded by response_events.
+    :param paths: ResponsePath objects.
+    """
+    location = []
+    indexes = []
+    builders = []
+    for event, value in events:
+        if event == 'map_key':
+            location[-1] = value
+        elif event not in ('end_map', 'end_array') and indexes and \
+                indexes[-1] is not None:
+            indexes[-1] += 1
+            location[-1] = indexes[-1]
+        if event in SCALARS or event in ('start_map', 'start_array'):
+            here = tuple(location)
+            builders.extend(_Builder(path) for path in paths
+                            if path.matches(here))
+        for builder in builders:
+            builder.feed(event, value)
+        if builders:
+            for builder in [b for b in builders if b.done]:
+                builders.remove(builder)
+                yield builder.path, builder.value
+        if event == 'start_map':
+            location.append(None)
+            indexes.append(None)
+        elif event == 'start_array':
+            location.append(-1)
+            indexes.append(-1)
+        elif event in ('end_map', 'end_array'):
+            location.pop()
+            indexes.pop()
+
+
+class StreamCheck(object):
+    """One path assertion evaluated on values as they are streamed.
+
+    Values at wildcard paths are checked one by one as found: 'equal'
+    and 'not_equal' compare each with the item at the same position of
+    the expected list, so no value is kept. A path without wildcard
+    that never appears in the document fails every assertion, as a
+    missing key does for assert_*_resp.
+    """
+
+    ASSERTIONS = ('in', 'not_in', 'equal', 'not_equal', 'all_equal')
+
+    def __init__(self, assertion, member, path):
+        """Check declarations.
+
+        :param assertion: one of ASSERTIONS, as the assert_*_resp methods.
+        :param member: expected value, a list for 'equal' and
+            'not_equal' on wildcard paths.
+        :param path: ResponsePath of the values checked.
+        """
+        if assertion not in self.ASSERTIONS:
+            raise AssertionError("Unknown assertion '{}', use one of "
+                                 "{}".format(assertion, self.ASSERTIONS))
+        self.assertion = assertion
+        self.member = member
+        self.path = path
+        self.matches = 0
+        self.error = None
+        self.decided = False
+        self._in_order = path.wildcard and assertion in ('equal',
+                                                         'not_equal')
+
+    def feed(self, value):
+        """Check one value found at the path."""
+        if self.decided:
+            return
+        self.matches += 1
+        if self._in_order:
+            self._compare(value)
+            return
+        if self.path.wildcard:
+            found = value == self.member
+            if self.assertion == 'in' and found:
+                self._decide(None)
+            elif self.assertion == 'not_in' and found:
+                self._decide(self._message(value))
+            elif self.assertion == 'all_equal' and not found:
+                self._decide(self._message(value) + ' (match {})'.format(
+                    self.matches))
+            return
+        if self.assertion in ('in', 'not_in'):
+            found = self.member in value
+        else:
+            found = value == self.member
+        positive = self.assertion in ('in', 'equal', 'all_equal')
+        self._decide(None if found == positive else self._message(value))
+
+    def _compare(self, value):
+        """Compare a wildcard match with the expected item at its position.
+
+        The first difference settles both 'equal' and 'not_equal'.
+        """
+        index = self.matches - 1
+        if not isinstance(self.member, list):
+            difference = '{} is not a list'.format(reprlib.repr(self.member))
+        elif index >= len(self.member):
+            difference = 'unexpected {} (match {}, {} expected)'.format(
+                reprlib.repr(value), self.matches, len(self.member))
+        elif self.member[index] != value:
+            difference = '{} != {} (match {})'.format(
+                reprlib.repr(self.member[index]), reprlib.repr(value),
+                self.matches)
+        else:
+            return
+        self._decide(difference if self.assertion == 'equal' else None)
+
+    def _message(self, value):
+        """Return the failure message for a value."""
+        return '{} {} {}'.format(reprlib.repr(self.member), FAILED[
+            self.assertion], reprlib.repr(value))
+
+    def _decide(self, error):
+        """Settle the outcome before the end of the document."""
+        self.error = error
+        self.decided = True
+
+    def finish(self):
+        """Return the failure message once the document ended, or None."""
+        if self.decided:
+            return self.error
+        if self._in_order:
+            same = (isinstance(self.member, list) and
+                    self.matches == len(self.member))
+            if self.assertion == 'not_equal':
+                return self._message(self.member) if same else None
+            if same:
+                return None
+            if not isinstance(self.member, list):
+                return '{} is not a list'.format(reprlib.repr(self.member))
+            return 'missing {} (match {}, {} found)'.format(
+                reprlib.repr(self.member[self.matches]), self.matches + 1,
+                self.matches)
+        if not self.matches and not self.path.wildcard:
+            return 'nothing found'
+        if self.assertion in ('not_in', 'not_equal'):
+            return None
+        if not self.matches:
+            return 'nothing found'
+        if self.assertion == 'all_equal':
+            return None
+        return '{} not found'.format(reprlib.repr(self.member))
@@ -0,0 +1,175 @@
+"""Timing records of BrowserActions actions and slow step reports."""
+from loguru import logger
+
+import atexit
+
+import json
+
+import os
+
+import threading
+
+from collections import OrderedDict
+
+PROFILE_REPORT = os.environ.get('PRODIGYQA_PROFILE_REPORT')
+
+
+class ActionRecord(object):
+    """Wall time, webdriver round trips and wait time of one action."""
+
+    __slots__ = ('test', 'action', 'locator', 'wall', 'round_trips',
+                 'wait', 'depth')
+
+    def __init__(self, test, action, locator, wall, round_trips, wait,
+                 depth):
+        """Record declarations.
+
+        :param test: id of the test the action ran in.
+        :param action: name of the BrowserActions method.
+        :param locator: 'by=value' of the locator acted on, if any.
+        :param wall: seconds the action took.
+        :param round_trips: webdriver commands sent during the action.
+        :param wait: seconds spent waiting for the page or elements.
+        :param depth: 0 for actions called by the test, 1 and more for
+            actions called by other actions.
+        """
+        self.test = test
+        self.action = action
+        self.locator = locator
+        self.wall = wall
+        self.round_trips = round_trips
+        self.wait = wait
+        self.depth = depth
+
+    def as_dict(self):
+        """Return the record as a dictionary."""
+        return OrderedDict((name, getattr(self, name))
+                           for name in self.__slots__)
+
+
+class ActionRecorder(object):
+    """Thread safe collection of action records with reports."""
+
+    def __init__(self):
+        """Variable Stack Declaration."""
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, *args):
+        """Store an ActionRecord built from the passed values."""
+        with self._lock:
+            self.records.append(ActionRecord(*args))
+
+    def select(self, test=None, top_level=False):
+        """Return records, optionally of one test or called by tests only.
+
+        :param test: (optional) test id.
+        :param top_level: leave out actions called by other actions.
+        """
+        return [record for record in self.records
+                if (test is None or record.test == test) and
+                (not top_level or record.depth == 0)]
+
+    def slowest(self, count=10, test=None):
+        """Return the slowest actions called by the tests.
+
+        :param count: number of records.
+        :param test: (optional) test id.
+        """
+        return sorted(self.select(test, top_level=True),
+                      key=lambda record: record.wall, reverse=True)[:count]
+
+    def totals(self, key='action', test=None):
+        """Sum calls, wall time, round trips and wait time per key.
+
+        :param key: 'action' or 'locator'.
+        :param test: (optional) test id.
+        :return: dictionaries sorted by wall time, slowest first.
+        """
+        totals = {}
+        for record in self.select(test, top_level=True):
+            name = getattr(record, key)
+            if name is None:
+                continue
+            total = totals.setdefault(name, {
+                key: name, 'calls': 0, 'wall': 0.0, 'round_trips': 0,
+                'wait': 0.0, 'max': 0.0})
+            total['calls'] += 1
+            total['wall'] += record.wall
+            total['round_trips'] += record.round_trips
+            total['wait'] += record.wait
+            total['max'] = max(total['max'], record.wall)
+        return sorted(totals.values(), key=lambda total: total['wall'],
+                      reverse=True)
+
+    def report(self, test=None, count=10):
+        """Return a text report of the slowest steps, actions and locators.
+
+        :param test: (optional) test id, the whole suite by default.
+        :param count: number of lines per section.
+        """
+        records = self.select(test, top_level=True)
+        wall = sum(record.wall for record in records)
+        wait = sum(record.wait for record in records)
+        lines = ['{}: {} actions, {:.3f}s, {} round trips, {:.3f}s '
+                 'waiting'.format(test or 'suite', len(records), wall,
+                                  sum(r.round_trips for r in records), wait)]
+        lines.append('Slowest steps:')
+        for record in self.slowest(count, test):
+            lines.append('  {:8.3f}s {:4d} trips {:7.3f}s wait  {}{}'.format(
+                record.wall, record.round_trips, record.wait, record.action,
+                ' ' + record.locator if record.locator else ''))
+        for key in ('action', 'locator'):
+            lines.append('Slowest {}s:'.format(key))
+            for total in self.totals(key, test)[:count]:
+                lines.append(
+                    '  {wall:8.3f}s {calls:4d} calls {round_trips:5d} trips '
+                    '{wait:7.3f}s wait  {name}'.format(
+                        name=total[key], **total))
+        return '\n'.join(lines)
+
+    def write_json(self, path):
+        """Write all records to a json file.
+
+        :param path: file path.
+        """
+        with open(path, 'w') as f:
+            json.dump([record.as_dict() for record in self.records], f,
+                      indent=2)
+
+    def clear(self):
+        """Drop all records."""
+        with self._lock:
+            self.records = []
+
+
+SUITE_RECORDER = ActionRecorder()
+
+
+def count_round_trips(driver, counter):
+    """Count the commands driver sends until stop_counting is called.
+
+    :param driver: webdriver instance.
+    :param counter: object whose round_trips attribute is incremented.
+    """
+    execute = type(driver).execute.__get__(driver)
+
+    def counting_execute(*args, **kwargs):
+        counter.round_trips += 1
+        return execute(*args, **kwargs)
+    driver.execute = counting_execute
+
+
+def stop_counting(driver):
+    """Restore the execute method replaced by count_round_trips."""
+    if 'execute' in vars(driver):
+        del driver.execute
+
+
+@atexit.register
+def _suite_report():
+    """Log the suite report (and write it as json) when profiling ran."""
+    if SUITE_RECORDER.records:
+        logger.info('\n' + SUITE_RECORDER.report())
+        if PROFILE_REPORT:
+            SUITE_RECORDER.write_json(PROFILE_REPORT)
@@ -0,0 +1,163 @@
+"""Auth tokens cached per credentials and refreshed before they expire."""
+import base64
+
+import hashlib
+
+import json
+
+import os
+
+import threading
+
+import time
+
+from prodigyqa.paths import compile_path
+
+# Seconds before expiry a token is refreshed.
+REFRESH_MARGIN = float(os.environ.get('PRODIGYQA_TOKEN_REFRESH_MARGIN', 60))
+
+# Lifetime assumed for tokens whose expiry isn't known.
+DEFAULT_TTL = float(os.environ.get('PRODIGYQA_TOKEN_TTL', 300))
+
+
+def credentials_key(url, credentials):
+    """Return the cache key of a login url and its credentials."""
+    text = json.dumps([url, credentials], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def jwt_expiry(token):
+    """Return the 'exp' claim of a JWT, None for other tokens."""
+    parts = token.split('.') if isinstance(token, str) else ()
+    if len(parts) != 3:
+        return None
+    try:
+        padding = '=' * (-len(parts[1]) % 4)
+        payload = base64.urlsafe_b64decode(parts[1] + padding)
+        expiry = json.loads(payload.decode('utf-8')).get('exp')
+    except (ValueError, AttributeError):
+        return None
+    return float(expiry) if isinstance(expiry, (int, float)) else None
+
+
+class Token(object):
+    """Token value and the time it expires at."""
+
+    __slots__ = ('value', 'expires_at')
+
+    def __init__(self, value, expires_at):
+        """Token declarations."""
+        self.value = value
+        self.expires_at = expires_at
+
+
+class TokenProvider(object):
+    """Tokens cached per login url and credentials, shared by threads.
+
+    A token is fetched once and refreshed refresh_margin seconds before
+    it expires: one thread logs in again while the others keep using the
+    still valid token, and threads needing a token that isn't there yet
+    wait for a single login instead of each sending their own.
+    """
+
+    def __init__(self, refresh_margin=REFRESH_MARGIN, default_ttl=DEFAULT_TTL,
+                 token_path='resp.token', expiry_path='resp.expires_in',
+                 header='Authorization', scheme='Bearer ', clock=time.time):
+        """Provider declarations.
+
+        :param refresh_margin: seconds before expiry a token is renewed.
+        :param default_ttl: lifetime of tokens with no expires_in field
+            nor JWT 'exp' claim.
+        :param token_path: key path of the token in the login response.
+        :param expiry_path: key path of its lifetime in seconds.
+        :param header: request header carrying the token.
+        :param scheme: prefix of the token in the header.
+        :param clock: function returning the current time in seconds.
+        """
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.token_path = token_path
+        self.expiry_path = expiry_path
+        self.header = header
+        self.scheme = scheme
+        self.clock = clock
+        self.logins = 0
+        self._tokens = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, credentials, login):
+        """Return a valid token for credentials, logging in when needed.
+
+        :param url: login url.
+        :param credentials: login request payload.
+        :param login: callable(url, credentials) returning the login
+            requests.Response.
+        """
+        key = credentials_key(url, credentials)
+        cached = self._tokens.get(key)
+        now = self.clock()
+        if cached is not None and now < cached.expires_at - \
+                self.refresh_margin:
+            return cached.value
+        lock = self._key_lock(key)
+        if cached is not None and now < cached.expires_at:
+            if not lock.acquire(False):
+                # Another thread is refreshing it, this one is still good.
+                return cached.value
+        else:
+            lock.acquire()
+        try:
+            cached = self._tokens.get(key)
+            if cached is not None and self.clock() < cached.expires_at - \
+                    self.refresh_margin:
+                return cached.value
+            token = self._login(url, credentials, login)
+            self._tokens[key] = token
+            return token.value
+        finally:
+            lock.release()
+
+    def invalidate(self, url=None, credentials=None):
+        """Forget the token of credentials, or every token with no args."""
+        with self._lock:
+            if url is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(credentials_key(url, credentials), None)
+
+    def header_value(self, token):
+        """Return the header value carrying token."""
+        return '{}{}'.format(self.scheme, token)
+
+    def _key_lock(self, key):
+        """Return the lock serializing the logins of one credentials key."""
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _login(self, url, credentials, login):
+        """Log in and return the Token of the response."""
+        started = self.clock()
+        response = login(url, credentials)
+        self.logins += 1
+        if response is None or response.status_code >= 400:
+            raise AssertionError("Login to {} failed: {}".format(
+                url, getattr(response, 'status_code', 'request rejected')))
+        data = response.json()
+        try:
+            value = compile_path(self.token_path).get(data)
+        except (KeyError, IndexError, TypeError):
+            raise AssertionError("No token at {} in the login response of "
+                                 "{}".format(self.token_path, url))
+        try:
+            expires_at = started + float(compile_path(
+                self.expiry_path).get(data))
+        except (KeyError, IndexError, TypeError, ValueError):
+            expires_at = jwt_expiry(value) or started + self.default_ttl
+        return Token(value, expires_at)
+
+
+TOKEN_PROVIDER = TokenProvider()
@@ -0,0 +1,138 @@
+"""Content addressed store of visual regression baselines."""
+from loguru import logger
+
+import hashlib
+
+import os
+
+import threading
+
+from urllib.parse import quote, unquote
+
+from prodigyqa.screenshots import encode_png
+
+BASELINES_DIR = os.environ.get('PRODIGYQA_BASELINES_DIR', 'visual_baselines')
+
+VISUAL_THRESHOLD = 0.99  # Lowest SSIM accepted as a match
+
+
+def decode_png(png):
+    """Return PNG bytes as a BGR ndarray, as cv2.imread would.
+
+    :param png: PNG bytes, e.g. from get_screenshot_as_png.
+    """
+    import cv2
+    import numpy
+    return cv2.imdecode(numpy.frombuffer(png, numpy.uint8), cv2.IMREAD_COLOR)
+
+
+class BaselineStore(object):
+    """Baseline images stored once per content under the names using them.
+
+    Images live in objects/<sha256>.png and one file per baseline name
+    in names/ holds the hash it uses, so identical baselines (the same
+    header on every page, unchanged components) take the space of one
+    image, and processes storing different names never write the same
+    file.
+    """
+
+    def __init__(self, root=BASELINES_DIR, compress_level=9):
+        """Store declarations.
+
+        :param root: directory of the store.
+        :param compress_level: PNG compression level baselines are
+            stored with.
+        """
+        self.root = root
+        self.compress_level = compress_level
+
+    def _object_path(self, digest):
+        """Path of the image with the given hash."""
+        return os.path.join(self.root, 'objects', digest + '.png')
+
+    def _name_path(self, name):
+        """Path of the file holding the image hash of a baseline name."""
+        return os.path.join(self.root, 'names', quote(
+            name, safe='').replace('.', '%2E'))
+
+    def _read_digest(self, name):
+        """Return the image hash of a baseline name, None if unknown."""
+        path = self._name_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read().strip()
+
+    def names(self):
+        """Return the mapping of baseline names to image hashes."""
+        directory = os.path.join(self.root, 'names')
+        if not os.path.isdir(directory):
+            return {}
+        return {unquote(filename): self._read_digest(unquote(filename))
+                for filename in os.listdir(directory)
+                if not filename.endswith('.tmp')}
+
+    def get(self, name):
+        """Return the PNG bytes of a baseline, None when there is none.
+
+        :param name: baseline name.
+        """
+        digest = self._read_digest(name)
+        if digest is None or not os.path.exists(self._object_path(digest)):
+            return None
+        with open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+    def put(self, name, png):
+        """Store PNG bytes as the baseline of name.
+
+        :param name: baseline name.
+        :param png: PNG bytes.
+        :return: hash of the stored image.
+        """
+        if self.compress_level is not None:
+            png = encode_png(png, self.compress_level)
+        digest = hashlib.sha256(png).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, png)
+        path = self._name_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, digest.encode('utf-8'))
+        logger.info("Stored baseline '{}' ({})".format(name, digest[:12]))
+        return digest
+
+    def save_failure(self, name, png):
+        """Keep the image which didn't match, next to the store.
+
+        :return: path of the saved image.
+        """
+        path = os.path.join(self.root, 'failures',
+                            name.replace('/', '_') + '.png')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, png)
+        return path
+
+    def prune(self):
+        """Remove images no baseline name refers to any more.
+
+        :return: number of images removed.
+        """
+        used = set(self.names().values())
+        directory = os.path.join(self.root, 'objects')
+        removed = 0
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename[:-len('.png')] not in used:
+                    os.remove(os.path.join(directory, filename))
+                    removed += 1
+        return removed
+
+
+def _write_atomic(path, data):
+    """Write bytes to path through a temporary file."""
+    temporary = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
@@ -0,0 +1,181 @@
+"""Explicit wait engine with composable conditions and shared budgets."""
+import time
+
+from selenium.common import exceptions as selenium_exceptions
+
+from prodigyqa.locator import Locator
+
+WAIT_SLEEP_TIME = 0.05  # Seconds, first poll interval
+
+MAX_SLEEP_TIME = 0.5  # Seconds, longest poll interval
+
+TIME_OUT = 10  # Seconds
+
+IGNORED_EXCEPTIONS = (selenium_exceptions.NoSuchElementException,
+                      selenium_exceptions.StaleElementReferenceException)
+
+
+class Budget(object):
+    """Deadline shared by every wait done for one action."""
+
+    def __init__(self, timeout):
+        """Start the clock.
+
+        :param timeout: seconds the whole action may take.
+        """
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+
+    def remaining(self):
+        """Return the seconds left, never below zero."""
+        return max(0, self.deadline - time.time())
+
+    @property
+    def expired(self):
+        """Return True once the deadline has passed."""
+        return time.time() >= self.deadline
+
+
+class Condition(object):
+    """Callable condition on the driver, combinable with & and |.
+
+    Conditions built for the same locator are merged when combined, so
+    visible(locator) & enabled(locator) looks the element up only once
+    per poll. Like selenium's expected conditions, a condition returns a
+    false value while it is not met.
+    """
+
+    def __init__(self, check, description, locator=None):
+        """Condition declarations.
+
+        :param check: callable taking the driver, or the element of
+            locator when one is given.
+        :param description: text used in timeout messages.
+        :param locator: (optional) Locator the check applies to.
+        """
+        self.check = check
+        self.description = description
+        self.selector = None if locator is None else Locator.of(
+            locator).selector
+
+    def __call__(self, driver):
+        """Return the element or value when met, otherwise False."""
+        if self.selector is None:
+            return self.check(driver)
+        element = driver.find_element(*self.selector)
+        return element if self.check(element) else False
+
+    def __and__(self, other):
+        """Condition met when both are."""
+        description = '{} and {}'.format(self.description, other.description)
+        if self.selector is not None and self.selector == other.selector:
+            return Condition(
+                lambda elt: self.check(elt) and other.check(elt),
+                description, Locator(*self.selector))
+        return Condition(lambda driver: self(driver) and other(driver),
+                         description)
+
+    def __or__(self, other):
+        """Condition met when either is."""
+        description = '{} or {}'.format(self.description, other.description)
+        if self.selector is not None and self.selector == other.selector:
+            return Condition(
+                lambda elt: self.check(elt) or other.check(elt),
+                description, Locator(*self.selector))
+        return Condition(lambda driver: self(driver) or other(driver),
+                         description)
+
+    def __repr__(self):
+        """Representation of the condition."""
+        return 'Condition({})'.format(self.description)
+
+
+def present(locator):
+    """Element of locator exists in the DOM."""
+    return Condition(lambda elt: True, 'present', locator)
+
+
+def visible(locator):
+    """Element of locator is displayed."""
+    return Condition(lambda elt: elt.is_displayed(), 'visible', locator)
+
+
+def enabled(locator):
+    """Element of locator is enabled."""
+    return Condition(lambda elt: elt.is_enabled(), 'enabled', locator)
+
+
+def selected(locator):
+    """Element of locator is selected."""
+    return Condition(lambda elt: elt.is_selected(), 'selected', locator)
+
+
+def text_contains(locator, text):
+    """Text of the element of locator contains text."""
+    return Condition(lambda elt: text in elt.text,
+                     "text contains '{}'".format(text), locator)
+
+
+def clickable(locator):
+    """Element of locator is visible and enabled."""
+    return visible(locator) & enabled(locator)
+
+
+class WaitEngine(object):
+    """Poll conditions with exponential backoff until met or out of time."""
+
+    def __init__(self, timeout=TIME_OUT, poll=WAIT_SLEEP_TIME,
+                 max_poll=MAX_SLEEP_TIME, backoff=1.5,
+                 ignored_exceptions=IGNORED_EXCEPTIONS):
+        """Wait engine declarations.
+
+        :param timeout: default seconds to wait.
+        :param poll: first interval between checks.
+        :param max_poll: longest interval between checks.
+        :param backoff: factor the interval grows by after each check.
+        :param ignored_exceptions: exceptions meaning 'not met yet'.
+        """
+        self.timeout = timeout
+        self.poll = poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+        self.ignored_exceptions = ignored_exceptions
+        self.waited = 0.0
+
+    def budget(self, timeout=None):
+        """Return a Budget to share between the waits of one action."""
+        return Budget(self.timeout if timeout is None else timeout)
+
+    def until(self, driver, condition, budget=None, message=None):
+        """Return the value of condition once it is met.
+
+        On timeout the last ignored exception is raised again (e.g.
+        NoSuchElementException), or TimeoutException when the condition
+        just stayed false.
+        :param driver: driver passed to the condition.
+        :param condition: Condition or any callable taking the driver,
+            e.g. selenium expected conditions.
+        :param budget: (optional) Budget shared with other waits.
+        :param message: (optional) text of the TimeoutException.
+        """
+        budget = budget or self.budget()
+        interval = self.poll
+        while True:
+            error = None
+            try:
+                value = condition(driver)
+                if value:
+                    return value
+            except self.ignored_exceptions as e:
+                error = e
+            if budget.expired:
+                if error is not None:
+                    raise error
+                raise selenium_exceptions.TimeoutException(
+                    message or 'Timed out after {}s waiting for {}'.format(
+                        budget.timeout, getattr(
+                            condition, 'description', condition)))
+            pause = min(interval, budget.remaining())
+            time.sleep(pause)
+            self.waited += pause
+            interval = min(interval * self.backoff, self.max_poll)